@@ -2,20 +2,29 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
-from sqlalchemy import or_
-from typing import List, Dict, Any
+from sqlalchemy import or_, text
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
 import csv
+import functools
+import hashlib
 import io
+import itertools
 from datetime import datetime, time
 import re
 import asyncio
+import pandas as pd
 import sys
 import os
 from sqlmodel import SQLModel, Session, create_engine
-from models import Patient, Provider, Location, Appointment, SQLModel, Authorization
+from models import Patient, Provider, Location, Appointment, SQLModel, Authorization, AppointmentStatus, Gender
 from dotenv import load_dotenv
+from logging_config import StageMetrics
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/import", tags=["import"])
 
 # Database setup for standalone testing
@@ -45,77 +54,226 @@ sync_engine = create_engine(DATABASE_URL)
 def init_db_sync():
     SQLModel.metadata.create_all(sync_engine)
 
-def get_or_create_patient(session, client_name, client_number, mobile, sex, gender_identity, postcode, state):
-    patient = session.query(Patient).filter(Patient.client_number == client_number).first()
-    if patient:
-        print(f"Found patient with patient_id={patient.patient_id}")
-        return patient
-    patient = Patient(
-        first_name=client_name.split()[0] if client_name else "Unknown",
-        last_name=client_name.split()[-1] if client_name and len(client_name.split()) > 1 else None,
+# Column layout of the appointment export from the practice management system
+APPOINTMENT_CSV_COLUMNS = [
+    'Client', 'Client Number', 'Mobile', 'Sex', 'Gender Identity',
+    'Postcode', 'State', 'Practitioner', 'Location', 'Date',
+    'End Time', 'Appointment Type', 'Type', 'Invoice',
+    'Appointment Notes', 'Appointment Flag', 'Status'
+]
+
+# Columns that must have a value on every row
+REQUIRED_APPOINTMENT_FIELDS = ['Client', 'Client Number', 'Practitioner', 'Location', 'Date']
+
+# Maximum number of values bound into a single IN (...) clause when resolving entities in bulk
+IN_CLAUSE_CHUNK_SIZE = 1000
+
+# Number of CSV rows validated and flushed to the database together
+IMPORT_BATCH_SIZE = 1000
+
+# Number of staged rows sent per COPY FROM STDIN round trip
+COPY_CHUNK_ROWS = 10000
+
+def split_client_name(client_name):
+    """Split a full client name into (first_name, last_name) the way patients are created on import."""
+    parts = client_name.split() if client_name else []
+    first_name = parts[0] if parts else "Unknown"
+    last_name = parts[-1] if len(parts) > 1 else None
+    return first_name, last_name
+
+def new_patient(client_name, client_number, mobile, sex, gender_identity, postcode, state):
+    """
+    Build an unsaved Patient from the client columns of an appointment export.
+
+    Patients have no gender identity column, it is only kept on the appointments.
+    """
+    first_name, last_name = split_client_name(client_name)
+    return Patient(
+        first_name=first_name,
+        last_name=last_name,
         client_number=client_number,
-        mobile=mobile,
-        sex=sex,
-        gender_identity=gender_identity,
-        postcode=postcode,
+        phone=mobile,
+        gender=coerce_enum(Gender, sex),
+        zipcode=postcode,
         state=state,
         created_at=datetime.now(),
         updated_at=datetime.now()
     )
+
+def get_or_create_patient(session, client_name, client_number, mobile, sex, gender_identity, postcode, state):
+    patient = session.query(Patient).filter(Patient.client_number == client_number).first()
+    if patient:
+        logger.debug("Found patient with patient_id=%s", patient.patient_id)
+        return patient
+    patient = new_patient(client_name, client_number, mobile, sex, gender_identity, postcode, state)
     session.add(patient)
     session.flush()
-    print(f"Created patient with patient_id={patient.patient_id}")
+    logger.debug("Created patient with patient_id=%s", patient.patient_id)
     return patient
 
 def get_or_create_provider(session, name):
-    try:
-        print(f"Searching for provider with name: {name}")
-        print(f"Session: {session}")
-        print(f"Provider class: {Provider}")
-        query = session.query(Provider)
-        print(f"Query object: {query}")
-        provider = query.filter(Provider.name == name).first()  # Breakpoint here
-        if provider:
-            print(f"Found existing provider: {provider.name}, ID: {provider.provider_id}")
-            return provider
-        print(f"No existing provider found for name: {name}")
-        provider = Provider(name=name, created_at=datetime.now(), updated_at=datetime.now())
-        session.add(provider)
-        session.flush()
-        print(f"Created new provider: {provider.name}, ID: {provider.provider_id}")
+    provider = session.query(Provider).filter(Provider.name == name).first()
+    if provider:
+        logger.debug("Found existing provider: %s, ID: %s", provider.name, provider.provider_id)
         return provider
-    except AttributeError as ae:
-        print(f"Attribute Error occurred: {str(ae)}")
-        print("Possible issues: session or Provider class might not be properly defined")
-        raise
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        raise
+    provider = Provider(name=name, created_at=datetime.now(), updated_at=datetime.now())
+    session.add(provider)
+    session.flush()
+    logger.debug("Created new provider: %s, ID: %s", provider.name, provider.provider_id)
+    return provider
 
 def get_or_create_location(session, location_name):
-    try:
-        print(f"Searching for location with name: {location_name}")
-        print(f"Session: {session}")
-        print(f"Location class: {Location}")
-        query = session.query(Location)
-        print(f"Query object: {query}")
-        location = query.filter(Location.name == location_name).first()
-        if location:
-            print(f"Found existing location: {location.name}, ID: {location.location_id}")
-            return location
-        print(f"No existing location found for name: {location_name}")
-        location = Location(name=location_name, created_at=datetime.now(), updated_at=datetime.now())
-        session.add(location)
-        session.flush()
-        print(f"Created new location: {location.name}, ID: {location.location_id}")
+    location = session.query(Location).filter(Location.name == location_name).first()
+    if location:
+        logger.debug("Found existing location: %s, ID: %s", location.name, location.location_id)
         return location
-    except AttributeError as ae:
-        print(f"Attribute Error occurred: {str(ae)}")
-        print("Possible issues: session or Location class might not be properly defined")
-        raise
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        raise
+    location = Location(name=location_name, created_at=datetime.now(), updated_at=datetime.now())
+    session.add(location)
+    session.flush()
+    logger.debug("Created new location: %s, ID: %s", location.name, location.location_id)
+    return location
+
+def _chunked(items: List[Any], size: int):
+    """Yield successive slices of at most ``size`` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def resolve_patients(session, rows: List[Dict[str, str]]) -> Dict[str, int]:
+    """
+    Resolve the patients referenced by a set of CSV rows in bulk.
+
+    Existing patients are looked up by client number with chunked IN queries and
+    the missing ones are created in a single batched insert, using the first row
+    seen for each client number.
+
+    Args:
+        session: Database session.
+        rows: Parsed CSV rows.
+
+    Returns:
+        A mapping of client number to patient_id.
+    """
+    first_rows = {}
+    for row in rows:
+        client_number = row.get("Client Number")
+        if client_number and client_number not in first_rows:
+            first_rows[client_number] = row
+
+    patient_ids = {}
+    for chunk in _chunked(list(first_rows), IN_CLAUSE_CHUNK_SIZE):
+        query = session.query(Patient.patient_id, Patient.client_number).filter(Patient.client_number.in_(chunk))
+        for patient_id, client_number in query:
+            patient_ids.setdefault(client_number, patient_id)
+
+    missing = [
+        new_patient(
+            client_name=row.get("Client", ""),
+            client_number=client_number,
+            mobile=row.get("Mobile", ""),
+            sex=row.get("Sex", ""),
+            gender_identity=row.get("Gender Identity", ""),
+            postcode=row.get("Postcode", ""),
+            state=row.get("State", "")
+        )
+        for client_number, row in first_rows.items()
+        if client_number not in patient_ids
+    ]
+    if missing:
+        session.add_all(missing)
+        session.flush()
+        for patient in missing:
+            patient_ids[patient.client_number] = patient.patient_id
+    return patient_ids
+
+def resolve_providers(session, names: List[str]) -> Dict[str, int]:
+    """
+    Resolve provider names to provider_ids in bulk, creating the missing providers.
+
+    Args:
+        session: Database session.
+        names: Practitioner names, duplicates allowed.
+
+    Returns:
+        A mapping of provider name to provider_id.
+    """
+    unique_names = list(dict.fromkeys(name for name in names if name))
+    provider_ids = {}
+    for chunk in _chunked(unique_names, IN_CLAUSE_CHUNK_SIZE):
+        query = session.query(Provider.provider_id, Provider.name).filter(Provider.name.in_(chunk))
+        for provider_id, name in query:
+            provider_ids.setdefault(name, provider_id)
+
+    missing = [
+        Provider(name=name, created_at=datetime.now(), updated_at=datetime.now())
+        for name in unique_names
+        if name not in provider_ids
+    ]
+    if missing:
+        session.add_all(missing)
+        session.flush()
+        for provider in missing:
+            provider_ids[provider.name] = provider.provider_id
+    return provider_ids
+
+def resolve_locations(session, names: List[str]) -> Dict[str, int]:
+    """
+    Resolve location names to location_ids in bulk, creating the missing locations.
+
+    Args:
+        session: Database session.
+        names: Location names, duplicates allowed.
+
+    Returns:
+        A mapping of location name to location_id.
+    """
+    unique_names = list(dict.fromkeys(name for name in names if name))
+    location_ids = {}
+    for chunk in _chunked(unique_names, IN_CLAUSE_CHUNK_SIZE):
+        query = session.query(Location.location_id, Location.name).filter(Location.name.in_(chunk))
+        for location_id, name in query:
+            location_ids.setdefault(name, location_id)
+
+    missing = [
+        Location(name=name, created_at=datetime.now(), updated_at=datetime.now())
+        for name in unique_names
+        if name not in location_ids
+    ]
+    if missing:
+        session.add_all(missing)
+        session.flush()
+        for location in missing:
+            location_ids[location.name] = location.location_id
+    return location_ids
+
+# Date and date-time formats accepted in the Date column, in order of preference
+DATETIME_FORMATS = [
+    "%m/%d/%Y %I:%M %p",  # 3/08/2025 11:00 AM (your CSV format)
+    "%d/%m/%Y",           # 31/12/2023
+    "%Y-%m-%d",           # 2023-12-31
+    "%d-%m-%Y",           # 31-12-2023
+    "%m/%d/%Y",           # 12/31/2023
+    "%d %b %Y",           # 31 Dec 2023
+    "%d %B %Y",           # 31 December 2023
+    "%d/%m/%Y %H:%M:%S",  # 31/12/2023 14:30:00
+    "%Y-%m-%d %H:%M:%S",  # 2023-12-31 14:30:00
+    "%d-%m-%Y %H:%M:%S",  # 31-12-2023 14:30:00
+    "%m/%d/%Y %H:%M:%S",  # 12/31/2023 14:30:00
+    "%d %b %Y %H:%M:%S",  # 31 Dec 2023 14:30:00
+    "%d %B %Y %H:%M:%S",  # 31 December 2023 14:30:00
+]
+
+# Time formats accepted in the End Time column, in order of preference
+TIME_FORMATS = [
+    "%H:%M",        # 13:30
+    "%I:%M %p",     # 1:30 PM
+    "%H.%M",        # 13.30
+    "%I.%M %p",     # 1.30 PM
+    "%H:%M:%S",     # 13:30:00
+    "%I:%M:%S %p",  # 1:30:00 PM
+]
+
+# Number of non-empty values sampled to infer the format of a date or time column
+FORMAT_SAMPLE_SIZE = 200
 
 def parse_datetime(date_str: str) -> datetime:
     """Parse a date string into a datetime object.
@@ -127,229 +285,1093 @@ def parse_datetime(date_str: str) -> datetime:
         A datetime object. Returns datetime.now() if parsing fails.
     """
     if not date_str:
-        print(f"parse_datetime: Empty date string, using default: {datetime.now()}")
+        logger.debug("parse_datetime: Empty date string, using the current time")
         return datetime.now()
 
     # Try different date and date-time formats
-    formats = [
-        "%m/%d/%Y %I:%M %p",  # 3/08/2025 11:00 AM (your CSV format)
-        "%d/%m/%Y",           # 31/12/2023
-        "%Y-%m-%d",           # 2023-12-31
-        "%d-%m-%Y",           # 31-12-2023
-        "%m/%d/%Y",           # 12/31/2023
-        "%d %b %Y",           # 31 Dec 2023
-        "%d %B %Y",           # 31 December 2023
-        "%d/%m/%Y %H:%M:%S",  # 31/12/2023 14:30:00
-        "%Y-%m-%d %H:%M:%S",  # 2023-12-31 14:30:00
-        "%d-%m-%Y %H:%M:%S",  # 31-12-2023 14:30:00
-        "%m/%d/%Y %H:%M:%S",  # 12/31/2023 14:30:00
-        "%d %b %Y %H:%M:%S",  # 31 Dec 2023 14:30:00
-        "%d %B %Y %H:%M:%S",  # 31 December 2023 14:30:00
-    ]
-
-    for fmt in formats:
+    for fmt in DATETIME_FORMATS:
         try:
             return datetime.strptime(date_str, fmt)
         except ValueError:
             continue  # Try the next format
 
-    print(f"parse_datetime: Failed to parse date '{date_str}', using default: {datetime.now()}")
+    logger.debug("parse_datetime: Failed to parse date %r, using the current time", date_str)
     return datetime.now()
 
 
-def parse_time(time_str):
-    """Parse time string into datetime.time object."""
+def parse_time(time_str: str) -> Optional[time]:
+    """Parse time string into datetime.time object.
+
+    Args:
+        time_str: The time string to parse (e.g., "13:30", "1:30 PM").
+
+    Returns:
+        A time object, or None if the string is empty or matches no format.
+    """
     if not time_str:
         return None
-    
+
     # Try different time formats
-    formats = [
-        "%H:%M",      # 13:30
-        "%I:%M %p",   # 1:30 PM
-        "%H.%M",      # 13.30
-        "%I.%M %p"    # 1.30 PM
-    ]
-    
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(time_str.strip(), fmt).time()
+        except ValueError:
+            continue
+
+    return None
+
+def infer_format(values: Iterable[str], formats: List[str]) -> Optional[str]:
+    """
+    Infer the format of a date or time column from a sample of its values.
+
+    Args:
+        values: Values of the column, empty values are ignored.
+        formats: Candidate strptime formats in order of preference.
+
+    Returns:
+        The format that parses the most sampled values, the earliest one on a tie,
+        or None if the sample is empty or no format parses any value.
+    """
+    sample = list(itertools.islice((value for value in values if value), FORMAT_SAMPLE_SIZE))
+    best_format, best_count = None, 0
     for fmt in formats:
+        count = 0
+        for value in sample:
+            try:
+                datetime.strptime(value, fmt)
+                count += 1
+            except ValueError:
+                pass
+        if count > best_count:
+            best_format, best_count = fmt, count
+        if count == len(sample):
+            break
+    return best_format
+
+def _parse_column(values: List[str], fmt: Optional[str], fallback: Callable[[str], Any]) -> List[Any]:
+    """Parse a column with one vectorized pass in ``fmt``, using ``fallback`` for values it rejects."""
+    if fmt is None:
+        return [fallback(value) for value in values]
+    parsed = pd.to_datetime(pd.Index(values, dtype=object), format=fmt, errors="coerce")
+    return [
+        fallback(value) if rejected else parsed_value
+        for value, rejected, parsed_value in zip(values, parsed.isna().tolist(), parsed.to_pydatetime().tolist())
+    ]
+
+def _parse_datetime_or_none(date_str: str) -> Optional[datetime]:
+    """Parse a date string with DATETIME_FORMATS, returning None instead of a default."""
+    for fmt in DATETIME_FORMATS:
         try:
-            
-            dt = datetime.strptime(fmt, "%H:%M:%S")  # Adjust format as needed
-            return dt.time()
+            return datetime.strptime(date_str, fmt)
         except ValueError:
             continue
-    
     return None
 
-def process_uploaded_appointments(file: UploadFile, has_headers: bool, session: Session) -> Dict[str, Any]:
+def parse_date_columns(
+    rows: List[Dict[str, str]],
+    formats: Dict[str, Optional[str]],
+    strict: bool = False
+) -> Tuple[List[Optional[datetime]], List[Optional[time]]]:
     """
-    Process a CSV file with patient appointment data and store appointments in the database.
+    Parse the Date and End Time columns of a batch of CSV rows.
+
+    The format of each column is inferred from the first batch that has values for it
+    and stored in ``formats``, so pass the same dictionary for every batch of a file.
+    Each column is then parsed in one vectorized pass, and only values that do not
+    match the inferred format go through parse_datetime and parse_time.
+
+    Args:
+        rows: A batch of parsed CSV rows.
+        formats: Formats inferred so far for this file, keyed by column name.
+        strict: Return None for dates that cannot be parsed instead of the current time.
+
+    Returns:
+        The appointment datetimes and end times of the rows, in row order.
+    """
+    dates = [row.get("Date") or "" for row in rows]
+    end_times = [row.get("End Time") or "" for row in rows]
+    if "Date" not in formats and any(dates):
+        formats["Date"] = infer_format(dates, DATETIME_FORMATS)
+    if "End Time" not in formats and any(end_times):
+        formats["End Time"] = infer_format((value.strip() for value in end_times), TIME_FORMATS)
+
+    appointment_datetimes = _parse_column(
+        dates, formats.get("Date"), _parse_datetime_or_none if strict else parse_datetime
+    )
+    parsed_end_times = _parse_column([value.strip() for value in end_times], formats.get("End Time"), parse_time)
+    return appointment_datetimes, [
+        value.time() if isinstance(value, datetime) else value for value in parsed_end_times
+    ]
+
+def coerce_enum(enum_cls, value, default=None):
+    """
+    Convert a free-text CSV value such as "Pending" or "No Show" to a member of ``enum_cls``.
+
+    Args:
+        enum_cls: The Enum class to convert to.
+        value: The raw value from the CSV file.
+        default: Returned when the value is empty.
+
+    Returns:
+        The matching enum member, or ``default`` for empty values.
+
+    Raises:
+        ValueError: If the value does not match any member by name or value.
+    """
+    if value is None or not value.strip():
+        return default
+    member = _enum_members(enum_cls).get(_enum_key(value))
+    if member is None:
+        raise ValueError(f"Invalid {enum_cls.__name__} value: {value}")
+    return member
+
+@functools.lru_cache(maxsize=None)
+def _enum_members(enum_cls) -> Dict[str, Any]:
+    """Map the lowercased values and names of an enum to its members, earlier members first."""
+    members = {}
+    for member in enum_cls:
+        members.setdefault(member.value.lower(), member)
+        members.setdefault(member.name.lower(), member)
+    return members
+
+@functools.lru_cache(maxsize=4096)
+def _enum_key(value: str) -> str:
+    """Normalize a CSV value for _enum_members, e.g. "No Show" to "no_show"."""
+    return re.sub(r'[\s\-]+', '_', value.strip()).lower()
+
+def appointment_fingerprint(row: Dict[str, str], appointment_datetime: datetime) -> str:
+    """
+    Identify the appointment of a CSV row across imports.
+
+    The fingerprint covers the client number, practitioner, location, appointment
+    datetime and invoice, so re-exports of the same appointment map to the same row.
+    """
+    key = [
+        row.get("Client Number") or "",
+        row.get("Practitioner") or "",
+        row.get("Location") or "",
+        appointment_datetime.isoformat(),
+        row.get("Invoice") or "",
+    ]
+    return hashlib.sha256("\x1f".join(value.strip() for value in key).encode("utf-8")).hexdigest()
+
+def row_content_hash(row: Dict[str, str]) -> str:
+    """Hash every column of a CSV row, to tell whether a re-imported appointment changed."""
+    values = [(row.get(column) or "").strip() for column in APPOINTMENT_CSV_COLUMNS]
+    return hashlib.sha256("\x1f".join(values).encode("utf-8")).hexdigest()
+
+def validate_appointment_row(
+    row: Dict[str, str],
+    appointment_datetime: Optional[datetime],
+    end_time: Optional[time],
+    upsert: bool = False
+) -> Tuple[List[str], List[str]]:
+    """
+    List every problem the import finds in a CSV row, see normalize_appointment_row.
+
+    Args:
+        row: A parsed CSV row keyed by APPOINTMENT_CSV_COLUMNS.
+        appointment_datetime: The Date column parsed with parse_date_columns in strict mode.
+        end_time: The End Time column parsed with parse_date_columns.
+        upsert: Whether the row is imported in upsert mode.
+
+    Returns:
+        The errors that make the import reject the row, and the warnings about values
+        the import replaces, both empty if the row is imported as it is.
+    """
+    errors = []
+    warnings = []
+    missing_fields = [field for field in REQUIRED_APPOINTMENT_FIELDS if not row.get(field)]
+    if missing_fields:
+        errors.append(f"Missing required fields: {', '.join(missing_fields)}")
+    if row.get("Date") and appointment_datetime is None:
+        if upsert:
+            errors.append(f"Invalid date: '{row['Date']}', the appointment cannot be matched across imports")
+        else:
+            warnings.append(f"Invalid date: '{row['Date']}', imported with the current time")
+    if (row.get("End Time") or "").strip() and end_time is None:
+        warnings.append(f"Invalid end time: '{row['End Time']}', imported as 00:00")
+    for enum_cls, column in ((AppointmentStatus, "Status"), (Gender, "Sex")):
+        try:
+            coerce_enum(enum_cls, row.get(column))
+        except ValueError as e:
+            errors.append(str(e))
+    return errors, warnings
+
+def normalize_appointment_row(
+    row: Dict[str, str],
+    appointment_datetime: Optional[datetime] = None,
+    end_time: Optional[time] = None,
+    upsert: bool = False
+) -> Dict[str, Any]:
+    """
+    Validate a CSV row and convert it to Appointment column values.
+
+    A Date that cannot be parsed is replaced by the current time, except with
+    ``upsert``: such a row would get a new fingerprint on every import, so it is
+    rejected instead. The import fingerprint is only set with ``upsert``, so plain
+    imports can insert the same appointment more than once, as they always did.
+
+    Args:
+        row: A parsed CSV row keyed by APPOINTMENT_CSV_COLUMNS.
+        appointment_datetime: The Date column already parsed by parse_date_columns
+            in strict mode, None if it could not be parsed.
+        end_time: The End Time column already parsed by parse_date_columns.
+        upsert: Whether the row is imported in upsert mode.
+
+    Returns:
+        A dictionary of Appointment field values, without the foreign keys.
+
+    Raises:
+        ValueError: If a required field is missing, an enum value is invalid, or the
+            date of an upserted row cannot be parsed.
+    """
+    appointment_datetime = appointment_datetime or _parse_datetime_or_none(row.get("Date") or "")
+    errors, _ = validate_appointment_row(row, appointment_datetime, end_time, upsert)
+    if errors:
+        raise ValueError("; ".join(errors))
+
+    appointment_datetime = appointment_datetime or parse_datetime(row.get("Date", ""))
+    return {
+        "appointment_datetime": appointment_datetime,
+        "end_time": end_time or parse_time(row.get("End Time", "")) or time(0, 0),
+        "appointment_type": row.get("Appointment Type", "Unknown"),
+        "appointment_subtype": row.get("Type", ""),
+        "invoice_number": row.get("Invoice", ""),
+        "notes": row.get("Appointment Notes", ""),
+        "flag": row.get("Appointment Flag", ""),
+        "status": coerce_enum(AppointmentStatus, row.get("Status"), AppointmentStatus.PENDING),
+        "client_type": row.get("Type", ""),
+        "sex": coerce_enum(Gender, row.get("Sex")),
+        "gender_identity": row.get("Gender Identity", ""),
+        "import_fingerprint": appointment_fingerprint(row, appointment_datetime) if upsert else None,
+        "import_hash": row_content_hash(row),
+    }
+
+class AppointmentCSVReader:
+    """
+    Stream the rows of an uploaded appointment CSV without loading the whole file.
+
+    The underlying binary file is wrapped in a text stream that decodes it incrementally
+    and strips a UTF-8 byte order mark. Headers are validated before the first row is
+    yielded. While iterating, ``tell()`` returns the position right after the last row
+    handed out, which can later be passed back as ``start_offset`` to continue from there.
 
     Args:
         file: The uploaded CSV file.
         has_headers: Whether the CSV file has headers in the first row.
-        session: Database session.
+        stats: Processing stats, updated with a row 0 error when headers are missing.
+        start_offset: Stream position returned by ``tell()`` to resume reading from.
+    """
+
+    def __init__(self, file: UploadFile, has_headers: bool, stats: Dict[str, Any], start_offset: Optional[int] = None):
+        self.file = file
+        self.has_headers = has_headers
+        self.stats = stats
+        self.start_offset = start_offset
+        self._stream: Optional[io.TextIOWrapper] = None
+        self._end_offset: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        self._stream = io.TextIOWrapper(self.file.file, encoding='utf-8-sig', newline='')
+        try:
+            first_line = self._stream.readline()
+            if not first_line:
+                return
+
+            if self.has_headers:
+                fieldnames = next(csv.reader([first_line]), [])
+                # Validate headers
+                missing_headers = set(APPOINTMENT_CSV_COLUMNS) - set(fieldnames)
+                if missing_headers:
+                    self.stats["errors"] += 1
+                    self.stats["error_details"].append({
+                        "row": 0,
+                        "error": f"Missing required headers: {missing_headers}"
+                    })
+                    return
+            else:
+                fieldnames = APPOINTMENT_CSV_COLUMNS
+
+            lines = iter(self._stream.readline, '')
+            if self.start_offset is not None:
+                self._stream.seek(self.start_offset)
+            elif not self.has_headers:
+                lines = itertools.chain([first_line], lines)
+            yield from csv.DictReader(lines, fieldnames=fieldnames)
+        finally:
+            # Remember where reading ended, then leave the uploaded file open for its owner
+            try:
+                self._end_offset = self._stream.tell()
+            except (OSError, ValueError):
+                self._end_offset = None
+            self._stream.detach()
+            self._stream = None
+
+    def tell(self) -> Optional[int]:
+        """Return the stream position after the last row that was yielded."""
+        if self._stream is None:
+            return self._end_offset
+        return self._stream.tell()
+
+def read_appointment_csv(
+    file: UploadFile,
+    has_headers: bool,
+    stats: Dict[str, Any],
+    start_offset: Optional[int] = None
+) -> Iterator[Dict[str, str]]:
+    """
+    Stream the rows of an uploaded appointment CSV, see AppointmentCSVReader.
+
+    Yields:
+        Each data row as a dictionary keyed by column name. Nothing is yielded if the
+        file is empty or its headers are invalid.
+    """
+    yield from AppointmentCSVReader(file, has_headers, stats, start_offset)
+
+def iter_batches(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most ``size`` items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def validate_appointment_csv(file: UploadFile, has_headers: bool, upsert: bool = False) -> Dict[str, Any]:
+    """
+    Check an appointment CSV without touching the database.
+
+    Every row goes through the same header, date and field checks as the import, see
+    validate_appointment_row, in memory. Rows the import would reject are errors, and
+    values it would replace, such as dates that cannot be parsed in a plain import, are
+    warnings. Rows for the same appointment as an earlier row of the file are warnings
+    too: with ``upsert`` only the last of them is imported.
+
+    Args:
+        file: The uploaded CSV file.
+        has_headers: Whether the CSV file has headers in the first row.
+        upsert: Check the file as an upsert import would.
 
     Returns:
-        A dictionary containing processing stats (total_processed, created, errors, error_details).
+        A dictionary containing validation stats (total_processed, valid, errors,
+        error_details, warnings, warning_details, duplicates, date_formats).
+        error_details lists every invalid row and warning_details every row with warnings.
     """
-    # Track stats
     stats = {
         "total_processed": 0,
-        "created": 0,
+        "valid": 0,
         "errors": 0,
-        "error_details": []
+        "error_details": [],
+        "warnings": 0,
+        "warning_details": [],
+        "duplicates": 0
     }
+    date_formats = {}
+    # Row number of the first row of each appointment
+    first_rows = {}
+    metrics = StageMetrics("appointment validation")
 
     try:
-        # Read the CSV file content
-        contents = file.file.read()
-        if not contents:
-            return stats
+        for batch in iter_batches(read_appointment_csv(file, has_headers, stats), IMPORT_BATCH_SIZE):
+            with metrics.stage("parse"):
+                appointment_datetimes, end_times = parse_date_columns(batch, date_formats, strict=True)
+            for row, appointment_datetime, end_time in zip(batch, appointment_datetimes, end_times):
+                stats["total_processed"] += 1
+                errors, warnings = validate_appointment_row(row, appointment_datetime, end_time, upsert)
+                if errors:
+                    stats["errors"] += 1
+                    stats["error_details"].append({
+                        "row": stats["total_processed"],
+                        "error": "; ".join(errors)
+                    })
+                    continue
+                stats["valid"] += 1
+                if appointment_datetime is not None:
+                    fingerprint = appointment_fingerprint(row, appointment_datetime)
+                    first_row = first_rows.setdefault(fingerprint, stats["total_processed"])
+                    if first_row != stats["total_processed"]:
+                        stats["duplicates"] += 1
+                        warnings.append(
+                            f"Same appointment as row {first_row}, "
+                            + ("only the last of these rows is imported" if upsert else "each of these rows is imported")
+                        )
+                if warnings:
+                    stats["warnings"] += 1
+                    stats["warning_details"].append({
+                        "row": stats["total_processed"],
+                        "warning": "; ".join(warnings)
+                    })
+    except Exception as e:
+        stats["errors"] += 1
+        stats["error_details"].append({
+            "row": 0,
+            "error": f"Failed to process CSV file: {str(e)}"
+        })
 
-        # Decode and parse CSV
-        decoded_content = contents.decode('utf-8-sig')  # Handle potential BOM
-        csv_data = io.StringIO(decoded_content)
-
-        # Parse CSV using DictReader
-        if has_headers:
-            reader = csv.DictReader(csv_data)
-            # Validate headers
-            required_headers = {
-                'Client', 'Client Number', 'Mobile', 'Sex', 'Gender Identity',
-                'Postcode', 'State', 'Practitioner', 'Location', 'Date',
-                'End Time', 'Appointment Type', 'Type', 'Invoice',
-                'Appointment Notes', 'Appointment Flag', 'Status'
-            }
-            actual_headers = set(reader.fieldnames) if reader.fieldnames else set()
-            if not required_headers.issubset(actual_headers):
-                missing_headers = required_headers - actual_headers
-                stats["errors"] += 1
-                stats["error_details"].append({
-                    "row": 0,
-                    "error": f"Missing required headers: {missing_headers}"
-                })
-                return stats
-        else:
-            default_columns = [
-                'Client', 'Client Number', 'Mobile', 'Sex', 'Gender Identity',
-                'Postcode', 'State', 'Practitioner', 'Location', 'Date',
-                'End Time', 'Appointment Type', 'Type', 'Invoice',
-                'Appointment Notes', 'Appointment Flag', 'Status'
-            ]
-            reader = csv.DictReader(csv_data, fieldnames=default_columns)
-
-        # Store appointments temporarily
-        appointments_to_create = []
-
-        # Process each row
-        for row in reader:
+    stats["date_formats"] = date_formats
+    _log_summary(metrics, stats)
+    return stats
+
+def _build_appointments(
+    session,
+    rows: List[Dict[str, str]],
+    stats: Dict[str, Any],
+    bulk_resolve: bool,
+    date_formats: Dict[str, Optional[str]],
+    upsert: bool = False,
+    metrics: Optional[StageMetrics] = None
+) -> List[Appointment]:
+    """
+    Validate a batch of CSV rows and build their Appointment objects.
+
+    Rows that fail validation or entity resolution are recorded in ``stats``
+    and left out of the returned list. ``date_formats`` holds the date formats
+    inferred for the file, see parse_date_columns.
+
+    With ``upsert``, rows whose appointment was already imported with the same
+    content are counted as skipped before any patient, provider or location is
+    resolved, and only the last row of each appointment in the batch is kept.
+
+    Time spent parsing, looking up unchanged rows, resolving and building is added
+    to the stages of ``metrics``.
+    """
+    metrics = metrics or StageMetrics("appointment batch")
+    with metrics.stage("parse"):
+        appointment_datetimes, end_times = parse_date_columns(rows, date_formats, strict=True)
+
+    with metrics.stage("lookup"):
+        unchanged = _find_unchanged_rows(session, rows, appointment_datetimes) if upsert else set()
+    pending_rows = [row for index, row in enumerate(rows) if index not in unchanged]
+
+    # In bulk mode resolve every distinct patient, provider and location of the batch up front
+    if bulk_resolve:
+        with metrics.stage("resolve"):
+            patient_ids = resolve_patients(session, pending_rows)
+            provider_ids = resolve_providers(session, [row.get("Practitioner") for row in pending_rows])
+            location_ids = resolve_locations(session, [row.get("Location") for row in pending_rows])
+
+    with metrics.stage("build"):
+        appointments = []
+        for index, (row, appointment_datetime, end_time) in enumerate(zip(rows, appointment_datetimes, end_times)):
             try:
                 stats["total_processed"] += 1
+                if index in unchanged:
+                    stats["skipped"] += 1
+                    continue
 
-                # Validate required fields
-                required_fields = {
-                    'Client': row.get('Client'),
-                    'Client Number': row.get('Client Number'),
-                    'Practitioner': row.get('Practitioner'),
-                    'Location': row.get('Location'),
-                    'Date': row.get('Date')
-                }
-                
-                missing_fields = [field for field, value in required_fields.items() if not value]
-                if missing_fields:
-                    raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+                # Validate required fields and parse enums
+                fields = normalize_appointment_row(row, appointment_datetime, end_time, upsert)
 
-                # Get or create patient
-                patient = get_or_create_patient(
-                    session=session,
-                    client_name=row.get("Client", ""),
-                    client_number=row.get("Client Number", ""),
-                    mobile=row.get("Mobile", ""),
-                    sex=row.get("Sex", ""),
-                    gender_identity=row.get("Gender Identity", ""),
-                    postcode=row.get("Postcode", ""),
-                    state=row.get("State", "")
-                )
-                if patient is None:
-                    raise ValueError(f"Failed to get or create patient for name: {row.get('Client', '')}")
-                print(f"finished checking patient {patient}, patient_id={patient.patient_id}")
+                if bulk_resolve:
+                    patient_id = patient_ids[row["Client Number"]]
+                    provider_id = provider_ids[row["Practitioner"]]
+                    location_id = location_ids[row["Location"]]
+                else:
+                    # Get or create patient
+                    patient = get_or_create_patient(
+                        session=session,
+                        client_name=row.get("Client", ""),
+                        client_number=row.get("Client Number", ""),
+                        mobile=row.get("Mobile", ""),
+                        sex=row.get("Sex", ""),
+                        gender_identity=row.get("Gender Identity", ""),
+                        postcode=row.get("Postcode", ""),
+                        state=row.get("State", "")
+                    )
+                    if patient is None:
+                        raise ValueError(f"Failed to get or create patient for name: {row.get('Client', '')}")
 
-                # Get or create provider
-                print('row.get("Practitioner", ""):', row.get("Practitioner", ""))
-                provider = get_or_create_provider(session=session, name=row.get("Practitioner", ""))
-                if provider is None:
-                    raise ValueError(f"Failed to get or create provider for name: {row.get('Practitioner', '')}")
-                print(f"finished checking provider {provider}")
+                    # Get or create provider
+                    provider = get_or_create_provider(session=session, name=row.get("Practitioner", ""))
+                    if provider is None:
+                        raise ValueError(f"Failed to get or create provider for name: {row.get('Practitioner', '')}")
 
-                # Get or create location
-                location = get_or_create_location(session=session, location_name=row.get("Location", ""))
-                if location is None:
-                    raise ValueError(f"Failed to get or create location for name: {row.get('Location', '')}")
-                print(f"finished checking location {location}")
+                    # Get or create location
+                    location = get_or_create_location(session=session, location_name=row.get("Location", ""))
+                    if location is None:
+                        raise ValueError(f"Failed to get or create location for name: {row.get('Location', '')}")
 
-                # Parse appointment date and time
-                parsed_datetime = parse_datetime(row.get("Date", ""))
-                print(f"Parsed datetime: {parsed_datetime}")
-                appointment_datetime = parsed_datetime
-                print(f"Final appointment_datetime: {appointment_datetime}")
-                end_time = parse_time(row.get("End Time", "")) or time(0, 0)
+                    patient_id = patient.patient_id
+                    provider_id = provider.provider_id
+                    location_id = location.location_id
 
                 # Create appointment
                 appointment = Appointment(
-                    patient_id=patient.patient_id,
-                    practitioner_id=provider.provider_id,
-                    location_id=location.location_id,
-                    appointment_datetime=appointment_datetime,
-                    end_time=end_time,
-                    appointment_type=row.get("Appointment Type", "Unknown"),
-                    appointment_subtype=row.get("Type", ""),
-                    invoice_number=row.get("Invoice", ""),
-                    notes=row.get("Appointment Notes", ""),
-                    flag=row.get("Appointment Flag", ""),
-                    status=row.get("Status", "Pending"),
-                    client_type=row.get("Type", ""),
-                    sex=row.get("Sex", ""),
-                    gender_identity=row.get("Gender Identity", ""),
+                    patient_id=patient_id,
+                    provider_id=provider_id,
+                    location_id=location_id,
                     created_at=datetime.now(),
-                    updated_at=datetime.now()
+                    updated_at=datetime.now(),
+                    **fields
                 )
 
-                appointments_to_create.append(appointment)
-                print(f"finished checking appointment {appointment}")
+                appointments.append(appointment)
 
             except Exception as e:
-                print(f"Error at row {stats['total_processed']}: {str(e)}")
+                logger.debug("Error at row %d: %s", stats["total_processed"], e)
                 stats["errors"] += 1
                 stats["error_details"].append({
                     "row": stats["total_processed"],
                     "error": str(e)
                 })
 
-        # Add all appointments and commit only if there are no errors
-        if stats["errors"] == 0:
-            for appointment in appointments_to_create:
-                session.add(appointment)
-            try:
+    if upsert:
+        # A file can list the same appointment twice, the last row wins
+        latest = {appointment.import_fingerprint: appointment for appointment in appointments}
+        stats["skipped"] += len(appointments) - len(latest)
+        appointments = list(latest.values())
+    metrics.count("batches")
+    return appointments
+
+def _find_unchanged_rows(session, rows: List[Dict[str, str]], appointment_datetimes: List[Optional[datetime]]) -> set:
+    """
+    Find the rows of a batch whose appointment was already imported with the same content.
+
+    Existing fingerprints are looked up with chunked IN queries on the unique
+    import_fingerprint index. Rows whose date could not be parsed have no fingerprint
+    and are never unchanged.
+
+    Returns:
+        The indexes of the unchanged rows.
+    """
+    fingerprints = [
+        appointment_fingerprint(row, appointment_datetime) if appointment_datetime else None
+        for row, appointment_datetime in zip(rows, appointment_datetimes)
+    ]
+    existing_hashes = {}
+    for chunk in _chunked([fingerprint for fingerprint in set(fingerprints) if fingerprint], IN_CLAUSE_CHUNK_SIZE):
+        query = session.query(Appointment.import_fingerprint, Appointment.import_hash).filter(
+            Appointment.import_fingerprint.in_(chunk)
+        )
+        existing_hashes.update(query)
+
+    return {
+        index for index, (row, fingerprint) in enumerate(zip(rows, fingerprints))
+        if fingerprint in existing_hashes and existing_hashes[fingerprint] == row_content_hash(row)
+    }
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+def _upsert_appointments(session, appointments: List[Appointment]) -> Tuple[int, int]:
+    """
+    Insert appointments, updating in place the ones whose import fingerprint already exists.
+
+    Returns:
+        The number of appointments created and updated.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        raise ValueError(f"Upsert imports are not supported on {dialect}")
+
+    fingerprints = [appointment.import_fingerprint for appointment in appointments]
+    updated = 0
+    for chunk in _chunked(fingerprints, IN_CLAUSE_CHUNK_SIZE):
+        updated += session.query(Appointment.appointment_id).filter(
+            Appointment.import_fingerprint.in_(chunk)
+        ).count()
+
+    table = Appointment.__table__
+    statement = UPSERT_DIALECTS[dialect](table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.import_fingerprint],
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if column.name not in ("appointment_id", "import_fingerprint", "created_at")
+        }
+    )
+    session.execute(statement, [appointment.model_dump(exclude={"appointment_id"}) for appointment in appointments])
+    return len(appointments) - updated, updated
+
+def _write_appointments(session, appointments: List[Appointment], upsert: bool) -> Tuple[int, int]:
+    """
+    Write a batch of appointments to the session and flush it.
+
+    Returns:
+        The number of appointments created and updated.
+    """
+    if not appointments:
+        return 0, 0
+    if upsert:
+        return _upsert_appointments(session, appointments)
+    for appointment in appointments:
+        session.add(appointment)
+    session.flush()
+    return len(appointments), 0
+
+def _log_summary(metrics: StageMetrics, stats: Dict[str, Any], **fields):
+    """Log the row counts of ``stats`` and the stage timings of ``metrics`` as one INFO line."""
+    counts = {
+        key: value for key, value in stats.items()
+        if isinstance(value, int) and not isinstance(value, bool)
+    }
+    metrics.log_summary(logger, **fields, **counts)
+
+def _import_in_chunks(
+    file: UploadFile,
+    has_headers: bool,
+    session: Session,
+    stats: Dict[str, Any],
+    bulk_resolve: bool,
+    commit_every: int,
+    resume_from: Optional[Dict[str, int]],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+    checkpoint_callback: Optional[Callable[[Dict[str, Any]], None]],
+    upsert: bool,
+    metrics: StageMetrics
+) -> Dict[str, Any]:
+    """
+    Import an appointment CSV committing every ``commit_every`` rows.
+
+    Each chunk is written inside a savepoint and committed on its own, so locks on the
+    appointment, patient, provider and location tables are only held for one chunk at a
+    time. Rows that fail validation are reported and skipped. If writing a chunk fails,
+    only that chunk is rolled back and the import stops with the checkpoint still pointing
+    at the start of the chunk, so resuming retries it.
+    """
+    reader = AppointmentCSVReader(file, has_headers, stats, resume_from["offset"] if resume_from else None)
+    stats["checkpoint"] = dict(resume_from) if resume_from else {"row": 0, "offset": None}
+    stats["total_processed"] = stats["checkpoint"]["row"]
+    date_formats = {}
+    stats["aborted"] = False
+
+    for batch in iter_batches(reader, commit_every):
+        chunk_start = stats["total_processed"]
+        errors_before = stats["errors"]
+        skipped_before = stats["skipped"]
+        details_before = len(stats["error_details"])
+        try:
+            with session.begin_nested():
+                appointments = _build_appointments(session, batch, stats, bulk_resolve, date_formats, upsert, metrics)
+                with metrics.stage("write"):
+                    created, updated = _write_appointments(session, appointments, upsert)
+            with metrics.stage("commit"):
                 session.commit()
-                stats["created"] = len(appointments_to_create)
-            except Exception as e:
-                session.rollback()
-                stats["errors"] += len(appointments_to_create)
-                for i in range(len(appointments_to_create)):
+        except Exception as e:
+            session.rollback()
+            # Nothing of this chunk was written, report each of its rows once as a database error
+            del stats["error_details"][details_before:]
+            stats["skipped"] = skipped_before
+            stats["total_processed"] = chunk_start + len(batch)
+            stats["errors"] = errors_before + len(batch)
+            for i in range(len(batch)):
+                stats["error_details"].append({
+                    "row": chunk_start + i + 1,
+                    "error": f"Database error: {str(e)}"
+                })
+            stats["aborted"] = True
+            break
+
+        stats["created"] += created
+        stats["updated"] += updated
+        stats["checkpoint"] = {"row": stats["total_processed"], "offset": reader.tell()}
+        if checkpoint_callback:
+            checkpoint_callback(stats)
+        if progress_callback:
+            progress_callback(stats)
+
+    return stats
+
+def process_uploaded_appointments(
+    file: UploadFile,
+    has_headers: bool,
+    session: Session,
+    bulk_resolve: bool = False,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    commit_every: Optional[int] = None,
+    resume_from: Optional[Dict[str, int]] = None,
+    checkpoint_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    upsert: bool = False,
+    validate_only: bool = False
+) -> Dict[str, Any]:
+    """
+    Process a CSV file with patient appointment data and store appointments in the database.
+
+    The file is streamed and handled in batches of IMPORT_BATCH_SIZE rows: each batch is
+    validated, added to the session and flushed, so memory stays flat regardless of file
+    size. By default the import is all-or-nothing: the transaction is only committed if no
+    row failed, otherwise every flushed batch is rolled back.
+
+    With ``commit_every`` the file is committed in chunks of that many rows instead, see
+    _import_in_chunks. Invalid rows are reported and skipped, and after every chunk the
+    stats carry a checkpoint that continues an interrupted import when it is passed back
+    as ``resume_from``.
+
+    With ``upsert``, every appointment stores a fingerprint of its CSV row, and
+    re-importing an appointment skips it if its row is unchanged and updates it in place
+    otherwise, so overlapping exports can be uploaded repeatedly without creating
+    duplicates. Rows whose date cannot be parsed are rejected in this mode, see
+    normalize_appointment_row.
+
+    Args:
+        file: The uploaded CSV file.
+        has_headers: Whether the CSV file has headers in the first row.
+        session: Database session.
+        bulk_resolve: Resolve the patients, providers and locations of each batch with a
+            constant number of bulk queries instead of looking them up row by row.
+        progress_callback: Called with the running stats after every batch.
+        commit_every: Commit every this many rows instead of once for the whole file.
+        resume_from: Checkpoint of an earlier chunked run to continue from. Row numbers
+            in the stats continue from the checkpoint row.
+        checkpoint_callback: Called with the running stats after every committed chunk,
+            their ``checkpoint`` is a {"row", "offset"} dictionary for ``resume_from``.
+        upsert: Update or skip appointments that were imported before instead of
+            inserting them again.
+        validate_only: Only check the file, without using the session, and return
+            the report of validate_appointment_csv.
+
+    Returns:
+        A dictionary containing processing stats (total_processed, created, updated,
+        skipped, errors, error_details).
+        In chunked mode it also holds the last ``checkpoint`` and ``aborted``, which is True
+        when a chunk could not be written and the import stopped early.
+
+        One INFO summary line with the counts and the time spent in each stage is
+        logged per import.
+    """
+    if validate_only:
+        return validate_appointment_csv(file, has_headers, upsert)
+
+    # Track stats
+    stats = {
+        "total_processed": 0,
+        "created": 0,
+        "updated": 0,
+        "skipped": 0,
+        "errors": 0,
+        "error_details": []
+    }
+
+    metrics = StageMetrics("appointment import")
+    try:
+        if commit_every:
+            return _import_in_chunks(
+                file, has_headers, session, stats, bulk_resolve, commit_every,
+                resume_from, progress_callback, checkpoint_callback, upsert, metrics
+            )
+
+        staged_created = staged_updated = 0
+        date_formats = {}
+        rows = read_appointment_csv(file, has_headers, stats)
+        for batch in iter_batches(rows, IMPORT_BATCH_SIZE):
+            appointments = _build_appointments(session, batch, stats, bulk_resolve, date_formats, upsert, metrics)
+
+            # Once a row has failed the file is rejected, keep validating but stop writing
+            if not stats["errors"] and appointments:
+                with metrics.stage("write"):
+                    created, updated = _write_appointments(session, appointments, upsert)
+                staged_created += created
+                staged_updated += updated
+
+            if progress_callback:
+                progress_callback(stats)
+
+        # Commit only if there are no errors
+        if stats["errors"]:
+            session.rollback()
+            return stats
+
+        staged = staged_created + staged_updated
+        try:
+            with metrics.stage("commit"):
+                session.commit()
+            stats["created"] = staged_created
+            stats["updated"] = staged_updated
+        except Exception as e:
+            session.rollback()
+            stats["errors"] += staged
+            for i in range(staged):
+                stats["error_details"].append({
+                    "row": i + 1,
+                    "error": f"Database error: {str(e)}"
+                })
+            stats["created"] = 0
+
+    except Exception as e:
+        # Roll back the session on error
+        session.rollback()
+        if commit_every:
+            stats["aborted"] = True
+        stats["errors"] += 1
+        stats["error_details"].append({
+            "row": 0,
+            "error": f"Failed to process CSV file: {str(e)}"
+        })
+    finally:
+        _log_summary(
+            metrics, stats,
+            mode="chunked" if commit_every else "bulk" if bulk_resolve else "row", upsert=upsert
+        )
+
+    return stats
+
+STAGING_TABLE = "appointment_import_staging"
+
+# Columns of the staging table, in the order rows are written to COPY
+STAGING_COLUMNS = [
+    ("row_number", "integer"),
+    ("first_name", "text"),
+    ("last_name", "text"),
+    ("client_number", "text"),
+    ("state", "text"),
+    ("phone", "text"),
+    ("zipcode", "text"),
+    ("practitioner", "text"),
+    ("location", "text"),
+    ("appointment_datetime", "timestamp"),
+    ("end_time", "time"),
+    ("appointment_type", "text"),
+    ("appointment_subtype", "text"),
+    ("invoice_number", "text"),
+    ("notes", "text"),
+    ("flag", "text"),
+    ("status", "text"),
+    ("client_type", "text"),
+    ("sex", "text"),
+    ("gender_identity", "text"),
+    ("import_fingerprint", "text"),
+    ("import_hash", "text"),
+]
+
+def staging_record(row_number: int, row: Dict[str, str], fields: Dict[str, Any]) -> List[Any]:
+    """
+    Build one staging table record from a CSV row and its normalized Appointment fields.
+
+    Enum columns are staged by member name, which is how SQLAlchemy stores them. The
+    patient columns match the ones new_patient sets, the patient's gender is the
+    staged sex.
+    """
+    first_name, last_name = split_client_name(row.get("Client", ""))
+    return [
+        row_number,
+        first_name,
+        last_name,
+        row.get("Client Number"),
+        row.get("State", ""),
+        row.get("Mobile", ""),
+        row.get("Postcode", ""),
+        row.get("Practitioner"),
+        row.get("Location"),
+        fields["appointment_datetime"].isoformat(sep=" "),
+        fields["end_time"].isoformat(),
+        fields["appointment_type"],
+        fields["appointment_subtype"],
+        fields["invoice_number"],
+        fields["notes"],
+        fields["flag"],
+        fields["status"].name,
+        fields["client_type"],
+        fields["sex"].name if fields["sex"] else None,
+        fields["gender_identity"],
+        fields["import_fingerprint"],
+        fields["import_hash"],
+    ]
+
+def _copy_field(value: Any) -> str:
+    """Format a value for COPY's CSV format: None as an unquoted empty field, which is NULL, anything else quoted."""
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _copy_records(cursor, records: List[List[Any]]):
+    """Send a chunk of staging records to the staging table with COPY FROM STDIN."""
+    buffer = io.StringIO()
+    for record in records:
+        # Quoted empty strings stay empty strings, as the ORM path stores them
+        buffer.write(",".join(_copy_field(value) for value in record) + "\n")
+    buffer.seek(0)
+    columns = ", ".join(name for name, _ in STAGING_COLUMNS)
+    cursor.copy_expert(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def _merge_staged_appointments(session, upsert: bool = False) -> Tuple[int, int]:
+    """
+    Create the missing patients, providers and locations from the staging table
+    and insert the staged appointments with set-based statements.
+
+    With ``upsert``, staged rows whose appointment was already imported with the same
+    content are dropped first, and the remaining ones update their existing appointment
+    through ON CONFLICT on the import fingerprint.
+
+    Returns:
+        The number of appointments created and updated.
+    """
+    status_type = Appointment.__table__.c.status.type.name
+    gender_type = Appointment.__table__.c.sex.type.name
+    patient_gender_type = Patient.__table__.c.gender.type.name
+
+    if upsert:
+        session.execute(text(f"""
+            DELETE FROM {STAGING_TABLE} s
+            USING appointments a
+            WHERE a.import_fingerprint = s.import_fingerprint AND a.import_hash = s.import_hash
+        """))
+
+    session.execute(text(f"""
+        INSERT INTO providers (name, created_at, updated_at)
+        SELECT DISTINCT s.practitioner, LOCALTIMESTAMP, LOCALTIMESTAMP
+        FROM {STAGING_TABLE} s
+        ON CONFLICT (name) DO NOTHING
+    """))
+    # patients.client_number and locations.name carry no unique constraint, so ON CONFLICT
+    # cannot be used and missing rows are detected with NOT EXISTS instead
+    session.execute(text(f"""
+        INSERT INTO locations (name, created_at, updated_at)
+        SELECT DISTINCT s.location, LOCALTIMESTAMP, LOCALTIMESTAMP
+        FROM {STAGING_TABLE} s
+        WHERE NOT EXISTS (SELECT 1 FROM locations l WHERE l.name = s.location)
+    """))
+    session.execute(text(f"""
+        INSERT INTO patients (first_name, last_name, client_number, state, phone, zipcode, gender, created_at, updated_at)
+        SELECT DISTINCT ON (s.client_number) s.first_name, s.last_name, s.client_number, s.state,
+               s.phone, s.zipcode, CAST(s.sex AS {patient_gender_type}), LOCALTIMESTAMP, LOCALTIMESTAMP
+        FROM {STAGING_TABLE} s
+        WHERE NOT EXISTS (SELECT 1 FROM patients p WHERE p.client_number = s.client_number)
+        ORDER BY s.client_number, s.row_number
+    """))
+    update_columns = [
+        column.name for column in Appointment.__table__.columns
+        if column.name not in ("appointment_id", "import_fingerprint", "created_at")
+    ]
+    if upsert:
+        # ON CONFLICT cannot touch a row twice in one statement, keep the last row of each appointment
+        staged_rows = f"""(
+            SELECT DISTINCT ON (import_fingerprint) * FROM {STAGING_TABLE}
+            ORDER BY import_fingerprint, row_number DESC
+        )"""
+        on_conflict = "ON CONFLICT (import_fingerprint) DO UPDATE SET " + ", ".join(
+            f"{name} = EXCLUDED.{name}" for name in update_columns
+        )
+    else:
+        staged_rows = STAGING_TABLE
+        on_conflict = ""
+    result = session.execute(text(f"""
+        INSERT INTO appointments (
+            patient_id, provider_id, location_id, appointment_datetime, end_time,
+            appointment_type, appointment_subtype, invoice_number, notes, flag, status,
+            client_type, sex, gender_identity, import_fingerprint, import_hash, created_at, updated_at
+        )
+        SELECT p.patient_id, pr.provider_id, l.location_id, s.appointment_datetime, s.end_time,
+               s.appointment_type, s.appointment_subtype, s.invoice_number, s.notes, s.flag,
+               CAST(s.status AS {status_type}), s.client_type, CAST(s.sex AS {gender_type}),
+               s.gender_identity, s.import_fingerprint, s.import_hash, LOCALTIMESTAMP, LOCALTIMESTAMP
+        FROM {staged_rows} s
+        JOIN providers pr ON pr.name = s.practitioner
+        JOIN LATERAL (
+            SELECT patient_id FROM patients WHERE client_number = s.client_number
+            ORDER BY patient_id LIMIT 1
+        ) p ON TRUE
+        JOIN LATERAL (
+            SELECT location_id FROM locations WHERE name = s.location
+            ORDER BY location_id LIMIT 1
+        ) l ON TRUE
+        ORDER BY s.row_number
+        {on_conflict}
+        RETURNING (xmax = 0) AS inserted
+    """))
+    # xmax is only set on rows that already existed and were updated
+    inserted = [row.inserted for row in result]
+    created = sum(inserted)
+    return created, len(inserted) - created
+
+def copy_load_appointments(file: UploadFile, has_headers: bool, session: Session, upsert: bool = False) -> Dict[str, Any]:
+    """
+    Bulk-load a CSV file of appointments through a PostgreSQL staging table.
+
+    Rows are validated and parsed in Python, streamed into a temporary table with
+    COPY FROM STDIN, and merged into patients, providers, locations and appointments
+    with set-based INSERT ... SELECT statements. Like process_uploaded_appointments,
+    nothing is written if any row fails validation. Databases other than PostgreSQL
+    fall back to process_uploaded_appointments in bulk_resolve mode.
+
+    Args:
+        file: The uploaded CSV file.
+        has_headers: Whether the CSV file has headers in the first row.
+        session: Database session.
+        upsert: Update or skip appointments that were imported before instead of
+            inserting them again.
+
+    Returns:
+        A dictionary containing processing stats (total_processed, created, updated,
+        skipped, errors, error_details).
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return process_uploaded_appointments(file, has_headers, session, bulk_resolve=True, upsert=upsert)
+
+    stats = {
+        "total_processed": 0,
+        "created": 0,
+        "updated": 0,
+        "skipped": 0,
+        "errors": 0,
+        "error_details": []
+    }
+
+    metrics = StageMetrics("appointment import")
+    try:
+        columns = ", ".join(f"{name} {column_type}" for name, column_type in STAGING_COLUMNS)
+        session.execute(text(f"CREATE TEMP TABLE {STAGING_TABLE} ({columns}) ON COMMIT DROP"))
+        cursor = session.connection().connection.cursor()
+
+        staged = 0
+        date_formats = {}
+        for batch in iter_batches(read_appointment_csv(file, has_headers, stats), COPY_CHUNK_ROWS):
+            records = []
+            with metrics.stage("parse"):
+                appointment_datetimes, end_times = parse_date_columns(batch, date_formats, strict=True)
+            for row, appointment_datetime, end_time in zip(batch, appointment_datetimes, end_times):
+                stats["total_processed"] += 1
+                try:
+                    fields = normalize_appointment_row(row, appointment_datetime, end_time, upsert)
+                except Exception as e:
+                    stats["errors"] += 1
                     stats["error_details"].append({
-                        "row": i + 1,
-                        "error": f"Database error: {str(e)}"
+                        "row": stats["total_processed"],
+                        "error": str(e)
                     })
-                stats["created"] = 0
+                    continue
+                if stats["errors"]:
+                    # The file will be rejected, keep validating but stop staging rows
+                    continue
+                records.append(staging_record(stats["total_processed"], row, fields))
+            if records and not stats["errors"]:
+                with metrics.stage("copy"):
+                    _copy_records(cursor, records)
+                staged += len(records)
+
+        if stats["errors"] or not stats["total_processed"]:
+            session.rollback()
+            return stats
+
+        try:
+            with metrics.stage("merge"):
+                stats["created"], stats["updated"] = _merge_staged_appointments(session, upsert)
+            with metrics.stage("commit"):
+                session.commit()
+            stats["skipped"] = staged - stats["created"] - stats["updated"]
+        except Exception as e:
+            session.rollback()
+            stats["errors"] += staged
+            for i in range(staged):
+                stats["error_details"].append({
+                    "row": i + 1,
+                    "error": f"Database error: {str(e)}"
+                })
+            stats["created"] = 0
 
     except Exception as e:
-        # Roll back the session on error
         session.rollback()
         stats["errors"] += 1
         stats["error_details"].append({
             "row": 0,
             "error": f"Failed to process CSV file: {str(e)}"
         })
+    finally:
+        _log_summary(metrics, stats, mode="copy", upsert=upsert)
 
     return stats
 
@@ -0,0 +1,237 @@
+"""
+Extract authorization data from many PDFs in one pass.
+
+Documents come from a zip file or a directory and are extracted in parallel by a
+bounded thread pool, or by the API's extraction executor (see extraction_queue). One JSON
+result per document is streamed as it finishes, followed by a summary line, so the
+output of a large batch can be followed while it runs.
+
+Usage:
+    python -m batch_extract faxes.zip > results.ndjson
+    python -m batch_extract /srv/faxes/2025-03-08 --save --workers 8
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import zipfile
+
+from extraction_queue import ExtractionExecutor, ExtractionQueueFull
+
+logger = logging.getLogger(__name__)
+
+# Documents extracted at the same time, OCR itself is bounded by OCR_POOL_WORKERS
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", "4"))
+
+# Documents saved per database transaction
+BATCH_SAVE_SIZE = int(os.getenv("BATCH_SAVE_SIZE", "50"))
+
+# Largest PDF accepted from a batch, larger ones are reported as errors
+MAX_BATCH_PDF_BYTES = int(os.getenv("MAX_BATCH_PDF_BYTES", str(50 * 1024 * 1024)))
+
+# Largest zip file accepted by the batch extraction API
+MAX_BATCH_ARCHIVE_BYTES = int(os.getenv("MAX_BATCH_ARCHIVE_BYTES", str(500 * 1024 * 1024)))
+
+# Seconds to wait before submitting again when a shared executor turned a document away
+BATCH_RETRY_SECONDS = 0.5
+
+def iter_pdf_documents(source: Union[str, BinaryIO]) -> Iterator[Tuple[str, Union[bytes, Exception]]]:
+    """
+    Read the PDFs of a directory or a zip file, in name order.
+
+    Args:
+        source: Path of a directory or zip file, or an open zip file.
+
+    Yields:
+        The name and content of each PDF. Files that cannot be read are yielded
+        with the exception instead of their content.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        paths = []
+        for directory, _, filenames in os.walk(source):
+            paths.extend(os.path.join(directory, name) for name in filenames if name.lower().endswith(".pdf"))
+        for path in sorted(paths):
+            name = os.path.relpath(path, source)
+            if os.path.getsize(path) > MAX_BATCH_PDF_BYTES:
+                yield name, ValueError(f"File is larger than {MAX_BATCH_PDF_BYTES} bytes")
+                continue
+            with open(path, "rb") as pdf_file:
+                yield name, pdf_file.read()
+        return
+
+    with zipfile.ZipFile(source) as archive:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            # Skip folders and the resource forks macOS adds to zips
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or not info.filename.lower().endswith(".pdf"):
+                continue
+            if info.file_size > MAX_BATCH_PDF_BYTES:
+                yield info.filename, ValueError(f"File is larger than {MAX_BATCH_PDF_BYTES} bytes")
+                continue
+            try:
+                yield info.filename, archive.read(info)
+            except (zipfile.BadZipFile, OSError) as e:
+                yield info.filename, e
+
+def extract_document(extractor, index: int, name: str, content: Union[bytes, Exception], pdf_type: str) -> Dict[str, Any]:
+    """
+    Extract one document of a batch.
+
+    Returns:
+        The NDJSON record of the document, with its fields or its error.
+    """
+    started = time.perf_counter()
+    record = {"type": "document", "index": index, "filename": name, "pdf_type": None, "fields": None, "error": None}
+    try:
+        if isinstance(content, Exception):
+            raise content
+        fields = extractor.extract_key_information(content, is_pdf=True, pdf_type=pdf_type)
+        record["pdf_type"] = fields.get("pdf_type")
+        record["fields"] = fields
+    except Exception as e:
+        logger.error(f"Error extracting {name}: {e}")
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+def extract_batch(
+    extractor,
+    documents: Iterable[Tuple[str, Union[bytes, Exception]]],
+    pdf_type: str = "auto",
+    max_workers: int = BATCH_EXTRACT_WORKERS,
+    save: bool = False,
+    save_batch_size: int = BATCH_SAVE_SIZE,
+    executor: Optional[ExtractionExecutor] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Extract a batch of PDFs in parallel.
+
+    Documents are read lazily and at most twice ``max_workers`` of them are held in
+    memory at a time, so the size of the batch does not matter.
+
+    Args:
+        extractor: The MedicalInfoExtractor.
+        documents: Name and content of each PDF, see iter_pdf_documents.
+        pdf_type: Type of every PDF, "auto" detects it per document.
+        max_workers: Documents extracted at the same time.
+        save: Save every extracted document with save_many_to_database. Results are
+            then yielded once their group of ``save_batch_size`` documents is saved,
+            with a ``saved`` message.
+        save_batch_size: Documents saved per transaction.
+        executor: Executor shared with other requests, so the extractions of every
+            batch and request together are bounded by its workers. Documents it turns
+            away are submitted again once a slot is free. A pool of ``max_workers``
+            threads owned by the batch is used if omitted.
+
+    Yields:
+        One record per document in order of completion, then a summary record with
+        the document, error and saved counts and the total time.
+    """
+    started = time.perf_counter()
+    summary = {"type": "summary", "documents": 0, "errors": 0, "saved": 0}
+    unsaved: List[Tuple[Dict[str, Any], bytes]] = []
+
+    def flush_saves() -> List[Dict[str, Any]]:
+        records = [record for record, _ in unsaved]
+        saveable = [(record, content) for record, content in unsaved if not record["error"]]
+        messages = extractor.save_many_to_database([(record["fields"], content) for record, content in saveable])
+        for (record, _), message in zip(saveable, messages):
+            record["saved"] = message
+            if message.startswith("Error"):
+                record["error"] = message
+            else:
+                summary["saved"] += 1
+        unsaved.clear()
+        return records
+
+    def finish(record: Dict[str, Any], content) -> List[Dict[str, Any]]:
+        summary["documents"] += 1
+        if not save:
+            summary["errors"] += bool(record["error"])
+            return [record]
+        unsaved.append((record, content))
+        if len(unsaved) < save_batch_size:
+            return []
+        records = flush_saves()
+        summary["errors"] += sum(1 for saved_record in records if saved_record["error"])
+        return records
+
+    own_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-extract") if executor is None else None
+    pool = executor or own_pool
+    pending = {}
+    try:
+        queue = deque()
+        document_iter = enumerate(documents)
+        exhausted = False
+        # Document turned away by a full shared executor, submitted first on the next round
+        deferred = None
+        while True:
+            # Keep the pool busy without reading the whole batch into memory
+            while not exhausted and len(pending) < 2 * max_workers:
+                if deferred is None:
+                    try:
+                        deferred = next(document_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                index, (name, content) = deferred
+                try:
+                    future = pool.submit(extract_document, extractor, index, name, content, pdf_type)
+                except ExtractionQueueFull:
+                    break
+                deferred = None
+                pending[future] = content
+            if not pending:
+                if deferred is None:
+                    break
+                # Only other requests hold the shared executor, wait for one of them to finish
+                time.sleep(BATCH_RETRY_SECONDS)
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                queue.extend(finish(future.result(), pending.pop(future)))
+            while queue:
+                yield queue.popleft()
+    finally:
+        # A batch closed early, e.g. by a client that disconnected, leaves no work behind
+        for future in pending:
+            future.cancel()
+        if own_pool is not None:
+            own_pool.shutdown()
+
+    if save and unsaved:
+        records = flush_saves()
+        summary["errors"] += sum(1 for record in records if record["error"])
+        yield from records
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    yield summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract authorization data from a zip or directory of PDFs")
+    parser.add_argument("source", help="zip file or directory of PDF files")
+    parser.add_argument("--pdf-type", default="auto", help="onecall, corvel, homelink or auto (default)")
+    parser.add_argument("--workers", type=int, default=BATCH_EXTRACT_WORKERS, help="documents extracted at the same time")
+    parser.add_argument("--save", action="store_true", help="save the extracted documents to the database")
+    parser.add_argument("--save-batch-size", type=int, default=BATCH_SAVE_SIZE, help="documents saved per transaction")
+    args = parser.parse_args()
+
+    # Imported here so that --help works without the OCR and database dependencies
+    from medical_pdf_extractor_ui import MedicalInfoExtractor
+
+    results = extract_batch(
+        MedicalInfoExtractor(), iter_pdf_documents(args.source), args.pdf_type,
+        args.workers, args.save, args.save_batch_size
+    )
+    errors = 0
+    for record in results:
+        print(json.dumps(record), flush=True)
+        if record["type"] == "summary":
+            errors = record["errors"]
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Measure appointment import throughput on generated CSV files.
+
+Each case imports a freshly generated file into empty tables, in its own process so
+that the reported peak RSS belongs to that import alone, and reports rows per second,
+peak RSS and the number of SQL statements executed.
+
+By default the imports run against a temporary SQLite database. Set BENCH_DATABASE_URL
+(or pass --database-url) to benchmark a real PostgreSQL server; the tables are created
+in a separate ``bench`` schema that is dropped and recreated for every case.
+
+Usage:
+    python -m benchmarks.bench_appointment_import --rows 1000 100000 --mode bulk copy
+    python -m benchmarks.bench_appointment_import --rows 100000 --min-rows-per-second 5000
+    python -m benchmarks.bench_appointment_import --save-baseline baseline.json
+    python -m benchmarks.bench_appointment_import --baseline baseline.json --tolerance 0.2
+"""
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, text
+from sqlmodel import SQLModel, Session, create_engine
+
+from benchmarks.generate_appointments import write_appointment_csv
+
+# Import variants that can be benchmarked
+MODES = {
+    "row": dict(),
+    "bulk": dict(bulk_resolve=True),
+    "chunked": dict(bulk_resolve=True, commit_every=10000),
+    "upsert": dict(bulk_resolve=True, upsert=True),
+    "copy": dict(),
+    "validate": dict(validate_only=True),
+}
+
+BENCH_SCHEMA = "bench"
+
+def _create_engine(database_url: Optional[str], work_dir: str):
+    """Create an engine on empty appointment tables."""
+    if not database_url:
+        engine = create_engine(f"sqlite:///{os.path.join(work_dir, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        return engine
+
+    engine = create_engine(database_url, connect_args={"options": f"-csearch_path={BENCH_SCHEMA}"})
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+def run_case(mode: str, num_rows: int, database_url: Optional[str], generator_options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate a CSV file and import it once.
+
+    Runs in a fresh worker process, see main.
+
+    Returns:
+        The case results, with rows per second, peak RSS in MB and the statement count.
+    """
+    import appointment_service
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, "appointments.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as out:
+            write_appointment_csv(out, num_rows, **generator_options)
+
+        engine = _create_engine(database_url, work_dir)
+        statements = 0
+
+        def count_statement(*args):
+            nonlocal statements
+            statements += 1
+        event.listen(engine, "before_cursor_execute", count_statement)
+
+        with open(csv_path, "rb") as csv_file, Session(engine) as session:
+            upload = SimpleNamespace(file=csv_file, filename="appointments.csv")
+            started = time.perf_counter()
+            if mode == "copy":
+                stats = appointment_service.copy_load_appointments(upload, True, session)
+            else:
+                stats = appointment_service.process_uploaded_appointments(upload, True, session, **MODES[mode])
+            elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    return {
+        "mode": mode,
+        "rows": num_rows,
+        "database": engine.dialect.name,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(num_rows / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "statements": statements,
+        "created": stats.get("created", stats.get("valid")),
+        "errors": stats["errors"],
+    }
+
+def find_regressions(
+    results: List[Dict[str, Any]],
+    min_rows_per_second: Optional[float],
+    baseline: Optional[List[Dict[str, Any]]],
+    tolerance: float
+) -> List[str]:
+    """
+    Compare benchmark results with an absolute floor and a saved baseline.
+
+    Args:
+        results: Results of run_case.
+        min_rows_per_second: Minimum throughput every case must reach.
+        baseline: Results of an earlier run to compare with, matched by mode, rows and database.
+        tolerance: Fraction of the baseline throughput a case may lose before it fails.
+
+    Returns:
+        A description of every failed check, empty if all passed.
+    """
+    failures = []
+    baseline_by_case = {
+        (case["mode"], case["rows"], case["database"]): case for case in baseline or []
+    }
+    for result in results:
+        name = f"{result['mode']} x {result['rows']} on {result['database']}"
+        if result["errors"]:
+            failures.append(f"{name}: {result['errors']} rows failed to import")
+        if min_rows_per_second and result["rows_per_second"] < min_rows_per_second:
+            failures.append(f"{name}: {result['rows_per_second']} rows/s is below {min_rows_per_second}")
+        previous = baseline_by_case.get((result["mode"], result["rows"], result["database"]))
+        if previous and result["rows_per_second"] < previous["rows_per_second"] * (1 - tolerance):
+            failures.append(
+                f"{name}: {result['rows_per_second']} rows/s regressed from {previous['rows_per_second']}"
+            )
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark appointment CSV imports")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000], help="file sizes to import")
+    parser.add_argument("--mode", nargs="+", choices=sorted(MODES), default=["bulk"], help="import variants")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="PostgreSQL URL, a temporary SQLite database is used if omitted")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--patient-duplicate-rate", type=float, default=0.8)
+    parser.add_argument("--provider-duplicate-rate", type=float, default=0.99)
+    parser.add_argument("--location-duplicate-rate", type=float, default=0.999)
+    parser.add_argument("--min-rows-per-second", type=float, help="fail if any case is slower")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed throughput loss against the baseline, as a fraction")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    generator_options = dict(
+        seed=args.seed,
+        patient_duplicate_rate=args.patient_duplicate_rate,
+        provider_duplicate_rate=args.provider_duplicate_rate,
+        location_duplicate_rate=args.location_duplicate_rate,
+    )
+    results = []
+    print(f"{'mode':<10}{'rows':>10}{'db':>12}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'queries':>10}")
+    for mode in args.mode:
+        for num_rows in args.rows:
+            # A new process per case keeps peak RSS and module state independent between cases
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(run_case, mode, num_rows, args.database_url, generator_options).result()
+            results.append(result)
+            print(
+                f"{result['mode']:<10}{result['rows']:>10}{result['database']:>12}{result['seconds']:>10}"
+                f"{result['rows_per_second']:>12}{result['peak_rss_mb']:>10}{result['statements']:>10}"
+            )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    failures = find_regressions(results, args.min_rows_per_second, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
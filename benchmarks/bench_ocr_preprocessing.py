@@ -0,0 +1,182 @@
+"""
+Compare OCR preprocessing settings by speed and field accuracy on sample authorizations.
+
+Every sample is a PDF with a JSON file of the same name next to it, holding its type and
+the field values a correct extraction returns:
+
+    samples/corvel_scan_01.pdf
+    samples/corvel_scan_01.json   {"pdf_type": "corvel", "fields": {"claim_number": "123-45", ...}}
+
+Each preprocessing configuration runs in its own process, with the OCR cache, text
+layers and layout regions disabled so that every page goes through full-page OCR, and
+reports the OCR time per page and the share of expected fields extracted exactly. The
+fastest configuration whose accuracy is within --max-accuracy-loss of the unprocessed
+baseline is printed at the end.
+
+Usage:
+    python -m benchmarks.bench_ocr_preprocessing --samples samples/
+    python -m benchmarks.bench_ocr_preprocessing --samples samples/ --config none clean-150dpi
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# Preprocessing configurations, as the environment they set, see ocr_preprocessing
+CONFIGS = {
+    "none": {},
+    "grayscale": {"OCR_PREPROCESS_STEPS": "grayscale"},
+    "binarize": {"OCR_PREPROCESS_STEPS": "binarize"},
+    "clean": {"OCR_PREPROCESS_STEPS": "deskew,binarize,trim"},
+    "clean-150dpi": {"OCR_PREPROCESS_STEPS": "deskew,binarize,trim", "OCR_TARGET_DPI": "150"},
+    "grayscale-150dpi": {"OCR_PREPROCESS_STEPS": "grayscale", "OCR_TARGET_DPI": "150"},
+    "grayscale-100dpi": {"OCR_PREPROCESS_STEPS": "grayscale", "OCR_TARGET_DPI": "100"},
+}
+
+# Every page is read with full-page OCR while benchmarking
+BENCH_ENVIRONMENT = {
+    "OCR_CACHE_ENABLED": "false",
+    "TEXT_LAYER_DETECTION": "false",
+    "REGION_OCR_ENABLED": "false",
+    "OCR_POOL_WORKERS": "0",
+}
+
+def load_samples(directory: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Find the sample PDFs of a directory that have expected fields.
+
+    Returns:
+        The path of each PDF and its expected ``pdf_type`` and ``fields``, in name order.
+    """
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        expected_path = os.path.join(directory, os.path.splitext(name)[0] + ".json")
+        if not os.path.exists(expected_path):
+            print(f"Skipping {name}, it has no {os.path.basename(expected_path)}", file=sys.stderr)
+            continue
+        with open(expected_path) as expected_file:
+            samples.append((os.path.join(directory, name), json.load(expected_file)))
+    return samples
+
+def normalize(value: Optional[str]) -> str:
+    """Compare values without case or whitespace differences."""
+    return " ".join(str(value or "").lower().split())
+
+def score_fields(expected: Dict[str, str], extracted: Dict[str, Optional[str]]) -> Tuple[int, List[str]]:
+    """
+    Compare extracted fields with the expected values.
+
+    Returns:
+        The number of fields extracted correctly and the names of the others.
+    """
+    wrong = [field for field, value in expected.items() if normalize(extracted.get(field)) != normalize(value)]
+    return len(expected) - len(wrong), wrong
+
+def run_config(name: str, samples: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Extract every sample with one preprocessing configuration.
+
+    Runs in a fresh worker process, since the settings are read from the environment
+    when the OCR modules are imported, see main.
+
+    Returns:
+        The OCR seconds per page, the field accuracy and the fields each sample got wrong.
+    """
+    os.environ.update(BENCH_ENVIRONMENT)
+    os.environ.update(CONFIGS[name])
+    import pypdfium2 as pdfium
+    from medical_pdf_extractor_ui import MedicalInfoExtractor
+    from ocr_service import get_ocr_reader
+
+    extractor = MedicalInfoExtractor()
+    # Loading the models is not part of the OCR time
+    get_ocr_reader()
+
+    pages = 0
+    correct = 0
+    total = 0
+    wrong_fields = {}
+    elapsed = 0.0
+    for path, expected in samples:
+        pages += len(pdfium.PdfDocument(path))
+        started = time.perf_counter()
+        extracted = extractor.extract_key_information(path, is_pdf=True, pdf_type=expected["pdf_type"])
+        elapsed += time.perf_counter() - started
+        sample_correct, wrong = score_fields(expected["fields"], extracted)
+        correct += sample_correct
+        total += len(expected["fields"])
+        if wrong:
+            wrong_fields[os.path.basename(path)] = wrong
+
+    return {
+        "config": name,
+        "samples": len(samples),
+        "pages": pages,
+        "seconds_per_page": round(elapsed / pages, 3) if pages else None,
+        "accuracy": round(correct / total, 4) if total else None,
+        "wrong_fields": wrong_fields,
+    }
+
+def pick_fastest(results: List[Dict[str, Any]], baseline: str, max_accuracy_loss: float) -> Optional[Dict[str, Any]]:
+    """
+    Choose the fastest configuration that extracts about as well as the baseline.
+
+    Args:
+        results: Results of run_config.
+        baseline: Configuration the accuracy is compared with.
+        max_accuracy_loss: Accuracy, as a fraction of all fields, a configuration may lose.
+
+    Returns:
+        The fastest acceptable result, or None if the baseline was not run.
+    """
+    reference = next((result for result in results if result["config"] == baseline), None)
+    if reference is None:
+        return None
+    acceptable = [
+        result for result in results
+        if result["seconds_per_page"] is not None and result["accuracy"] >= reference["accuracy"] - max_accuracy_loss
+    ]
+    return min(acceptable, key=lambda result: result["seconds_per_page"], default=None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR preprocessing on sample authorizations")
+    parser.add_argument("--samples", required=True, help="directory of sample PDFs and their expected fields")
+    parser.add_argument("--config", nargs="+", choices=list(CONFIGS), default=list(CONFIGS), help="configurations to compare")
+    parser.add_argument("--baseline", default="none", choices=list(CONFIGS), help="configuration accuracy is compared with")
+    parser.add_argument("--max-accuracy-loss", type=float, default=0.0,
+                        help="accuracy a configuration may lose against the baseline, as a fraction of all fields")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        parser.error(f"No samples with expected fields in {args.samples}")
+    configs = args.config if args.baseline in args.config else [args.baseline] + args.config
+
+    results = []
+    print(f"{'config':<20}{'pages':>8}{'s/page':>10}{'accuracy':>10}")
+    for name in configs:
+        # A new process per configuration, the settings are read when the OCR modules are imported
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(run_config, name, samples).result()
+        results.append(result)
+        print(f"{result['config']:<20}{result['pages']:>8}{result['seconds_per_page']:>10}{result['accuracy']:>10}")
+        for sample, fields in result["wrong_fields"].items():
+            print(f"    {sample}: {', '.join(fields)}")
+
+    if args.out:
+        with open(args.out, "w") as out_file:
+            json.dump(results, out_file, indent=2)
+
+    fastest = pick_fastest(results, args.baseline, args.max_accuracy_loss)
+    if fastest:
+        print(f"Fastest without losing accuracy: {fastest['config']} {CONFIGS[fastest['config']]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Generate synthetic appointment CSV files in the layout process_uploaded_appointments expects.
+
+Usage:
+    python -m benchmarks.generate_appointments --rows 100000 --out appointments_100k.csv
+"""
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, TextIO
+import argparse
+import csv
+import random
+import sys
+
+from appointment_service import APPOINTMENT_CSV_COLUMNS
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David",
+    "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas",
+    "Sarah", "Maria", "Wei", "Aisha", "Carlos", "Mei", "Omar", "Priya", "Jose", "Ana",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+    "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Nguyen", "Kim",
+    "Patel", "Chen", "Lee", "Walker", "Hall", "Young", "O'Brien", "de la Cruz",
+]
+STATES = ["CA", "NY", "TX", "FL", "WA", "IL", "AZ", "NV"]
+SEXES = ["Male", "Female", "Other", ""]
+APPOINTMENT_TYPES = ["Initial", "Follow-up", "Acupuncture", "Massage", "Consultation", "Re-evaluation"]
+CLIENT_TYPES = ["Regular", "Workers Comp", "Personal Injury", "Cash", "Not Assigned"]
+STATUSES = ["Pending", "Confirmed", "Completed", "Cancelled", "No Show"]
+FLAGS = ["", "", "", "Priority", "New Patient", "Cash -  Acupuncture"]
+NOTES = ["", "", "", "Follow up in 2 weeks", "Patient requested, late afternoon", 'Bring "intake" form']
+LOCATION_CITIES = ["Corona", "Riverside", "Irvine", "Ontario", "Pomona", "Anaheim", "Fontana"]
+
+def _pick_or_create(rng: random.Random, pool: List, duplicate_rate: float, create) -> object:
+    """Reuse an entity from ``pool`` with probability ``duplicate_rate``, otherwise create a new one."""
+    if pool and rng.random() < duplicate_rate:
+        return rng.choice(pool)
+    entity = create(len(pool))
+    pool.append(entity)
+    return entity
+
+def generate_appointment_rows(
+    num_rows: int,
+    seed: int = 0,
+    patient_duplicate_rate: float = 0.8,
+    provider_duplicate_rate: float = 0.99,
+    location_duplicate_rate: float = 0.999,
+    start_date: Optional[datetime] = None
+) -> Iterator[List[str]]:
+    """
+    Generate appointment rows ordered like APPOINTMENT_CSV_COLUMNS.
+
+    The duplicate rates are the probability that a row refers to a patient, provider
+    or location that an earlier row already used, so a rate of 0.8 over 1,000 rows
+    produces about 200 distinct patients. The same seed always yields the same rows.
+
+    Args:
+        num_rows: Number of rows to generate.
+        seed: Seed of the random generator.
+        patient_duplicate_rate: Share of rows that reuse an existing patient.
+        provider_duplicate_rate: Share of rows that reuse an existing practitioner.
+        location_duplicate_rate: Share of rows that reuse an existing location.
+        start_date: First day appointments are scheduled on.
+
+    Yields:
+        One list of 17 string values per row.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or datetime(2025, 1, 6)
+    patients, providers, locations = [], [], []
+
+    def new_patient(index):
+        return {
+            "Client": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "Client Number": str(10000 + index),
+            "Mobile": f"{rng.randint(200, 999)}{rng.randint(200, 999)}{rng.randint(1000, 9999)}",
+            "Sex": rng.choice(SEXES),
+            "Postcode": f"{rng.randint(90000, 96199)}",
+            "State": rng.choice(STATES),
+        }
+
+    def new_provider(index):
+        return f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}"
+
+    def new_location(index):
+        return f"{rng.choice(LOCATION_CITIES)} - Clinic {index}"
+
+    for row_number in range(num_rows):
+        patient = _pick_or_create(rng, patients, patient_duplicate_rate, new_patient)
+        provider = _pick_or_create(rng, providers, provider_duplicate_rate, new_provider)
+        location = _pick_or_create(rng, locations, location_duplicate_rate, new_location)
+
+        # Half-hour slots between 8 AM and 6 PM
+        starts_at = start_date + timedelta(
+            days=rng.randint(0, 365),
+            hours=8 + rng.randint(0, 9),
+            minutes=30 * rng.randint(0, 1)
+        )
+        ends_at = starts_at + timedelta(minutes=rng.choice([30, 45, 60]))
+        values = {
+            **patient,
+            "Gender Identity": patient["Sex"],
+            "Practitioner": provider,
+            "Location": location,
+            # Formatted like the scheduling system exports, e.g. 3/08/2025 9:30 AM
+            "Date": f"{starts_at.month}/{starts_at:%d/%Y} {int(starts_at.strftime('%I'))}:{starts_at:%M %p}",
+            "End Time": ends_at.strftime("%I:%M %p"),
+            "Appointment Type": rng.choice(APPOINTMENT_TYPES),
+            "Type": rng.choice(CLIENT_TYPES),
+            "Invoice": str(100000 + row_number),
+            "Appointment Notes": rng.choice(NOTES),
+            "Appointment Flag": rng.choice(FLAGS),
+            "Status": rng.choice(STATUSES),
+        }
+        yield [values[column] for column in APPOINTMENT_CSV_COLUMNS]
+
+def write_appointment_csv(out: TextIO, num_rows: int, include_headers: bool = True, **options) -> int:
+    """
+    Write a generated appointment CSV to an open text file.
+
+    Values are always quoted, like the exports of the scheduling system.
+
+    Args:
+        out: Text file opened with newline=''.
+        num_rows: Number of rows to generate.
+        include_headers: Write the header row first.
+        **options: Passed to generate_appointment_rows.
+
+    Returns:
+        The number of data rows written.
+    """
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL)
+    if include_headers:
+        writer.writerow(APPOINTMENT_CSV_COLUMNS)
+    written = 0
+    for row in generate_appointment_rows(num_rows, **options):
+        writer.writerow(row)
+        written += 1
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic appointment CSV file")
+    parser.add_argument("--rows", type=int, default=1000, help="number of data rows")
+    parser.add_argument("--out", help="output file, standard output if omitted")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--patient-duplicate-rate", type=float, default=0.8)
+    parser.add_argument("--provider-duplicate-rate", type=float, default=0.99)
+    parser.add_argument("--location-duplicate-rate", type=float, default=0.999)
+    parser.add_argument("--no-headers", action="store_true", help="omit the header row")
+    args = parser.parse_args()
+
+    options = dict(
+        seed=args.seed,
+        patient_duplicate_rate=args.patient_duplicate_rate,
+        provider_duplicate_rate=args.provider_duplicate_rate,
+        location_duplicate_rate=args.location_duplicate_rate,
+    )
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as out:
+            write_appointment_csv(out, args.rows, include_headers=not args.no_headers, **options)
+    else:
+        write_appointment_csv(sys.stdout, args.rows, include_headers=not args.no_headers, **options)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Content-addressed storage of uploaded files, such as authorization PDFs.
+
+Files are stored once per distinct content under the hex SHA-256 of their bytes, and
+database rows keep only that hash, the size and the MIME type. Listing rows therefore
+never reads file contents, and the same PDF uploaded twice takes the space of one.
+
+LocalBlobStore keeps the files in a directory. Object storage can be added later as
+another BlobStore with the same methods.
+"""
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Directory of the stored files, shared by all workers on the host
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+
+# Bytes read or written at a time when copying and streaming files
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+class BlobStore(ABC):
+    """Interface of the blob stores, see LocalBlobStore."""
+
+    @abstractmethod
+    def put(self, data: Union[bytes, BinaryIO]) -> Tuple[str, int]:
+        """
+        Store a file unless a file with the same content is stored already.
+
+        Args:
+            data: The content, or a file object open for binary reading.
+
+        Returns:
+            The hex SHA-256 of the content and its size in bytes.
+        """
+
+    @abstractmethod
+    def open(self, digest: str) -> BinaryIO:
+        """
+        Open a stored file for binary reading.
+
+        Raises:
+            FileNotFoundError: If no file has this hash.
+        """
+
+    @abstractmethod
+    def size(self, digest: str) -> int:
+        """Return the size of a stored file, raising FileNotFoundError if it is missing."""
+
+    @abstractmethod
+    def delete(self, digest: str) -> bool:
+        """
+        Delete a stored file. Callers must first check that no row refers to it anymore.
+
+        Returns:
+            Whether the file existed.
+        """
+
+class LocalBlobStore(BlobStore):
+    """
+    Blob store in a local directory.
+
+    Files are sharded by the first two pairs of hex digits of their hash, e.g.
+    ``ab/cd/abcd...``, to keep directories small. Files are written to a temporary file
+    and moved into place, so readers never see a partial file and several workers can
+    store the same content at the same time.
+
+    Args:
+        directory: Directory of the files, created if missing.
+    """
+
+    def __init__(self, directory: str = BLOB_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if len(digest) != 64 or not all(char in "0123456789abcdef" for char in digest):
+            raise ValueError(f"Invalid blob hash: {digest}")
+        return os.path.join(self.directory, digest[:2], digest[2:4], digest)
+
+    def put(self, data: Union[bytes, BinaryIO]) -> Tuple[str, int]:
+        source = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        # The hash is only known once everything is read, so the content goes to a temporary file first
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in iter(lambda: source.read(BLOB_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+            path = self._path(digest.hexdigest())
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest.hexdigest(), size
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self._path(digest), "rb")
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self._path(digest))
+
+    def delete(self, digest: str) -> bool:
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            return False
+        return True
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse the Range header of a download.
+
+    Only single byte ranges are supported, other headers are ignored as HTTP allows.
+
+    Args:
+        header: Value of the Range header, e.g. "bytes=0-1023" or "bytes=-500".
+        size: Size of the file.
+
+    Returns:
+        The first and last byte of the range, inclusive, or None to send the whole file.
+
+    Raises:
+        ValueError: If the range is outside the file, which is answered with 416.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, separator, end = header[len("bytes="):].strip().partition("-")
+    if not separator or not (start or end) or not all(part.isdigit() for part in (start, end) if part):
+        return None
+    if not start:
+        # The last ``end`` bytes
+        if int(end) == 0 or size == 0:
+            raise ValueError(f"Unsatisfiable range: {header}")
+        return max(size - int(end), 0), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if end and int(end) < first:
+        return None
+    if first >= size:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return first, last
+
+def iter_blob(blob: BinaryIO, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Read a range of an open blob in chunks, closing it at the end.
+
+    Args:
+        blob: File object returned by BlobStore.open.
+        start: First byte to read.
+        end: Last byte to read, inclusive, the end of the file if omitted.
+    """
+    with blob:
+        blob.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = blob.read(BLOB_CHUNK_SIZE if remaining is None else min(BLOB_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide blob store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LocalBlobStore()
+        return _store
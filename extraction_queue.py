@@ -0,0 +1,94 @@
+"""
+Executor that runs PDF extraction outside the event loop.
+
+Rendering and OCR hold a CPU for seconds, so requests run them on a dedicated thread
+pool instead of in async routes. The pool accepts a bounded number of waiting requests;
+when it is full, new requests are turned away with ExtractionQueueFull so that callers
+can answer 503 quickly instead of letting uploads pile up in memory.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Extractions that run concurrently in this process
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+
+# Extractions that may wait for a free worker before new ones are rejected
+EXTRACTION_QUEUE_SIZE = int(os.getenv("EXTRACTION_QUEUE_SIZE", "8"))
+
+# Seconds clients are asked to wait before retrying a rejected extraction
+EXTRACTION_RETRY_AFTER_SECONDS = int(os.getenv("EXTRACTION_RETRY_AFTER_SECONDS", "10"))
+
+class ExtractionQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+class ExtractionExecutor:
+    """
+    Thread pool with a limit on the extractions running or waiting.
+
+    Args:
+        max_workers: Extractions that run concurrently.
+        queue_size: Extractions that may wait for a free worker.
+    """
+
+    def __init__(self, max_workers: int = EXTRACTION_WORKERS, queue_size: int = EXTRACTION_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extraction")
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Run a function on the pool.
+
+        Raises:
+            ExtractionQueueFull: If ``max_workers`` extractions run and ``queue_size`` wait already.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ExtractionQueueFull(f"{self.max_workers} extractions are running and {self.queue_size} are waiting")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def is_full(self) -> bool:
+        """Whether every worker is busy and the wait queue is full, so that submit would be rejected."""
+        if not self._slots.acquire(blocking=False):
+            return True
+        self._slots.release()
+        return False
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a function on the pool and wait for its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        """Stop the pool, cancelling the extractions that have not started."""
+        self._pool.shutdown(cancel_futures=True)
+
+_executor: Optional[ExtractionExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_extraction_executor() -> ExtractionExecutor:
+    """Return the process-wide extraction executor, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ExtractionExecutor()
+        return _executor
+
+def shutdown_extraction_executor():
+    """Stop the extraction executor, if it was started."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
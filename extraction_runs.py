@@ -0,0 +1,92 @@
+"""
+Persisted extraction runs of uploaded authorization documents.
+
+Every extraction in the Gradio app is stored as an ExtractionRun row with the document
+hash, the vendor, the text of each page, the extracted fields, the timings and a
+version of the settings that produced them. The app keeps only the run id per browser
+session, so concurrent users never share state, and edits, saves and repeated views
+read the run instead of extracting the document again. A document extracted before
+with the same type and settings gets a new run with the fields of the earlier one.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+
+from sqlmodel import Session, select
+
+from models import ExtractionRun
+
+def settings_version(settings: Dict[str, Any]) -> str:
+    """
+    Compute the version of the settings an extraction depends on.
+
+    Args:
+        settings: JSON-serializable OCR settings, layout templates and field patterns.
+
+    Returns:
+        A hex SHA-256 digest, different whenever a setting changes.
+    """
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+def find_reusable_run(session: Session, document_sha256: str, pdf_type: Optional[str], version: str) -> Optional[ExtractionRun]:
+    """
+    Find the latest run of a document extracted with the same type and settings.
+
+    Returns:
+        The run, or None if the document has to be extracted.
+    """
+    query = (
+        select(ExtractionRun)
+        .where(
+            ExtractionRun.document_sha256 == document_sha256,
+            ExtractionRun.pdf_type == pdf_type,
+            ExtractionRun.settings_version == version,
+        )
+        .order_by(ExtractionRun.run_id.desc())
+        .limit(1)
+    )
+    return session.exec(query).first()
+
+def run_fields(run: ExtractionRun) -> Dict[str, Optional[str]]:
+    """Return the fields of a run, as last edited if they were edited."""
+    return json.loads(run.edited_fields or run.extracted_fields)
+
+def run_pages(run: ExtractionRun) -> List[str]:
+    """Return the text of each page of a run, empty if the fields were read from layout regions."""
+    return json.loads(run.page_texts) if run.page_texts else []
+
+def update_run_fields(session: Session, run_id: int, fields: Dict[str, Optional[str]]) -> Optional[ExtractionRun]:
+    """
+    Store the edited fields of a run. The caller commits.
+
+    Returns:
+        The run, or None if it does not exist.
+    """
+    run = session.get(ExtractionRun, run_id)
+    if run is None:
+        return None
+    run.edited_fields = json.dumps(fields)
+    run.update_timestamp()
+    session.add(run)
+    return run
+
+def link_runs(session: Session, authorization_ids: Dict[int, int]) -> int:
+    """
+    Record the authorization each run was saved as, with one query. The caller commits.
+
+    Args:
+        authorization_ids: Authorization id by run id.
+
+    Returns:
+        The number of runs found.
+    """
+    if not authorization_ids:
+        return 0
+    runs = session.exec(select(ExtractionRun).where(ExtractionRun.run_id.in_(list(authorization_ids)))).all()
+    now = datetime.now(timezone.utc)
+    for run in runs:
+        run.authorization_id = authorization_ids[run.run_id]
+        run.updated_at = now
+        session.add(run)
+    return len(runs)
@@ -0,0 +1,105 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import re
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants, sre_parse
+
+logger = logging.getLogger(__name__)
+
+# Flags the extraction patterns are written for
+FIELD_PATTERN_FLAGS = re.IGNORECASE | re.MULTILINE | re.DOTALL
+
+def leading_literal(pattern: str, flags: int = FIELD_PATTERN_FLAGS) -> str:
+    """
+    Return the literal text every match of ``pattern`` starts with, e.g. "Name:" for r"Name:\\s*(\\w+)".
+
+    Returns:
+        The literal prefix, empty if the pattern does not start with one.
+    """
+    prefix = []
+    for op, value in sre_parse.parse(pattern, flags):
+        if op is not sre_constants.LITERAL:
+            break
+        prefix.append(chr(value))
+    return "".join(prefix)
+
+class FieldScanner:
+    """
+    Precompiled extraction patterns of one document type.
+
+    Every field has a list of alternative patterns in order of preference, and the
+    result is the same as searching the text with each alternative in turn and keeping
+    the first one that matches. Nearly every pattern starts with a label such as
+    "DOB:", so instead of running each case-insensitive regex over the whole text, the
+    text is lowercased once, the occurrences of each label are found with ``str.find``
+    and a pattern is only tried where its label occurs. Labels shared by several
+    patterns are located once per document.
+
+    Patterns without a label, and texts that are not ASCII (where lowercasing and
+    case-insensitive matching can disagree), use a regular regex search.
+
+    Args:
+        patterns: Alternative patterns of each field, most preferred first.
+        flags: Regex flags every pattern is compiled with.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]], flags: int = FIELD_PATTERN_FLAGS):
+        self.fields: Dict[str, List[Tuple[re.Pattern, str]]] = {}
+        for field, field_patterns in patterns.items():
+            self.fields[field] = []
+            for pattern in field_patterns:
+                try:
+                    compiled = re.compile(pattern, flags)
+                except re.error as e:
+                    logger.warning(f"Skipping invalid pattern for {field}: {pattern} ({e})")
+                    continue
+                label = leading_literal(pattern, flags)
+                if not label.isascii() or not flags & re.IGNORECASE:
+                    label = ""
+                self.fields[field].append((compiled, label.lower()))
+
+    def scan(self, text: str) -> Dict[str, Optional[re.Match]]:
+        """
+        Match every field against the text.
+
+        Args:
+            text: The document text.
+
+        Returns:
+            The match of the most preferred pattern of each field, at its leftmost
+            position, or None for fields that were not found.
+        """
+        lowered = text.lower() if text.isascii() else None
+        label_positions: Dict[str, List[int]] = {}
+
+        def positions(label: str) -> List[int]:
+            if label not in label_positions:
+                found = []
+                position = lowered.find(label)
+                while position != -1:
+                    found.append(position)
+                    position = lowered.find(label, position + 1)
+                label_positions[label] = found
+            return label_positions[label]
+
+        def first_match(compiled: re.Pattern, label: str) -> Optional[re.Match]:
+            if not label or lowered is None:
+                return compiled.search(text)
+            for position in positions(label):
+                match = compiled.match(text, position)
+                if match:
+                    return match
+            return None
+
+        results = {}
+        for field, alternatives in self.fields.items():
+            results[field] = None
+            for compiled, label in alternatives:
+                match = first_match(compiled, label)
+                if match:
+                    results[field] = match
+                    break
+        return results
@@ -0,0 +1,352 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from fastapi import UploadFile
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from database import engine
+from models import ImportJob, ImportJobStatus
+import appointment_service
+
+logger = logging.getLogger(__name__)
+
+# Directory where uploaded files are kept until their import job has finished
+SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "appointment_imports"))
+
+# Number of imports that run concurrently in this process
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+# Minimum number of seconds between two progress updates of a job
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# Maximum number of error details stored on a job
+MAX_STORED_ERRORS = 1000
+
+# A running job that has not written progress for this long is considered interrupted
+STALE_JOB_SECONDS = 300
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide thread pool that runs import jobs, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import-job")
+        return _executor
+
+def spool_upload(file: UploadFile) -> str:
+    """
+    Copy an uploaded file to the spool directory.
+
+    Args:
+        file: The uploaded file.
+
+    Returns:
+        Path of the spooled copy.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(SPOOL_DIR, f"{uuid.uuid4().hex}.csv")
+    with open(spool_path, "wb") as spool_file:
+        shutil.copyfileobj(file.file, spool_file)
+    return spool_path
+
+def enqueue_import(
+    file: UploadFile,
+    has_headers: bool,
+    bulk_resolve: bool = True,
+    commit_every: Optional[int] = None,
+    upsert: bool = False
+) -> ImportJob:
+    """
+    Spool an uploaded appointment CSV and queue it for import in the background.
+
+    Args:
+        file: The uploaded CSV file.
+        has_headers: Whether the CSV file has headers in the first row.
+        bulk_resolve: Resolve patients, providers and locations in bulk.
+        commit_every: Commit every this many rows so the job can be resumed, instead
+            of importing the whole file in one transaction.
+        upsert: Skip appointments imported before if unchanged and update them otherwise.
+
+    Returns:
+        The queued ImportJob.
+    """
+    spool_path = spool_upload(file)
+    job = ImportJob(
+        filename=file.filename,
+        spool_path=spool_path,
+        has_headers=has_headers,
+        bulk_resolve=bulk_resolve,
+        commit_every=commit_every,
+        upsert=upsert,
+        total_bytes=os.path.getsize(spool_path)
+    )
+    with Session(engine) as session:
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+    get_executor().submit(run_import_job, job.job_id)
+    logger.info(f"Queued import job {job.job_id} for {job.filename} ({job.total_bytes} bytes)")
+    return job
+
+def _update_job(job_id: int, **values):
+    """Write values to an import job in its own short transaction."""
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        for key, value in values.items():
+            setattr(job, key, value)
+        job.update_timestamp()
+        session.add(job)
+        session.commit()
+
+def run_import_job(job_id: int):
+    """
+    Import the spooled file of a job and record its progress and outcome.
+
+    Progress is written with separate sessions so that it is visible while the
+    import transaction is still open. Jobs with ``commit_every`` store a checkpoint
+    after every committed chunk and continue from it when they are run again.
+    """
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        if job is None:
+            logger.error(f"Import job {job_id} not found")
+            return
+        spool_path, filename = job.spool_path, job.filename
+        has_headers, bulk_resolve, commit_every = job.has_headers, job.bulk_resolve, job.commit_every
+        upsert = job.upsert
+        resume_from = None
+        if commit_every and job.checkpoint_offset is not None:
+            resume_from = {"row": job.checkpoint_row, "offset": job.checkpoint_offset}
+        # Rows committed and errors reported by earlier runs of the job
+        created_before = job.rows_created if resume_from else 0
+        updated_before = job.rows_updated if resume_from else 0
+        skipped_before = job.rows_skipped if resume_from else 0
+        errors_before = json.loads(job.error_details) if resume_from and job.error_details else []
+        errors_before = [detail for detail in errors_before if detail["row"] <= job.checkpoint_row]
+
+    # Claim the job, another worker process may have picked it up already, see requeue_queued_imports
+    with Session(engine) as session:
+        now = datetime.utcnow()
+        claimed = session.execute(
+            update(ImportJob)
+            .where(ImportJob.job_id == job_id, ImportJob.status == ImportJobStatus.QUEUED)
+            .values(status=ImportJobStatus.RUNNING, started_at=now, updated_at=now)
+        ).rowcount
+        session.commit()
+    if not claimed:
+        logger.info(f"Import job {job_id} is no longer queued, skipping it")
+        return
+
+    try:
+        with open(spool_path, "rb") as spool_file:
+            last_update = 0.0
+
+            def report_progress(stats: Dict[str, Any]):
+                nonlocal last_update
+                now = time.monotonic()
+                if now - last_update < PROGRESS_INTERVAL_SECONDS:
+                    return
+                last_update = now
+                try:
+                    _update_job(
+                        job_id,
+                        rows_processed=stats["total_processed"],
+                        error_count=stats["errors"],
+                        bytes_processed=spool_file.tell()
+                    )
+                except Exception as e:
+                    # Progress is informational, never let it abort the import
+                    logger.warning(f"Could not update progress of import job {job_id}: {e}")
+
+            def save_checkpoint(stats: Dict[str, Any]):
+                # Runs right after a chunk was committed, so the job row must follow it
+                _update_job(
+                    job_id,
+                    checkpoint_row=stats["checkpoint"]["row"],
+                    checkpoint_offset=stats["checkpoint"]["offset"],
+                    rows_created=created_before + stats["created"],
+                    rows_updated=updated_before + stats["updated"],
+                    rows_skipped=skipped_before + stats["skipped"],
+                    error_details=json.dumps((errors_before + stats["error_details"])[:MAX_STORED_ERRORS])
+                )
+
+            with Session(engine) as session:
+                stats = appointment_service.process_uploaded_appointments(
+                    file=SimpleNamespace(file=spool_file, filename=filename),
+                    has_headers=has_headers,
+                    session=session,
+                    bulk_resolve=bulk_resolve,
+                    progress_callback=report_progress,
+                    commit_every=commit_every,
+                    resume_from=resume_from,
+                    checkpoint_callback=save_checkpoint if commit_every else None,
+                    upsert=upsert
+                )
+            bytes_processed = spool_file.tell()
+    except Exception as e:
+        logger.exception(f"Import job {job_id} failed")
+        _update_job(job_id, status=ImportJobStatus.FAILED, message=str(e), finished_at=datetime.utcnow())
+        return
+
+    error_details = errors_before + stats["error_details"]
+    if commit_every:
+        # Invalid rows were skipped, the job only fails when it could not finish the file
+        succeeded = not stats["aborted"]
+    else:
+        succeeded = stats["errors"] == 0
+    if succeeded and error_details:
+        message = f"Processed {stats['total_processed']} appointment records, {len(error_details)} rows skipped"
+    elif succeeded:
+        message = f"Successfully processed {stats['total_processed']} appointment records"
+    else:
+        message = None
+    _update_job(
+        job_id,
+        status=ImportJobStatus.COMPLETED if succeeded else ImportJobStatus.FAILED,
+        rows_processed=stats["total_processed"],
+        rows_created=created_before + stats["created"],
+        rows_updated=updated_before + stats["updated"],
+        rows_skipped=skipped_before + stats["skipped"],
+        error_count=len(error_details),
+        error_details=json.dumps(error_details[:MAX_STORED_ERRORS]),
+        bytes_processed=bytes_processed,
+        message=message,
+        finished_at=datetime.utcnow()
+    )
+    if succeeded:
+        os.remove(spool_path)
+    logger.info(f"Import job {job_id} finished: {stats['total_processed']} rows, {stats['errors']} errors")
+
+def resume_import(job_id: int) -> Optional[ImportJob]:
+    """
+    Queue a failed or interrupted chunked import job again.
+
+    The job continues from its last checkpoint, so chunks that were already committed
+    are not imported twice. A job counts as interrupted when it is still marked as
+    running but has not written progress for STALE_JOB_SECONDS, for example because
+    the process running it was restarted.
+
+    Args:
+        job_id: ID of the job to resume.
+
+    Returns:
+        The queued ImportJob, or None if the job does not exist.
+
+    Raises:
+        ValueError: If the job cannot be resumed.
+    """
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        if job is None:
+            return None
+        if not job.commit_every:
+            raise ValueError("Only imports that commit in chunks can be resumed")
+        stale = (
+            job.status == ImportJobStatus.RUNNING
+            and (datetime.utcnow() - job.updated_at).total_seconds() > STALE_JOB_SECONDS
+        )
+        if job.status != ImportJobStatus.FAILED and not stale:
+            raise ValueError(f"Import job is {job.status.value} and cannot be resumed")
+        if not os.path.exists(job.spool_path):
+            raise ValueError("The uploaded file of this import job is no longer available")
+
+        job.status = ImportJobStatus.QUEUED
+        job.message = None
+        job.finished_at = None
+        job.update_timestamp()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+    get_executor().submit(run_import_job, job.job_id)
+    logger.info(f"Resuming import job {job.job_id} from row {job.checkpoint_row}")
+    return job
+
+def requeue_queued_imports() -> List[int]:
+    """
+    Submit the jobs that are still queued, for example after the process was restarted.
+
+    Called at startup. When several worker processes start together, each job is only
+    run by the first one that claims it, see run_import_job. Jobs whose spooled file is
+    gone are marked as failed.
+
+    Returns:
+        The IDs of the jobs submitted again.
+    """
+    with Session(engine) as session:
+        jobs = session.exec(select(ImportJob).where(ImportJob.status == ImportJobStatus.QUEUED)).all()
+        requeued = []
+        for job in jobs:
+            if os.path.exists(job.spool_path):
+                requeued.append(job.job_id)
+                continue
+            job.status = ImportJobStatus.FAILED
+            job.message = "The uploaded file of this import job is no longer available"
+            job.finished_at = datetime.utcnow()
+            job.update_timestamp()
+            session.add(job)
+        session.commit()
+
+    for job_id in requeued:
+        get_executor().submit(run_import_job, job_id)
+    if requeued:
+        logger.info(f"Requeued {len(requeued)} queued import jobs: {requeued}")
+    return requeued
+
+def job_progress(job: ImportJob) -> Dict[str, Any]:
+    """
+    Summarize the progress of an import job for polling clients.
+
+    Args:
+        job: The import job.
+
+    Returns:
+        A dictionary with the job status, row and error counts, rows per second and
+        an ETA in seconds estimated from the share of the file read so far.
+    """
+    rows_per_second = None
+    eta_seconds = None
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rows_per_second = round(job.rows_processed / elapsed, 1)
+            if job.status == ImportJobStatus.RUNNING and job.bytes_processed:
+                bytes_per_second = job.bytes_processed / elapsed
+                eta_seconds = round(max(job.total_bytes - job.bytes_processed, 0) / bytes_per_second, 1)
+    if job.status == ImportJobStatus.COMPLETED:
+        eta_seconds = 0
+
+    return {
+        "job_id": job.job_id,
+        "filename": job.filename,
+        "status": job.status.value,
+        "rows_processed": job.rows_processed,
+        "rows_created": job.rows_created,
+        "rows_updated": job.rows_updated,
+        "rows_skipped": job.rows_skipped,
+        "error_count": job.error_count,
+        "error_details": json.loads(job.error_details) if job.error_details else [],
+        "checkpoint_row": job.checkpoint_row,
+        "rows_per_second": rows_per_second,
+        "eta_seconds": eta_seconds,
+        "percent_complete": round(100 * job.bytes_processed / job.total_bytes, 1) if job.total_bytes else None,
+        "message": job.message,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
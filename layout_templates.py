@@ -0,0 +1,98 @@
+"""
+Page regions of the fields on each vendor's authorization form.
+
+Corvel and HomeLink print the fields we need at fixed places on their forms, so instead
+of reading whole pages with OCR, only the region of each field is rendered and read.
+Every region includes the field's label, so its text is matched with the vendor's
+regular patterns for that field, which tells whether the region was in the right place.
+
+Boxes are fractions of the page size, measured from the top left corner, so they do not
+depend on the page size or render scale. When a field is not found in its region,
+extraction falls back to full-page OCR, so a box that misses its label only costs time.
+A box that cuts off the end of a value is not noticed, so boxes are made wide enough for
+the longest values and should be checked against sample forms when a vendor changes
+its layout.
+
+Each template has a region for every field of its vendor that is saved to the database.
+When one of them is not found in its region, the extractor reads the full pages for it
+and keeps the fields that were found in their regions.
+"""
+from typing import Any, Dict, List, NamedTuple, Tuple
+import os
+
+# Read the fields of known layouts from their regions before trying full-page OCR.
+# Off by default, the boxes below are estimates that have not been checked against sample forms
+REGION_OCR_ENABLED = os.getenv("REGION_OCR_ENABLED", "false").lower() in ("1", "true", "yes")
+
+class LayoutRegion(NamedTuple):
+    """Region of one field: its page index and (left, top, right, bottom) box as fractions of the page."""
+    field: str
+    page: int
+    box: Tuple[float, float, float, float]
+
+LAYOUT_TEMPLATES: Dict[str, List[LayoutRegion]] = {
+    "corvel": [
+        LayoutRegion("patient_name", 0, (0.04, 0.16, 0.55, 0.21)),
+        LayoutRegion("claim_number", 0, (0.50, 0.16, 0.96, 0.21)),
+        LayoutRegion("patient_dob", 0, (0.04, 0.20, 0.55, 0.25)),
+        LayoutRegion("injury_date", 0, (0.50, 0.20, 0.96, 0.25)),
+        LayoutRegion("provider_name", 0, (0.04, 0.30, 0.96, 0.36)),
+        LayoutRegion("service_type", 0, (0.04, 0.38, 0.96, 0.45)),
+        LayoutRegion("authorized_sessions", 0, (0.04, 0.45, 0.55, 0.52)),
+        LayoutRegion("effective_date", 0, (0.50, 0.45, 0.96, 0.52)),
+    ],
+    "homelink": [
+        LayoutRegion("authorization_date", 0, (0.50, 0.04, 0.96, 0.08)),
+        LayoutRegion("provider_name", 0, (0.04, 0.08, 0.55, 0.12)),
+        LayoutRegion("provider_address", 0, (0.04, 0.11, 0.55, 0.17)),
+        LayoutRegion("provider_phone", 0, (0.50, 0.11, 0.96, 0.15)),
+        LayoutRegion("patient_name", 0, (0.04, 0.20, 0.55, 0.25)),
+        LayoutRegion("patient_dob", 0, (0.50, 0.20, 0.96, 0.25)),
+        LayoutRegion("injury_date", 0, (0.50, 0.24, 0.96, 0.29)),
+        LayoutRegion("patient_address", 0, (0.04, 0.24, 0.55, 0.33)),
+        LayoutRegion("patient_phone", 0, (0.50, 0.29, 0.96, 0.33)),
+        LayoutRegion("service_type", 0, (0.04, 0.40, 0.96, 0.46)),
+        LayoutRegion("start_date", 0, (0.04, 0.46, 0.55, 0.52)),
+        LayoutRegion("authorized_sessions", 0, (0.50, 0.46, 0.96, 0.52)),
+    ],
+}
+
+def validate_template(regions: List[LayoutRegion]):
+    """
+    Check the regions of a layout template.
+
+    Raises:
+        ValueError: If a box is empty or outside the page, or a field has several regions.
+    """
+    fields = set()
+    for region in regions:
+        left, top, right, bottom = region.box
+        if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+            raise ValueError(f"Invalid box for {region.field}: {region.box}")
+        if region.page < 0:
+            raise ValueError(f"Invalid page for {region.field}: {region.page}")
+        if region.field in fields:
+            raise ValueError(f"Field {region.field} has more than one region")
+        fields.add(region.field)
+
+def region_crop(page_width: float, page_height: float, box: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+    """
+    Convert a box to the crop of a pypdfium2 render.
+
+    Args:
+        page_width: Width of the page in points.
+        page_height: Height of the page in points.
+        box: Left, top, right and bottom edges as fractions of the page, from the top left corner.
+
+    Returns:
+        Points to leave out of the render on the left, bottom, right and top.
+    """
+    left, top, right, bottom = box
+    return (left * page_width, (1 - bottom) * page_height, (1 - right) * page_width, top * page_height)
+
+def template_settings(regions: List[LayoutRegion]) -> List[Any]:
+    """Return the regions of a template in a form that is part of the OCR cache key."""
+    return [[region.field, region.page, list(region.box)] for region in regions]
+
+for _regions in LAYOUT_TEMPLATES.values():
+    validate_template(_regions)
@@ -0,0 +1,120 @@
+"""
+Logging setup shared by the web app, the background import jobs and the PDF extractor.
+
+Levels are configured with environment variables:
+    LOG_LEVEL               Level of the root logger, INFO by default.
+    LOG_LEVELS              Per-module levels, e.g. "appointment_service=DEBUG,sqlalchemy.engine=WARNING".
+    LOG_DEBUG_SAMPLE_RATE   Share of DEBUG records that are written, between 0 and 1 (default 1).
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+import logging
+import os
+import random
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+_configured = False
+_configure_lock = threading.Lock()
+
+class DebugSampler(logging.Filter):
+    """Keep only a random share of DEBUG records, so per-row debug logging stays affordable."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """
+    Parse a LOG_LEVELS specification.
+
+    Args:
+        spec: Comma separated ``logger=LEVEL`` pairs.
+
+    Returns:
+        A mapping of logger name to level.
+
+    Raises:
+        ValueError: If a level name is unknown.
+    """
+    levels = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, level = item.partition("=")
+        level_number = logging.getLevelName(level.strip().upper())
+        if not isinstance(level_number, int):
+            raise ValueError(f"Unknown log level for {name.strip()}: {level}")
+        levels[name.strip()] = level_number
+    return levels
+
+def configure_logging():
+    """
+    Configure the root handler and the per-module levels from the environment.
+
+    Calling it more than once has no further effect.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+        if sample_rate < 1:
+            handler.addFilter(DebugSampler(sample_rate))
+
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        for name, level in parse_levels(os.getenv("LOG_LEVELS", "")).items():
+            logging.getLogger(name).setLevel(level)
+        _configured = True
+
+class StageMetrics:
+    """
+    Counters and per-stage timings of one import or extraction.
+
+    Stages are timed with ``stage()`` and events counted with ``count()``; at the end
+    ``log_summary()`` writes them as a single ``key=value`` line.
+
+    Args:
+        operation: Name of the operation in the summary line, e.g. "appointment import".
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.counters: Counter = Counter()
+        self.timings: Dict[str, float] = defaultdict(float)
+        self._started = time.perf_counter()
+
+    def count(self, name: str, amount: int = 1):
+        """Add ``amount`` to the counter ``name``."""
+        self.counters[name] += amount
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to the stage ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the counters and the stage and total times in milliseconds."""
+        fields = dict(self.counters)
+        fields.update({f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.timings.items()})
+        fields["total_ms"] = round((time.perf_counter() - self._started) * 1000, 1)
+        return fields
+
+    def log_summary(self, logger: logging.Logger, level: int = logging.INFO, **fields):
+        """Log the summary, preceded by ``fields``, as one line."""
+        summary = {**fields, **self.summary()}
+        logger.log(level, "%s finished %s", self.operation, " ".join(f"{key}={value}" for key, value in summary.items()))
@@ -1,15 +1,22 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request, UploadFile, File, Form
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlmodel import Session, select
 from datetime import datetime, timedelta, time
 from typing import List, Optional
 import pandas as pd
+import asyncio
 import csv
 import io
+import json
+import logging
 import os
+import tempfile
+import threading
+import zipfile
 from sqlalchemy import func, or_
+from sqlalchemy.orm import defer
 
 # Import from our separated modules
 from database import get_db, create_tables, User, get_user
@@ -23,12 +30,24 @@ from models import (
     UserCreate, UserRead, Token, TokenData,
     Gender, AppointmentStatus, ClaimStatus,
     Location, LocationCreate, LocationRead,
-    Authorization
+    Authorization, ImportJob
 )
 from seed import insert_sample_data
 import appointment_service
+import import_jobs
 from fastapi.templating import Jinja2Templates
-from medical_pdf_extractor_ui import MedicalInfoExtractor
+from medical_pdf_extractor_ui import PDF_TYPE_AUTO, MedicalInfoExtractor
+from logging_config import configure_logging
+from ocr_service import prewarm_ocr_reader, shutdown_ocr_pool
+from ocr_cache import get_ocr_cache
+from blob_store import get_blob_store, iter_blob, parse_range
+from batch_extract import MAX_BATCH_ARCHIVE_BYTES, extract_batch, iter_pdf_documents
+from extraction_queue import (
+    EXTRACTION_RETRY_AFTER_SECONDS, ExtractionQueueFull, get_extraction_executor, shutdown_extraction_executor
+)
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 extractor = MedicalInfoExtractor()
 
@@ -44,9 +63,18 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 @app.on_event("startup")
 async def on_startup():
     create_tables()
+    # Imports queued before a restart would otherwise never run
+    import_jobs.requeue_queued_imports()
+    # Only OCR workers load the OCR models up front, see OCR_PREWARM
+    prewarm_ocr_reader()
     # Uncomment to insert sample data on startup
     # insert_sample_data()
 
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_extraction_executor()
+    shutdown_ocr_pool()
+
 # Route to manually trigger sample data insertion
 @app.post("/seed-data/")
 def seed_sample_data():
@@ -253,6 +281,10 @@ async def upload_appointments_page(request: Request):
 async def upload_appointments(
     file: UploadFile = File(...),
     has_headers: bool = Form(True),
+    bulk_resolve: bool = Form(False),
+    bulk_load: bool = Form(False),
+    upsert: bool = Form(False),
+    validate_only: bool = Form(False),
     db: Session = Depends(get_db)
 ):
     """
@@ -261,6 +293,10 @@ async def upload_appointments(
     Args:
         file: The uploaded CSV file.
         has_headers: Whether the file has headers in the first row.
+        bulk_resolve: Resolve patients, providers and locations in bulk before importing.
+        bulk_load: Load the file through a COPY staging table (PostgreSQL only).
+        upsert: Skip appointments imported before if unchanged and update them otherwise.
+        validate_only: Only check the file and report every invalid row, without importing.
         db: Database session.
 
     Returns:
@@ -277,12 +313,32 @@ async def upload_appointments(
                 }
             )
 
+        if validate_only:
+            stats = appointment_service.validate_appointment_csv(file=file, has_headers=has_headers, upsert=upsert)
+            return JSONResponse(
+                content={
+                    "success": stats["errors"] == 0,
+                    "message": f"Validated {stats['total_processed']} appointment records, {stats['errors']} with errors, {stats['warnings']} with warnings",
+                    "stats": stats
+                }
+            )
+
         # Call the service function to process the CSV
-        stats = appointment_service.process_uploaded_appointments(
-            file=file,
-            has_headers=has_headers,
-            session=db
-        )
+        if bulk_load:
+            stats = appointment_service.copy_load_appointments(
+                file=file,
+                has_headers=has_headers,
+                session=db,
+                upsert=upsert
+            )
+        else:
+            stats = appointment_service.process_uploaded_appointments(
+                file=file,
+                has_headers=has_headers,
+                session=db,
+                bulk_resolve=bulk_resolve,
+                upsert=upsert
+            )
 
         # Return success response with stats
         return JSONResponse(
@@ -303,6 +359,200 @@ async def upload_appointments(
             }
         )
 
+@app.post("/api/import-jobs", status_code=status.HTTP_202_ACCEPTED)
+def create_import_job(
+    file: UploadFile = File(...),
+    has_headers: bool = Form(True),
+    bulk_resolve: bool = Form(True),
+    commit_every: Optional[int] = Form(None),
+    upsert: bool = Form(False)
+):
+    """
+    Queue an uploaded appointment CSV for import in the background.
+
+    Args:
+        file: The uploaded CSV file.
+        has_headers: Whether the file has headers in the first row.
+        bulk_resolve: Resolve patients, providers and locations in bulk.
+        commit_every: Commit every this many rows, skipping invalid rows, so the
+            import can be resumed if it is interrupted.
+        upsert: Skip appointments imported before if unchanged and update them otherwise.
+
+    Returns:
+        JSON response with the id of the queued job.
+    """
+    if not file.filename.endswith('.csv'):
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "error": "Invalid file format. Please upload a CSV file."
+            }
+        )
+
+    if commit_every is not None and commit_every < 1:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "commit_every must be a positive number of rows."}
+        )
+
+    job = import_jobs.enqueue_import(
+        file=file, has_headers=has_headers, bulk_resolve=bulk_resolve,
+        commit_every=commit_every, upsert=upsert
+    )
+    return {"success": True, "job_id": job.job_id, "status_url": f"/api/import-jobs/{job.job_id}"}
+
+@app.get("/api/import-jobs/{job_id}")
+def read_import_job(job_id: int, db: Session = Depends(get_db)):
+    """Return the progress of a background appointment import."""
+    job = db.get(ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_jobs.job_progress(job)
+
+@app.post("/api/import-jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+def resume_import_job(job_id: int):
+    """Continue a failed or interrupted chunked import from its last checkpoint."""
+    try:
+        job = import_jobs.resume_import(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return {"success": True, "job_id": job.job_id, "status_url": f"/api/import-jobs/{job.job_id}"}
+
+@app.get("/api/ocr-cache")
+def read_ocr_cache_stats():
+    """Return the hit, miss, write and eviction counters of this worker's OCR cache."""
+    cache = get_ocr_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@app.post("/api/extract-batch")
+def extract_pdf_batch(
+    file: UploadFile = File(...),
+    pdf_type: str = Form(PDF_TYPE_AUTO),
+    save: bool = Form(False)
+):
+    """
+    Extract every PDF of an uploaded zip file.
+
+    The documents are extracted on the extraction executor shared with the other
+    extraction endpoints, so concurrent batches do not multiply the OCR work.
+
+    Args:
+        file: Zip file of authorization PDFs.
+        pdf_type: Type of every PDF (onecall, corvel, or homelink), auto detects it per document.
+        save: Save the extracted documents to the database, in batches of BATCH_SAVE_SIZE.
+
+    Returns:
+        Newline delimited JSON, one line per document as it is extracted and a summary line,
+        413 if the zip file is larger than MAX_BATCH_ARCHIVE_BYTES, or 503 with Retry-After
+        when the extractor is busy.
+    """
+    executor = get_extraction_executor()
+    if executor.is_full():
+        logger.warning("Rejected batch extraction: the extraction queue is full")
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": "The extractor is busy, please try again in a few seconds."},
+            headers={"Retry-After": str(EXTRACTION_RETRY_AFTER_SECONDS)}
+        )
+
+    # Copied out of the upload, which may be closed before the response is streamed
+    archive = tempfile.TemporaryFile()
+    copied = 0
+    while chunk := file.file.read(1024 * 1024):
+        copied += len(chunk)
+        if copied > MAX_BATCH_ARCHIVE_BYTES:
+            archive.close()
+            return JSONResponse(
+                status_code=413,
+                content={"success": False, "error": f"The zip file is larger than {MAX_BATCH_ARCHIVE_BYTES} bytes."}
+            )
+        archive.write(chunk)
+    if not zipfile.is_zipfile(archive):
+        archive.close()
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "Invalid file format. Please upload a zip file of PDFs."}
+        )
+
+    def results():
+        with archive:
+            for record in extract_batch(extractor, iter_pdf_documents(archive), pdf_type, save=save, executor=executor):
+                yield json.dumps(record) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/api/extract-stream")
+async def extract_medical_info_stream(
+    file: UploadFile = File(...),
+    pdf_type: str = Form(PDF_TYPE_AUTO),
+    fields: Optional[str] = Form(None)
+):
+    """
+    Extract a PDF page by page, streaming the results as server-sent events.
+
+    A ``page`` event is sent as soon as each page is read, with its text and the fields
+    found or changed by it, and a ``done`` event with all fields at the end. Closing the
+    connection stops the OCR of the remaining pages.
+
+    Args:
+        file: The PDF file.
+        pdf_type: Type of PDF (onecall, corvel, or homelink), auto detects it.
+        fields: Comma separated fields, e.g. "patient_name,claim_number". Reading stops
+            once all of them are found.
+
+    Returns:
+        A text/event-stream response, or 503 with Retry-After when the extractor is busy.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        return JSONResponse(status_code=400, content={"success": False, "error": "Only PDF files are supported"})
+    pdf_bytes = await file.read()
+    needed_fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def produce():
+        # Runs on the extraction executor and hands each event over to the event loop
+        try:
+            for event in extractor.stream_key_information(pdf_bytes, pdf_type, needed_fields, cancelled):
+                loop.call_soon_threadsafe(events.put_nowait, event)
+        except Exception as e:
+            logger.error(f"Error streaming extraction: {e}")
+            loop.call_soon_threadsafe(events.put_nowait, {"event": "error", "error": str(e)})
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    try:
+        get_extraction_executor().submit(produce)
+    except ExtractionQueueFull as e:
+        logger.warning(f"Rejected extraction: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": "The extractor is busy, please try again in a few seconds."},
+            headers={"Retry-After": str(EXTRACTION_RETRY_AFTER_SECONDS)}
+        )
+
+    async def event_stream():
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Also reached when the client disconnects
+            cancelled.set()
+
+    return StreamingResponse(
+        event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/appointments/", response_class=HTMLResponse)
 async def read_appointments(
     request: Request,
@@ -311,7 +561,7 @@ async def read_appointments(
     db: Session = Depends(get_db)
 ):
     appointments = db.exec(select(Appointment).offset(skip).limit(limit)).all()
-    print("appointments", appointments)
+    logger.debug("Listing %d appointments", len(appointments))
     return templates.TemplateResponse(
         "all_appointments.html",
         {
@@ -392,13 +642,73 @@ def delete_appointment_endpoint(appointment_id: int, session: Session = Depends(
 
 @app.get("/authorizations", response_class=HTMLResponse)
 async def list_authorizations(request: Request, session: Session = Depends(get_db)):
-    """List all authorizations."""
-    authorizations = session.query(Authorization).all()
+    """List all authorizations, without loading their form PDFs."""
+    authorizations = session.query(Authorization).options(defer(Authorization.authorization_form)).all()
     return templates.TemplateResponse(
         "all_authorization.html",
         {"request": request, "authorizations": authorizations}
     )
 
+@app.get("/authorizations/{authorization_id}/form")
+def download_authorization_form(authorization_id: int, request: Request, session: Session = Depends(get_db)):
+    """
+    Download the form PDF of an authorization.
+
+    The file is streamed from the blob store, and a single byte range can be requested
+    with the Range header, which lets PDF viewers load large forms page by page.
+
+    Args:
+        authorization_id: ID of the authorization
+        request: The request, for its Range header
+        session: Database session
+
+    Returns:
+        The PDF, or the requested range of it with status 206.
+    """
+    authorization = session.exec(
+        select(Authorization)
+        .where(Authorization.authorization_id == authorization_id)
+        .options(defer(Authorization.authorization_form))
+    ).first()
+    if not authorization:
+        raise HTTPException(status_code=404, detail="Authorization not found")
+
+    if authorization.form_sha256:
+        store = get_blob_store()
+        try:
+            blob = store.open(authorization.form_sha256)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Authorization form not found")
+        size = store.size(authorization.form_sha256)
+        media_type = authorization.form_mime_type or "application/pdf"
+    else:
+        # Forms saved before the blob store are still kept in the row
+        legacy_form = session.exec(
+            select(Authorization.authorization_form).where(Authorization.authorization_id == authorization_id)
+        ).first()
+        if not legacy_form:
+            raise HTTPException(status_code=404, detail="Authorization form not found")
+        blob = io.BytesIO(legacy_form)
+        size = len(legacy_form)
+        media_type = "application/pdf"
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'inline; filename="authorization_{authorization_id}.pdf"',
+    }
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        blob.close()
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_blob(blob), media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_blob(blob, start, end), status_code=206, media_type=media_type, headers=headers)
+
 @app.delete("/authorizations/{authorization_id}", response_model=dict)
 def delete_authorization_endpoint(authorization_id: int, session: Session = Depends(get_db)):
     """
@@ -418,12 +728,16 @@ def delete_authorization_endpoint(authorization_id: int, session: Session = Depe
         status_code=status.HTTP_404_NOT_FOUND,
         detail="Authorization not found or could not be deleted"
     )
-@app.route("/extract-medical-info", methods=["GET", "POST"])
+@app.api_route("/extract-medical-info", methods=["GET", "POST"])
 async def extract_medical_info(request: Request, 
                                 file: UploadFile = File(None), 
-                                text_input: str = Form(None)):
+                                text_input: str = Form(None),
+                                pdf_type: str = Form(PDF_TYPE_AUTO)):
     """
     Extract medical information and render Jinja2 template
+
+    Extraction runs on the extraction executor so that rendering and OCR do not block
+    the event loop. When its queue is full, the page is returned with 503 and Retry-After.
     """
     extracted_info = None
     error = None
@@ -445,12 +759,16 @@ async def extract_medical_info(request: Request,
                     pdf_bytes = await file.read()
                     
                     # Extract information from PDF
-                    extracted_info = extractor.extract_key_information(pdf_bytes, is_pdf=True)
+                    extracted_info = await get_extraction_executor().run(
+                        extractor.extract_key_information, pdf_bytes, is_pdf=True, pdf_type=pdf_type or PDF_TYPE_AUTO
+                    )
             
             # Text input processing
             elif text_input:
                 # Extract information from text
-                extracted_info = extractor.extract_key_information(text_input, is_pdf=False)
+                extracted_info = await get_extraction_executor().run(
+                    extractor.extract_key_information, text_input, is_pdf=False
+                )
         
         # Render template with extracted information
         return templates.TemplateResponse("medical_extractor.html", {
@@ -459,6 +777,13 @@ async def extract_medical_info(request: Request,
             "error": error
         })
     
+    except ExtractionQueueFull as e:
+        logger.warning(f"Rejected extraction: {e}")
+        return templates.TemplateResponse("medical_extractor.html", {
+            "request": request,
+            "error": "The extractor is busy, please try again in a few seconds."
+        }, status_code=503, headers={"Retry-After": str(EXTRACTION_RETRY_AFTER_SECONDS)})
+    
     except Exception as e:
         # Handle any unexpected errors
         error = str(e)
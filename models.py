@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import BigInteger, Column, Index
 from typing import Optional, List, ForwardRef
 from datetime import date, datetime, time, timezone
 from pydantic import EmailStr, validator, constr
@@ -81,6 +82,12 @@ class AuthorizationStatus(str, Enum):
     DENIED = "denied"
     EXPIRED = "expired"
 
+class ImportJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class ServiceType(str, Enum):
     PHYSICAL_THERAPY = "physical_therapy"
     OCCUPATIONAL_THERAPY = "occupational_therapy"
@@ -228,6 +235,8 @@ class TimeStampMixin:
 # Define the schema models, separated from database models
 class Patient(SQLModel, table=True):
     __tablename__ = "patients"
+    # Extracted authorizations are matched to patients by name, see MedicalInfoExtractor.save_many_to_database
+    __table_args__ = (Index("ix_patients_first_name_last_name", "first_name", "last_name"),)
     
     patient_id: Optional[int] = Field(default=None, primary_key=True)  # Optional, auto-incremented
     first_name: str = Field(..., max_length=100)  # Required
@@ -576,6 +585,8 @@ class Appointment(SQLModel, table=True):
     client_type: Optional[str] = Field(default=None, max_length=50)  # Optional
     sex: Optional[Gender] = None  # Optional
     gender_identity: Optional[str] = Field(default=None, max_length=50)  # Optional
+    import_fingerprint: Optional[str] = Field(default=None, max_length=64, unique=True, index=True)  # Identity of the imported CSV row, set by upsert imports only
+    import_hash: Optional[str] = Field(default=None, max_length=64)  # Content of the imported CSV row
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -626,7 +637,10 @@ class Authorization(SQLModel, table=True):
     initial_evaluation_date: date
     status: AuthorizationStatus
     notes: Optional[str] = Field(default=None)
-    authorization_form: Optional[bytes] = Field(default=None)
+    authorization_form: Optional[bytes] = Field(default=None)  # Legacy, new forms are kept in the blob store
+    form_sha256: Optional[str] = Field(default=None, max_length=64, index=True)  # Blob store hash of the form PDF
+    form_size: Optional[int] = None
+    form_mime_type: Optional[str] = Field(default=None, max_length=100)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -635,4 +649,60 @@ class Authorization(SQLModel, table=True):
     provider: Provider = Relationship(back_populates="authorizations")
 
     def update_timestamp(self):
-        self.updated_at = datetime.now(timezone.utc)
\ No newline at end of file
+        self.updated_at = datetime.now(timezone.utc)
+
+class ExtractionRun(SQLModel, table=True):
+    """Extraction of one uploaded document, kept so that edits and saves never extract it again"""
+    __tablename__ = "extraction_runs"
+    # Earlier runs of a document are reused, see extraction_runs.find_reusable_run
+    __table_args__ = (Index("ix_extraction_runs_document", "document_sha256", "pdf_type", "settings_version"),)
+
+    run_id: Optional[int] = Field(default=None, primary_key=True)
+    document_sha256: str = Field(..., max_length=64)  # Blob store hash of the PDF, or hash of the pasted text
+    is_pdf: bool = True
+    pdf_type: Optional[str] = Field(default=None, max_length=20)  # Type requested, e.g. auto
+    vendor: Optional[str] = Field(default=None, max_length=20)  # Type the document was extracted as
+    settings_version: str = Field(..., max_length=64)  # Hash of the OCR settings and patterns, see extraction_runs.settings_version
+    page_texts: Optional[str] = None  # JSON list of the text of each page, None when the fields were read from layout regions
+    extracted_fields: str  # JSON object of the extracted fields
+    edited_fields: Optional[str] = None  # JSON object of the fields as last edited by the user
+    timings: Optional[str] = None  # JSON object of the page counts and stage times, see logging_config.StageMetrics
+    source_run_id: Optional[int] = Field(default=None, foreign_key="extraction_runs.run_id")  # Run the fields were copied from
+    authorization_id: Optional[int] = Field(default=None, foreign_key="authorizations.authorization_id", index=True)  # Set once saved
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def update_timestamp(self):
+        self.updated_at = datetime.now(timezone.utc)
+
+class ImportJob(SQLModel, table=True):
+    """Background import of an uploaded appointment CSV file"""
+    __tablename__ = "import_jobs"
+
+    job_id: Optional[int] = Field(default=None, primary_key=True)
+    filename: str = Field(..., max_length=255)
+    spool_path: str = Field(..., max_length=500)  # Local copy of the upload
+    has_headers: bool = True
+    bulk_resolve: bool = True
+    commit_every: Optional[int] = None  # Rows per committed chunk, None for all-or-nothing
+    upsert: bool = False
+    status: ImportJobStatus = Field(default=ImportJobStatus.QUEUED, index=True)
+    # File sizes and positions are 64-bit, uploads can exceed the 2 GB of an INTEGER column
+    total_bytes: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
+    bytes_processed: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
+    rows_processed: int = 0
+    rows_created: int = 0
+    rows_updated: int = 0
+    rows_skipped: int = 0
+    error_count: int = 0
+    error_details: Optional[str] = None  # JSON list of {"row", "error"}
+    checkpoint_row: int = 0  # Rows committed so far in chunked mode
+    checkpoint_offset: Optional[int] = Field(default=None, sa_column=Column(BigInteger))  # Spool file position after checkpoint_row
+    message: Optional[str] = Field(default=None, max_length=1000)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    def update_timestamp(self):
+        self.updated_at = datetime.utcnow()
@@ -0,0 +1,195 @@
+"""
+Disk cache of the text extracted from PDF pages.
+
+Entries are keyed by the SHA-256 of the PDF bytes, the PDF type and the OCR settings,
+so re-uploading the same document returns its text without rendering or OCR, and a
+change to the OCR settings never returns stale text. The cache directory can be shared
+by several worker processes.
+"""
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Directory of the cache, shared by all workers on the host
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ocr_cache"))
+
+# Size the cache is trimmed to, least recently used entries are evicted first
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Seconds between two scans of the cache directory, which also count the entries of other workers
+OCR_CACHE_SCAN_SECONDS = float(os.getenv("OCR_CACHE_SCAN_SECONDS", "300"))
+
+# Share of the maximum size a full cache is trimmed to, so that the next writes do not trim it again
+OCR_CACHE_TRIM_RATIO = 0.9
+
+# Set to false to always run extraction
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+def cache_key(pdf_bytes: bytes, pdf_type: Optional[str], settings: Dict[str, Any]) -> str:
+    """
+    Compute the cache key of a PDF.
+
+    Args:
+        pdf_bytes: Content of the PDF file.
+        pdf_type: Type of PDF (onecall, corvel, or homelink).
+        settings: Settings that affect the extracted text, see ocr_service.ocr_settings.
+
+    Returns:
+        A hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(pdf_bytes).digest())
+    digest.update(b"\x1f" + (pdf_type or "").lower().encode("utf-8"))
+    digest.update(b"\x1f" + json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+class OCRCache:
+    """
+    Per-page text of extracted PDFs, stored as one JSON file per document.
+
+    Reading an entry updates its modification time. Writes keep a running total of the
+    cache size, and the directory is only scanned to trim the cache when that total goes
+    over ``max_bytes`` or every OCR_CACHE_SCAN_SECONDS, which also counts the entries
+    written by other workers. Trimming deletes the entries that were used least recently.
+
+    Args:
+        directory: Directory of the cache files, created if missing.
+        max_bytes: Total size the cache files are trimmed to.
+    """
+
+    def __init__(self, directory: str = OCR_CACHE_DIR, max_bytes: int = OCR_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        # Size of the cache as of the last scan plus the writes since, None before the first scan
+        self._size: Optional[int] = None
+        self._scanned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Shard by the first two hex digits to keep directories small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        Return the cached page texts of a document.
+
+        Returns:
+            The text of each page, or None if the document is not cached.
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                pages = json.load(cache_file)["pages"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            # Missing, evicted by another worker, or a partial file from a crashed writer
+            self._count("misses")
+            return None
+        self._count("hits")
+        return pages
+
+    def put(self, key: str, pages: List[str]):
+        """Store the page texts of a document and evict old entries if the cache is too large."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced_size = os.path.getsize(path)
+        except OSError:
+            replaced_size = 0
+        # Written to a temporary file first so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as cache_file:
+                cache_file.write(json.dumps({"pages": pages}).encode("utf-8"))
+                size = cache_file.tell()
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self.counters["writes"] += 1
+            if self._size is not None:
+                self._size += size - replaced_size
+            scan = (
+                self._size is None
+                or self._size > self.max_bytes
+                or time.monotonic() - self._scanned_at >= OCR_CACHE_SCAN_SECONDS
+            )
+        if scan:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete the least recently used entries of a cache larger than ``max_bytes``.
+
+        The directory is scanned to find the size of every entry, and entries are deleted
+        until the cache fits in OCR_CACHE_TRIM_RATIO of ``max_bytes``.
+
+        Returns:
+            The number of entries deleted.
+        """
+        entries = []
+        total = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        evicted = 0
+        target = self.max_bytes * OCR_CACHE_TRIM_RATIO if total > self.max_bytes else total
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self._scanned_at = time.monotonic()
+        if evicted:
+            self._count("evictions", evicted)
+            logger.info(f"Evicted {evicted} OCR cache entries, {total} bytes remain")
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss, write and eviction counters of this process."""
+        with self._lock:
+            return dict(self.counters)
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Return the process-wide OCR cache, or None if OCR_CACHE_ENABLED is off."""
+    global _cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
@@ -0,0 +1,204 @@
+"""
+Image preprocessing of rendered pages before OCR.
+
+Scanned authorizations arrive as faxes and phone photos: grey backgrounds, slightly
+rotated, with dark scanner borders and far more pixels than the OCR needs. The steps
+here clean that up with plain NumPy so the OCR reads less noise and fewer pixels:
+
+- grayscale: one channel instead of three, always applied when any step is
+- downscale: area-average the page down to OCR_TARGET_DPI
+- deskew: rotate text lines back to horizontal, by the projection profile method
+- binarize: black text on white by comparing each pixel with the mean of its neighbourhood
+- trim: crop white margins and dark scanner borders
+
+The settings are part of the OCR cache key, see ocr_service.ocr_settings. Use
+benchmarks/bench_ocr_preprocessing.py to compare their speed and accuracy.
+"""
+from typing import Any, Dict, List, Optional
+import os
+
+import numpy as np
+
+# Steps that can be enabled, applied in this order whatever the order they are listed in.
+# Downscaling is enabled by OCR_TARGET_DPI and applied right after the grayscale conversion.
+PREPROCESS_STEPS = ["grayscale", "deskew", "binarize", "trim"]
+
+def parse_steps(value: str) -> List[str]:
+    """
+    Parse a comma separated list of preprocessing steps, e.g. "binarize,deskew".
+
+    Raises:
+        ValueError: If a step is unknown.
+    """
+    steps = [step.strip().lower() for step in value.split(",") if step.strip()]
+    unknown = [step for step in steps if step not in PREPROCESS_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown OCR preprocessing steps: {', '.join(unknown)}")
+    return steps
+
+# Preprocessing steps, comma separated, empty sends the rendered colour page to the OCR unchanged
+OCR_PREPROCESS_STEPS = parse_steps(os.getenv("OCR_PREPROCESS_STEPS", ""))
+
+# Resolution pages are downscaled to before OCR, 0 keeps the render resolution of 72 DPI per unit of render scale
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "0"))
+
+# Side in pixels of the neighbourhood each pixel is compared with when binarizing, odd
+OCR_BINARIZE_BLOCK_SIZE = int(os.getenv("OCR_BINARIZE_BLOCK_SIZE", "31"))
+
+# How much darker than its neighbourhood a pixel must be to count as text
+OCR_BINARIZE_OFFSET = int(os.getenv("OCR_BINARIZE_OFFSET", "10"))
+
+# Largest rotation deskew corrects, in degrees, and the precision it finds it with
+OCR_MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.25
+
+# Pixels darker than this count as ink when deskewing and trimming
+INK_THRESHOLD = 128
+
+def _integral(gray: np.ndarray) -> np.ndarray:
+    """Summed-area table of an image, with a leading row and column of zeros."""
+    return np.pad(gray.astype(np.int64).cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+
+def _box_sums(integral: np.ndarray, y0: np.ndarray, y1: np.ndarray, x0: np.ndarray, x1: np.ndarray) -> np.ndarray:
+    """Sum of every box [y0, y1) x [x0, x1) for all combinations of rows and columns."""
+    return integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0]
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Convert an RGB or RGBA image to 8-bit grayscale with the ITU-R BT.601 weights."""
+    if image.ndim == 2:
+        return image.astype(np.uint8, copy=False)
+    rgb = image[..., :3].astype(np.float32)
+    return (rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).round().astype(np.uint8)
+
+def resize_area(gray: np.ndarray, height: int, width: int) -> np.ndarray:
+    """
+    Downscale a grayscale image by averaging the pixels each output pixel covers.
+
+    Args:
+        gray: The image.
+        height: Output height, at most the image height.
+        width: Output width, at most the image width.
+    """
+    rows = np.linspace(0, gray.shape[0], height + 1).round().astype(np.intp)
+    columns = np.linspace(0, gray.shape[1], width + 1).round().astype(np.intp)
+    sums = _box_sums(_integral(gray), rows[:-1], rows[1:], columns[:-1], columns[1:])
+    counts = np.diff(rows)[:, None] * np.diff(columns)[None, :]
+    return (sums / counts).round().astype(np.uint8)
+
+def adaptive_threshold(gray: np.ndarray, block_size: int = OCR_BINARIZE_BLOCK_SIZE, offset: int = OCR_BINARIZE_OFFSET) -> np.ndarray:
+    """
+    Binarize an image against the mean of each pixel's neighbourhood.
+
+    Unlike a global threshold, this keeps text readable on uneven fax backgrounds.
+
+    Returns:
+        0 for text pixels and 255 for the background.
+    """
+    height, width = gray.shape
+    radius = block_size // 2
+    rows, columns = np.arange(height), np.arange(width)
+    y0, y1 = np.clip(rows - radius, 0, height), np.clip(rows + radius + 1, 0, height)
+    x0, x1 = np.clip(columns - radius, 0, width), np.clip(columns + radius + 1, 0, width)
+    mean = _box_sums(_integral(gray), y0, y1, x0, x1) / ((y1 - y0)[:, None] * (x1 - x0)[None, :])
+    return np.where(gray < mean - offset, 0, 255).astype(np.uint8)
+
+def estimate_skew(gray: np.ndarray, max_degrees: float = OCR_MAX_SKEW_DEGREES, step: float = SKEW_STEP_DEGREES) -> float:
+    """
+    Estimate the rotation of the text lines of a page.
+
+    Every candidate angle shears the ink pixels back by that angle and projects them
+    onto the vertical axis. At the right angle the text lines line up and the profile
+    has the sharpest peaks, measured by the sum of its squares.
+
+    Returns:
+        The angle in degrees, positive when lines descend to the right.
+    """
+    ink_rows, ink_columns = np.nonzero(gray < INK_THRESHOLD)
+    if len(ink_rows) < 100:
+        return 0.0
+    # A sample of the ink is enough to find the angle
+    stride = max(1, len(ink_rows) // 200_000)
+    ink_rows, ink_columns = ink_rows[::stride], ink_columns[::stride]
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_degrees, max_degrees + step / 2, step):
+        shifted = np.round(ink_rows - ink_columns * np.tan(np.radians(angle))).astype(np.intp)
+        profile = np.bincount(shifted - shifted.min()).astype(np.float64)
+        score = float(np.dot(profile, profile))
+        # Ties go to the smallest rotation
+        if score > best_score or (score == best_score and abs(angle) < abs(best_angle)):
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+def deskew(gray: np.ndarray, degrees: float) -> np.ndarray:
+    """
+    Straighten text lines that descend by ``degrees`` to the right.
+
+    Each column is shifted vertically. For the few degrees scanned pages are off, this
+    shear is close enough to a rotation and much cheaper.
+    """
+    height, width = gray.shape
+    shift = np.round(np.arange(width) * np.tan(np.radians(degrees))).astype(np.intp)
+    source_rows = np.arange(height)[:, None] + shift[None, :]
+    inside = (source_rows >= 0) & (source_rows < height)
+    straightened = gray[np.clip(source_rows, 0, height - 1), np.arange(width)[None, :]]
+    return np.where(inside, straightened, 255).astype(np.uint8)
+
+def trim_borders(gray: np.ndarray, margin: int = 8, max_ink_fraction: float = 0.5) -> np.ndarray:
+    """
+    Crop the white margins and dark scanner borders around the content of a page.
+
+    Rows and columns that are mostly ink, like the black edges of a scan, are ignored,
+    and the image is cropped to the remaining ink with ``margin`` pixels around it.
+    """
+    ink = gray < INK_THRESHOLD
+    # Ink of the borders is left out first, a black edge along one side touches every row
+    ink[ink.mean(axis=1) >= max_ink_fraction, :] = False
+    ink[:, ink.mean(axis=0) >= max_ink_fraction] = False
+    content_rows = np.nonzero(ink.any(axis=1))[0]
+    content_columns = np.nonzero(ink.any(axis=0))[0]
+    if not len(content_rows) or not len(content_columns):
+        return gray
+    top, bottom = max(content_rows[0] - margin, 0), content_rows[-1] + margin + 1
+    left, right = max(content_columns[0] - margin, 0), content_columns[-1] + margin + 1
+    return gray[top:bottom, left:right]
+
+def preprocess_page(image: np.ndarray, render_dpi: float, steps: Optional[List[str]] = None, target_dpi: Optional[int] = None) -> np.ndarray:
+    """
+    Prepare a rendered page for OCR.
+
+    Args:
+        image: The rendered page, RGB or grayscale.
+        render_dpi: Resolution the page was rendered at.
+        steps: Steps to apply, OCR_PREPROCESS_STEPS if omitted.
+        target_dpi: Resolution to downscale to, OCR_TARGET_DPI if omitted, 0 to keep the render resolution.
+
+    Returns:
+        The image unchanged if there is nothing to do, otherwise a grayscale image.
+    """
+    steps = OCR_PREPROCESS_STEPS if steps is None else steps
+    target_dpi = OCR_TARGET_DPI if target_dpi is None else target_dpi
+    downscale = bool(target_dpi) and target_dpi < render_dpi
+    if not steps and not downscale:
+        return image
+
+    gray = to_grayscale(image)
+    if downscale:
+        factor = target_dpi / render_dpi
+        gray = resize_area(gray, max(1, round(gray.shape[0] * factor)), max(1, round(gray.shape[1] * factor)))
+    if "deskew" in steps:
+        angle = estimate_skew(gray)
+        if angle:
+            gray = deskew(gray, angle)
+    if "binarize" in steps:
+        gray = adaptive_threshold(gray)
+    if "trim" in steps:
+        gray = trim_borders(gray)
+    return gray
+
+def preprocessing_settings() -> Dict[str, Any]:
+    """Return the preprocessing settings, part of the OCR cache key."""
+    return {
+        "steps": [step for step in PREPROCESS_STEPS if step in OCR_PREPROCESS_STEPS],
+        "target_dpi": OCR_TARGET_DPI,
+        "binarize": [OCR_BINARIZE_BLOCK_SIZE, OCR_BINARIZE_OFFSET] if "binarize" in OCR_PREPROCESS_STEPS else None,
+    }
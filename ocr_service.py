@@ -0,0 +1,317 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from ocr_preprocessing import preprocess_page, preprocessing_settings
+
+logger = logging.getLogger(__name__)
+
+# Languages of the OCR models, comma separated
+OCR_LANGUAGES = [language.strip() for language in os.getenv("OCR_LANGUAGES", "en").split(",") if language.strip()]
+
+# Scale pages are rendered at before OCR, higher is slower but reads small print better
+OCR_RENDER_SCALE = float(os.getenv("OCR_RENDER_SCALE", "2.0"))
+
+# Increase when a change to rendering or OCR changes the extracted text, so cached results are not reused
+OCR_SETTINGS_VERSION = 2
+
+# Use the embedded text of pages that have a usable text layer instead of OCR, see has_usable_text_layer
+TEXT_LAYER_DETECTION = os.getenv("TEXT_LAYER_DETECTION", "true").lower() in ("1", "true", "yes")
+
+# Fewest visible characters a page's text layer needs to be used instead of OCR
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "40"))
+
+# Load the OCR models when the process starts instead of on the first OCR request.
+# Only enable it on the workers that serve PDF extraction.
+OCR_PREWARM = os.getenv("OCR_PREWARM", "false").lower() in ("1", "true", "yes")
+
+# Number of processes that OCR pages in parallel, 0 runs OCR in the calling thread.
+# The pool is shared by all uploads of this process, so it also caps their total CPU use.
+OCR_POOL_WORKERS = int(os.getenv("OCR_POOL_WORKERS", "0"))
+
+# Threads torch may use in each pool process, more than one oversubscribes the CPU
+OCR_TORCH_THREADS = int(os.getenv("OCR_TORCH_THREADS", "1"))
+
+# Pages read with one batched recognition call, see ocr_pdf_pages_batched, 1 reads pages one at a time
+OCR_BATCH_PAGES = int(os.getenv("OCR_BATCH_PAGES", "4"))
+
+# Text boxes the recognition model reads at once
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+
+# Data loader processes that prepare the text boxes of a batched call, 0 prepares them in the calling thread
+OCR_BATCH_WORKERS = int(os.getenv("OCR_BATCH_WORKERS", "0"))
+
+_reader: Optional[Any] = None
+_reader_lock = threading.Lock()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _create_reader(languages: List[str]):
+    """Load the easyocr detection and recognition models."""
+    # Imported here so that processes which never run OCR do not load torch
+    import easyocr
+
+    started = time.perf_counter()
+    reader = easyocr.Reader(languages)
+    logger.info(f"Loaded OCR models for {', '.join(languages)} in {time.perf_counter() - started:.1f}s")
+    return reader
+
+def get_ocr_reader():
+    """Return the process-wide easyocr reader, loading its models on first use."""
+    global _reader
+    # Checked once without the lock so that readers already loaded are returned without contention
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _reader = _create_reader(OCR_LANGUAGES)
+    return _reader
+
+def prewarm_ocr_reader() -> bool:
+    """
+    Load the OCR models now if OCR_PREWARM is set.
+
+    Returns:
+        Whether the models were loaded.
+    """
+    if not OCR_PREWARM:
+        return False
+    if OCR_POOL_WORKERS:
+        # Each pool process loads its own models when it starts
+        for future in [get_ocr_pool().submit(_pool_worker_ready) for _ in range(OCR_POOL_WORKERS)]:
+            future.result()
+    else:
+        get_ocr_reader()
+    return True
+
+def render_page(pdf, page_index: int, scale: Optional[float] = None, crop: Tuple[float, ...] = (0, 0, 0, 0)) -> np.ndarray:
+    """
+    Render one page of a PDF to the image the OCR reads, see ocr_preprocessing.
+
+    Args:
+        pdf: An open pypdfium2 PdfDocument.
+        page_index: Index of the page, starting at 0.
+        scale: Render scale, OCR_RENDER_SCALE if omitted.
+        crop: Points to leave out of the render on the left, bottom, right and top.
+    """
+    bitmap = pdf[page_index].render(
+        scale=scale or OCR_RENDER_SCALE,  # Higher scale for better OCR quality
+        rotation=0,
+        crop=crop
+    )
+    # Rendering happens at 72 DPI per unit of scale
+    return preprocess_page(np.array(bitmap.to_pil()), render_dpi=72 * (scale or OCR_RENDER_SCALE))
+
+def ocr_pdf_page(pdf, page_index: int, reader=None, scale: Optional[float] = None, crop: Tuple[float, ...] = (0, 0, 0, 0)) -> str:
+    """
+    Render one page of a PDF and read its text with OCR.
+
+    Args:
+        pdf: An open pypdfium2 PdfDocument.
+        page_index: Index of the page, starting at 0.
+        reader: The easyocr reader, the process-wide one if omitted.
+        scale: Render scale, OCR_RENDER_SCALE if omitted.
+        crop: Points to leave out of the render on the left, bottom, right and top.
+
+    Returns:
+        The detected lines of text, one per line.
+    """
+    image = render_page(pdf, page_index, scale, crop)
+    results = (reader or get_ocr_reader()).readtext(image, batch_size=OCR_BATCH_SIZE)
+    return "\n".join([text[1] for text in results])
+
+def _pad_image(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Extend an image to ``height`` x ``width`` with white at the bottom and right."""
+    padding = [(0, height - image.shape[0]), (0, width - image.shape[1])] + [(0, 0)] * (image.ndim - 2)
+    return np.pad(image, padding, constant_values=255)
+
+def ocr_pdf_pages_batched(pdf, page_indexes: List[int], reader=None, scale: Optional[float] = None) -> List[str]:
+    """
+    Read pages of a PDF with batched OCR calls, OCR_BATCH_PAGES pages at a time.
+
+    Each window of pages is rendered and read with one readtext_batched call, so the
+    detection and recognition models run on batches instead of one page at a time.
+    Batched pages must have the same size, smaller pages are padded with white, which
+    leaves their text and its positions unchanged.
+
+    Args:
+        pdf: An open pypdfium2 PdfDocument.
+        page_indexes: Indexes of the pages to read.
+        reader: The easyocr reader, the process-wide one if omitted.
+        scale: Render scale, OCR_RENDER_SCALE if omitted.
+
+    Returns:
+        The text of each page, in the order of ``page_indexes``.
+    """
+    reader = reader or get_ocr_reader()
+    window = max(OCR_BATCH_PAGES, 1)
+    texts = []
+    for start in range(0, len(page_indexes), window):
+        images = [render_page(pdf, page_index, scale) for page_index in page_indexes[start:start + window]]
+        height = max(image.shape[0] for image in images)
+        width = max(image.shape[1] for image in images)
+        results = reader.readtext_batched(
+            [_pad_image(image, height, width) for image in images],
+            batch_size=OCR_BATCH_SIZE,
+            workers=OCR_BATCH_WORKERS
+        )
+        texts.extend("\n".join([text[1] for text in page_results]) for page_results in results)
+    return texts
+
+def _init_pool_worker():
+    """Limit the threads of a pool process and load its OCR models."""
+    try:
+        import torch
+        torch.set_num_threads(OCR_TORCH_THREADS)
+    except ImportError:
+        pass
+    get_ocr_reader()
+
+def _pool_worker_ready() -> bool:
+    """Return once the pool process has loaded its OCR models."""
+    return get_ocr_reader() is not None
+
+def _ocr_page_in_worker(pdf_path: str, page_index: int) -> str:
+    """OCR one page inside a pool process, which renders it from the spooled PDF file itself."""
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return ocr_pdf_page(pdf, page_index)
+    finally:
+        pdf.close()
+
+def _remove_when_done(path: str, futures: List[Future]):
+    """Delete a file once every future has finished or was cancelled."""
+    remaining = len(futures)
+    lock = threading.Lock()
+
+    def release(_):
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove spooled PDF {path}: {e}")
+
+    for future in futures:
+        future.add_done_callback(release)
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """Return the process-wide OCR process pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked, forking a process that already loaded torch can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pool_worker
+            )
+        return _pool
+
+def shutdown_ocr_pool():
+    """Stop the OCR pool processes, if they were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def ocr_pdf_pages(pdf_bytes: bytes, page_indexes: List[int]) -> List[str]:
+    """
+    OCR pages of a PDF in parallel in the OCR pool.
+
+    Only the path of the spooled PDF and the page texts are sent between processes,
+    pages are rendered inside the pool processes, see submit_ocr_pages.
+
+    Args:
+        pdf_bytes: Content of the PDF file.
+        page_indexes: Indexes of the pages to read.
+
+    Returns:
+        The text of each page, in the order of ``page_indexes``.
+    """
+    return [future.result() for future in submit_ocr_pages(pdf_bytes, page_indexes)]
+
+def submit_ocr_pages(pdf_bytes: bytes, page_indexes: List[int]) -> List[Future]:
+    """
+    Queue pages of a PDF for OCR in the OCR pool.
+
+    The PDF is written to a temporary file once and every page task only carries its
+    path, instead of a copy of the whole document per page. The file is deleted when
+    the last page is done or cancelled.
+
+    Returns:
+        A future of the text of each page, in the order of ``page_indexes``. Cancelling
+        the futures of pages that have not started skips their OCR.
+    """
+    if not page_indexes:
+        return []
+    pool = get_ocr_pool()
+    with tempfile.NamedTemporaryFile(prefix="ocr-", suffix=".pdf", delete=False) as spool_file:
+        spool_file.write(pdf_bytes)
+    futures = []
+    try:
+        for page_index in page_indexes:
+            futures.append(pool.submit(_ocr_page_in_worker, spool_file.name, page_index))
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        if futures:
+            _remove_when_done(spool_file.name, futures)
+        else:
+            os.remove(spool_file.name)
+    return futures
+
+def ocr_settings() -> Dict[str, Any]:
+    """Return the settings that affect OCR output, part of the OCR cache key."""
+    return {
+        "version": OCR_SETTINGS_VERSION,
+        "languages": OCR_LANGUAGES,
+        "scale": OCR_RENDER_SCALE,
+        "text_layer_min_chars": TEXT_LAYER_MIN_CHARS if TEXT_LAYER_DETECTION else None,
+        "preprocessing": preprocessing_settings(),
+    }
+
+def has_usable_text_layer(text: str, min_chars: int = TEXT_LAYER_MIN_CHARS) -> bool:
+    """
+    Tell whether the embedded text of a page can be used instead of OCR.
+
+    Scanned pages have no text layer or only a few stray characters, and some PDF
+    generators embed text with broken font encodings, which comes out as replacement
+    or control characters, or as letters without word breaks. Those pages need OCR.
+
+    Args:
+        text: Text of the page from its text layer.
+        min_chars: Fewest visible characters a usable page has.
+
+    Returns:
+        Whether the text layer looks like readable text.
+    """
+    visible = [char for char in text if not char.isspace()]
+    # A blank page has no text layer, even when min_chars allows zero characters
+    if not visible or len(visible) < min_chars:
+        return False
+    # Encoding problems show up as U+FFFD, control or private use characters
+    readable = sum(1 for char in visible if char.isprintable() and char != "\ufffd" and not "\ue000" <= char <= "\uf8ff")
+    if readable < 0.95 * len(visible):
+        return False
+    # Forms are mostly letters and digits, with some punctuation
+    if sum(1 for char in visible if char.isalnum()) < 0.5 * len(visible):
+        return False
+    # Text without word breaks, or with a space after every letter, is not usable either
+    words = text.split()
+    average_word_length = len(visible) / len(words)
+    return 1.5 <= average_word_length <= 25
@@ -1,15 +1,22 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from io import StringIO, BytesIO
-from datetime import datetime
+from datetime import datetime, time
 import sys
 import os
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from appointment_service import process_uploaded_appointments, delete_appointment
-from models import Patient, Provider, Location, Appointment
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from appointment_service import (
+    process_uploaded_appointments, delete_appointment, copy_load_appointments,
+    normalize_appointment_row, staging_record, _copy_records, _merge_staged_appointments, read_appointment_csv,
+    parse_time, infer_format, parse_date_columns, DATETIME_FORMATS, validate_appointment_csv
+)
+from models import Patient, Provider, Location, Appointment, AppointmentStatus, Gender
 
 @pytest.fixture
 def mock_session():
@@ -18,6 +25,12 @@ def mock_session():
     session.flush = MagicMock()
     return session
 
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
 @pytest.fixture
 def sample_csv_content():
     return '''Client,Client Number,Mobile,Sex,Gender Identity,Postcode,State,Practitioner,Location,Date,End Time,Appointment Type,Type,Invoice,Appointment Notes,Appointment Flag,Status
@@ -258,4 +271,491 @@ def test_delete_appointment_database_error(mock_session):
     assert str(filter_call) == str(Appointment.appointment_id == 1)
     mock_session.delete.assert_called_once_with(mock_appointment)
     mock_session.commit.assert_called_once()
-    mock_session.rollback.assert_called_once() 
\ No newline at end of file
+    mock_session.rollback.assert_called_once() 
+
+def test_process_uploaded_appointments_bulk_resolve(sqlite_engine, mock_upload_file):
+    # Arrange
+    with Session(sqlite_engine) as session:
+        session.add(Provider(name="Dr. Smith"))
+        session.add(Patient(first_name="Jane", last_name="Smith", client_number="67890"))
+        session.commit()
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(mock_upload_file, True, session, bulk_resolve=True)
+
+    # Assert
+    assert result["total_processed"] == 2
+    assert result["created"] == 2
+    assert result["errors"] == 0
+    with Session(sqlite_engine) as session:
+        assert len(session.exec(select(Patient)).all()) == 2
+        assert len(session.exec(select(Provider)).all()) == 2
+        assert len(session.exec(select(Location)).all()) == 2
+        appointment_patient_ids = session.exec(select(Appointment.patient_id)).all()
+        assert len(appointment_patient_ids) == 2
+        patient = session.exec(select(Patient).where(Patient.client_number == "67890")).one()
+        assert patient.patient_id in appointment_patient_ids
+
+def test_process_uploaded_appointments_bulk_resolve_constant_queries(sqlite_engine):
+    # Arrange
+    header = "Client,Client Number,Mobile,Sex,Gender Identity,Postcode,State,Practitioner,Location,Date,End Time,Appointment Type,Type,Invoice,Appointment Notes,Appointment Flag,Status"
+    def make_file(num_rows):
+        lines = [header] + [
+            f"Client {i},{i},555-0123,Male,Male,12345,NY,Dr. {i % 7},Clinic {i % 3},3/08/2025 11:00 AM,12:00 PM,Initial,Regular,INV{i},,,Pending"
+            for i in range(num_rows)
+        ]
+        mock_file = Mock()
+        mock_file.file = BytesIO("\n".join(lines).encode('utf-8'))
+        mock_file.filename = "test.csv"
+        return mock_file
+
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    def count_lookups(num_rows):
+        statements.clear()
+        with Session(sqlite_engine) as session:
+            result = process_uploaded_appointments(make_file(num_rows), True, session, bulk_resolve=True)
+        assert result["created"] == num_rows
+        return sum(1 for statement in statements if statement.lstrip().upper().startswith("SELECT"))
+
+    # Act / Assert
+    assert count_lookups(10) == count_lookups(200)
+
+def test_normalize_appointment_row_coerces_enums():
+    # Arrange
+    row = {
+        'Client': 'John Doe', 'Client Number': '12345', 'Practitioner': 'Dr. Smith',
+        'Location': 'Main Clinic', 'Date': '3/08/2025 11:00 AM', 'Status': 'No Show', 'Sex': 'Female'
+    }
+
+    # Act
+    fields = normalize_appointment_row(row)
+
+    # Assert
+    assert fields["status"] == AppointmentStatus.NO_SHOW
+    assert fields["sex"] == Gender.FEMALE
+    assert fields["appointment_datetime"] == datetime(2025, 3, 8, 11, 0)
+
+def test_normalize_appointment_row_invalid_status():
+    # Arrange
+    row = {
+        'Client': 'John Doe', 'Client Number': '12345', 'Practitioner': 'Dr. Smith',
+        'Location': 'Main Clinic', 'Date': '3/08/2025 11:00 AM', 'Status': 'Rescheduled'
+    }
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="Invalid AppointmentStatus value"):
+        normalize_appointment_row(row)
+
+def test_copy_records_writes_staging_csv():
+    # Arrange
+    row = {
+        'Client': 'Cher', 'Client Number': '12345', 'State': 'NY', 'Practitioner': 'Dr. Smith',
+        'Location': 'Main Clinic', 'Date': '3/08/2025 11:00 AM', 'Status': 'Pending', 'Sex': ''
+    }
+    record = staging_record(1, row, normalize_appointment_row(row))
+    cursor = MagicMock()
+
+    # Act
+    _copy_records(cursor, [record])
+
+    # Assert
+    sql, buffer = cursor.copy_expert.call_args[0]
+    assert sql.startswith("COPY appointment_import_staging (row_number, first_name, last_name")
+    # None is an unquoted empty field, which COPY loads as NULL, empty strings stay empty strings
+    assert buffer.getvalue().startswith('"1","Cher",,"12345","NY","","","Dr. Smith","Main Clinic","2025-03-08 11:00:00",')
+    assert ',"PENDING","",,"",,"' in buffer.getvalue()
+
+def test_merge_staged_appointments_creates_patients_like_bulk_resolve():
+    # Arrange
+    session = MagicMock()
+    session.execute.return_value = []
+
+    # Act
+    _merge_staged_appointments(session)
+
+    # Assert
+    patient_insert = next(
+        str(call.args[0]) for call in session.execute.call_args_list if "INSERT INTO patients" in str(call.args[0])
+    )
+    assert "(first_name, last_name, client_number, state, phone, zipcode, gender, created_at, updated_at)" in patient_insert
+    assert "s.phone, s.zipcode, CAST(s.sex AS gender)" in patient_insert
+    assert "ON CONFLICT" not in str(session.execute.call_args_list[-1].args[0])
+
+def test_bulk_resolve_stores_patient_contact_columns(sqlite_engine, mock_upload_file):
+    # Act
+    with Session(sqlite_engine) as session:
+        process_uploaded_appointments(mock_upload_file, True, session, bulk_resolve=True)
+
+    # Assert
+    with Session(sqlite_engine) as session:
+        patient = session.exec(select(Patient)).first()
+    assert (patient.phone, patient.zipcode, patient.gender, patient.state) == ("555-0123", "12345", Gender.MALE, "NY")
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="set TEST_POSTGRES_URL to an empty PostgreSQL database")
+def test_copy_load_appointments_matches_bulk_resolve_on_postgres():
+    # Arrange
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    rows = appointment_rows(3)
+    rows[1] = rows[1].replace(",555-0123,Male,Male,12345,", ",,,,,")
+    columns = (Patient.client_number, Patient.first_name, Patient.last_name, Patient.phone, Patient.zipcode, Patient.gender, Patient.state)
+
+    try:
+        # Act
+        with Session(engine) as session:
+            copied = copy_load_appointments(make_appointment_upload(rows), True, session)
+        with Session(engine) as session:
+            copied_patients = sorted(session.exec(select(*columns)).all())
+            copied_notes = sorted(session.exec(select(Appointment.notes, Appointment.import_fingerprint)).all())
+        SQLModel.metadata.drop_all(engine)
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            resolved = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True)
+        with Session(engine) as session:
+            resolved_patients = sorted(session.exec(select(*columns)).all())
+            resolved_notes = sorted(session.exec(select(Appointment.notes, Appointment.import_fingerprint)).all())
+    finally:
+        SQLModel.metadata.drop_all(engine)
+
+    # Assert
+    assert copied["created"] == resolved["created"] == 3
+    assert copied_patients == resolved_patients
+    assert copied_notes == resolved_notes == [("", None)] * 3
+
+def test_copy_load_appointments_falls_back_without_postgres(sqlite_engine, mock_upload_file):
+    # Act
+    with Session(sqlite_engine) as session:
+        result = copy_load_appointments(mock_upload_file, True, session)
+
+    # Assert
+    assert result["total_processed"] == 2
+    assert result["created"] == 2
+    assert result["errors"] == 0
+
+def test_read_appointment_csv_strips_bom_and_leaves_file_open(sample_csv_content):
+    # Arrange
+    upload = Mock()
+    upload.file = BytesIO(b'\xef\xbb\xbf' + sample_csv_content.encode('utf-8'))
+    stats = {"total_processed": 0, "created": 0, "errors": 0, "error_details": []}
+
+    # Act
+    rows = list(read_appointment_csv(upload, True, stats))
+
+    # Assert
+    assert [row["Client"] for row in rows] == ["John Doe", "Jane Smith"]
+    assert stats["errors"] == 0
+    assert not upload.file.closed
+
+def test_read_appointment_csv_missing_headers():
+    # Arrange
+    upload = Mock()
+    upload.file = BytesIO(b"Client,Client Number\nJohn Doe,12345")
+    stats = {"total_processed": 0, "created": 0, "errors": 0, "error_details": []}
+
+    # Act
+    rows = list(read_appointment_csv(upload, True, stats))
+
+    # Assert
+    assert rows == []
+    assert stats["errors"] == 1
+    assert "Missing required headers" in stats["error_details"][0]["error"]
+
+def test_process_uploaded_appointments_flushes_in_batches(mock_session, mock_upload_file):
+    # Arrange
+    mock_patient = Mock(patient_id=1)
+    mock_provider = Mock(provider_id=1)
+    mock_location = Mock(location_id=1)
+
+    with patch('appointment_service.IMPORT_BATCH_SIZE', 1), \
+         patch('appointment_service.get_or_create_patient', return_value=mock_patient), \
+         patch('appointment_service.get_or_create_provider', return_value=mock_provider), \
+         patch('appointment_service.get_or_create_location', return_value=mock_location):
+
+        # Act
+        result = process_uploaded_appointments(mock_upload_file, True, mock_session)
+
+    # Assert
+    assert result["created"] == 2
+    assert mock_session.flush.call_count == 2
+    assert mock_session.commit.call_count == 1
+
+def make_appointment_upload(rows):
+    header = "Client,Client Number,Mobile,Sex,Gender Identity,Postcode,State,Practitioner,Location,Date,End Time,Appointment Type,Type,Invoice,Appointment Notes,Appointment Flag,Status"
+    mock_file = Mock()
+    mock_file.file = BytesIO("\n".join([header] + rows).encode('utf-8'))
+    mock_file.filename = "test.csv"
+    return mock_file
+
+def appointment_rows(num_rows):
+    return [
+        f"Client {i},{i},555-0123,Male,Male,12345,NY,Dr. Smith,Main Clinic,3/08/2025 11:00 AM,12:00 PM,Initial,Regular,INV{i},,,Pending"
+        for i in range(num_rows)
+    ]
+
+def test_process_uploaded_appointments_chunked_skips_bad_rows(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(5)
+    rows[2] = ",,,,,,,,,3/08/2025 11:00 AM,,,,,,,"
+    checkpoints = []
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(
+            make_appointment_upload(rows), True, session, bulk_resolve=True,
+            commit_every=2, checkpoint_callback=lambda stats: checkpoints.append(dict(stats["checkpoint"]))
+        )
+
+    # Assert
+    assert result["created"] == 4
+    assert result["errors"] == 1
+    assert result["error_details"][0]["row"] == 3
+    assert result["aborted"] is False
+    assert [checkpoint["row"] for checkpoint in checkpoints] == [2, 4, 5]
+    with Session(sqlite_engine) as session:
+        assert len(session.exec(select(Appointment.appointment_id)).all()) == 4
+
+def test_process_uploaded_appointments_resumes_from_checkpoint(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(6)
+    checkpoints = []
+    with Session(create_engine("sqlite://")) as scratch_session:
+        SQLModel.metadata.create_all(scratch_session.get_bind())
+        process_uploaded_appointments(
+            make_appointment_upload(rows), True, scratch_session, bulk_resolve=True,
+            commit_every=2, checkpoint_callback=lambda stats: checkpoints.append(dict(stats["checkpoint"]))
+        )
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(
+            make_appointment_upload(rows), True, session, bulk_resolve=True,
+            commit_every=2, resume_from=checkpoints[0]
+        )
+
+    # Assert
+    assert result["total_processed"] == 6
+    assert result["created"] == 4
+    with Session(sqlite_engine) as session:
+        invoices = session.exec(select(Appointment.invoice_number)).all()
+    assert sorted(invoices) == ["INV2", "INV3", "INV4", "INV5"]
+
+def test_process_uploaded_appointments_chunk_database_error(mock_session):
+    # Arrange
+    mock_session.begin_nested.return_value.__exit__.return_value = False
+    mock_session.flush.side_effect = [None, Exception("deadlock detected")]
+    checkpoints = []
+
+    with patch('appointment_service.get_or_create_patient', return_value=Mock(patient_id=1)), \
+         patch('appointment_service.get_or_create_provider', return_value=Mock(provider_id=1)), \
+         patch('appointment_service.get_or_create_location', return_value=Mock(location_id=1)):
+
+        # Act
+        result = process_uploaded_appointments(
+            make_appointment_upload(appointment_rows(5)), True, mock_session,
+            commit_every=2, checkpoint_callback=lambda stats: checkpoints.append(dict(stats["checkpoint"]))
+        )
+
+    # Assert
+    assert result["aborted"] is True
+    assert result["created"] == 2
+    assert result["checkpoint"]["row"] == 2
+    assert [detail["row"] for detail in result["error_details"]] == [3, 4]
+    assert "deadlock detected" in result["error_details"][0]["error"]
+    assert mock_session.commit.call_count == 1
+    assert len(checkpoints) == 1
+
+def test_parse_time():
+    assert parse_time("12:00 PM") == time(12, 0)
+    assert parse_time("13:30") == time(13, 30)
+    assert parse_time("1.30 PM") == time(13, 30)
+    assert parse_time("") is None
+    assert parse_time("noon") is None
+
+def test_infer_format_prefers_format_matching_whole_sample():
+    # 03/04/2025 alone would match "%d/%m/%Y", 15/04/2025 rules out month first
+    assert infer_format(["03/04/2025", "", "15/04/2025"], DATETIME_FORMATS) == "%d/%m/%Y"
+    assert infer_format(["3/08/2025 11:00 AM", "3/15/2025 2:00 PM"], DATETIME_FORMATS) == "%m/%d/%Y %I:%M %p"
+    assert infer_format(["", "not a date"], DATETIME_FORMATS) is None
+
+def test_parse_date_columns_locks_format_and_falls_back_for_outliers():
+    # Arrange
+    formats = {}
+    first_batch = [
+        {"Date": "3/08/2025 11:00 AM", "End Time": "12:00 PM"},
+        {"Date": "2025-03-09", "End Time": ""},
+    ]
+    second_batch = [{"Date": "3/10/2025 9:15 AM", "End Time": "13:45"}]
+
+    # Act
+    first_dates, first_end_times = parse_date_columns(first_batch, formats)
+    second_dates, second_end_times = parse_date_columns(second_batch, formats)
+
+    # Assert
+    assert formats == {"Date": "%m/%d/%Y %I:%M %p", "End Time": "%I:%M %p"}
+    assert first_dates == [datetime(2025, 3, 8, 11, 0), datetime(2025, 3, 9)]
+    assert first_end_times == [time(12, 0), None]
+    assert second_dates == [datetime(2025, 3, 10, 9, 15)]
+    assert second_end_times == [time(13, 45)]
+    assert type(first_dates[0]) is datetime
+
+def test_process_uploaded_appointments_stores_end_time(sqlite_engine, mock_upload_file):
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(mock_upload_file, True, session, bulk_resolve=True)
+
+    # Assert
+    assert result["created"] == 2
+    with Session(sqlite_engine) as session:
+        end_times = session.exec(select(Appointment.end_time)).all()
+    assert sorted(end_times) == [time(12, 0), time(15, 0)]
+
+def test_process_uploaded_appointments_upsert_skips_and_updates(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(3)
+    with Session(sqlite_engine) as session:
+        process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+    rows[1] = rows[1].replace("Pending", "Completed")
+    rows.append(appointment_rows(4)[3])
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+
+    # Assert
+    assert (result["created"], result["updated"], result["skipped"], result["errors"]) == (1, 1, 2, 0)
+    assert sum(1 for statement in statements if "ON CONFLICT" in statement) == 1
+    with Session(sqlite_engine) as session:
+        appointments = session.exec(select(Appointment.invoice_number, Appointment.status)).all()
+    assert sorted(appointments) == [
+        ("INV0", AppointmentStatus.PENDING), ("INV1", AppointmentStatus.COMPLETED),
+        ("INV2", AppointmentStatus.PENDING), ("INV3", AppointmentStatus.PENDING),
+    ]
+
+def test_process_uploaded_appointments_upsert_unchanged_file_writes_nothing(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(5)
+    with Session(sqlite_engine) as session:
+        process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+
+    # Assert
+    assert result["skipped"] == 5
+    assert result["created"] == result["updated"] == 0
+    assert not [statement for statement in statements if statement.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+
+def test_process_uploaded_appointments_upsert_keeps_last_duplicate_row(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(1)
+    rows.append(rows[0].replace("Pending", "Cancelled"))
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+
+    # Assert
+    assert (result["created"], result["skipped"]) == (1, 1)
+    with Session(sqlite_engine) as session:
+        assert session.exec(select(Appointment.status)).all() == [AppointmentStatus.CANCELLED]
+
+def test_process_uploaded_appointments_without_upsert_imports_duplicate_rows(sqlite_engine):
+    # Arrange
+    rows = [
+        "Client 0,0,555-0123,Male,Male,12345,NY,Dr. Smith,Main Clinic,3/08/2025 11:00 AM,12:00 PM,Initial,Regular,,,,Pending",
+        "Client 0,0,555-0123,Male,Male,12345,NY,Dr. Smith,Main Clinic,3/08/2025 11:00 AM,12:00 PM,Follow-up,Regular,,,,Pending",
+    ]
+
+    # Act
+    with Session(sqlite_engine) as session:
+        first = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True)
+    with Session(sqlite_engine) as session:
+        again = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True)
+
+    # Assert
+    assert (first["created"], first["errors"]) == (2, 0)
+    assert (again["created"], again["errors"]) == (2, 0)
+    with Session(sqlite_engine) as session:
+        assert session.exec(select(Appointment.import_fingerprint)).all() == [None] * 4
+
+def test_process_uploaded_appointments_upsert_rejects_unparsed_dates(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(2)
+    rows[1] = rows[1].replace("3/08/2025 11:00 AM", "someday")
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+
+    # Assert
+    assert (result["created"], result["errors"]) == (0, 1)
+    assert result["error_details"][0]["row"] == 2
+    assert "Invalid date: 'someday'" in result["error_details"][0]["error"]
+
+def test_validate_only_reports_every_invalid_row_without_session(mock_session):
+    # Arrange
+    rows = appointment_rows(4)
+    rows[1] = rows[1].replace("3/08/2025 11:00 AM", "31/31/2025 11:00 AM").replace("Pending", "Rescheduled")
+    rows[3] = rows[3].replace("12:00 PM", "noon").replace(",Male,Male,", ",Robot,Male,")
+
+    # Act
+    result = process_uploaded_appointments(make_appointment_upload(rows), True, mock_session, validate_only=True)
+
+    # Assert
+    assert result["total_processed"] == 4
+    assert result["valid"] == 2
+    assert result["errors"] == 2
+    assert result["error_details"][0]["row"] == 2
+    assert "Invalid AppointmentStatus value" in result["error_details"][0]["error"]
+    assert result["error_details"][1]["row"] == 4
+    assert "Invalid Gender value" in result["error_details"][1]["error"]
+    # A plain import replaces unparsed dates and end times, which are only warnings
+    assert "Invalid date" not in result["error_details"][0]["error"]
+    assert "Invalid end time" not in result["error_details"][1]["error"]
+    assert result["date_formats"]["Date"] == "%m/%d/%Y %I:%M %p"
+    assert mock_session.method_calls == []
+
+def test_validate_only_matches_the_import(sqlite_engine):
+    # Arrange
+    rows = appointment_rows(4)
+    rows[1] = rows[1].replace("3/08/2025 11:00 AM", "31/31/2025 11:00 AM")
+    rows[2] = rows[2].replace("12:00 PM", "noon")
+    rows.append(rows[0].replace("Initial", "Follow-up"))
+
+    # Act
+    plain = validate_appointment_csv(make_appointment_upload(rows), True)
+    upsert = validate_appointment_csv(make_appointment_upload(rows), True, upsert=True)
+    with Session(sqlite_engine) as session:
+        imported = process_uploaded_appointments(make_appointment_upload(rows), True, session, bulk_resolve=True, upsert=True)
+
+    # Assert
+    assert (plain["errors"], plain["warnings"], plain["duplicates"]) == (0, 3, 1)
+    assert [detail["row"] for detail in plain["warning_details"]] == [2, 3, 5]
+    assert "Invalid date: '31/31/2025 11:00 AM', imported with the current time" in plain["warning_details"][0]["warning"]
+    assert "Invalid end time: 'noon', imported as 00:00" in plain["warning_details"][1]["warning"]
+    assert "Same appointment as row 1" in plain["warning_details"][2]["warning"]
+    assert (upsert["errors"], upsert["warnings"], upsert["duplicates"]) == (1, 2, 1)
+    assert "only the last of these rows is imported" in upsert["warning_details"][1]["warning"]
+    assert [detail["row"] for detail in imported["error_details"]] == [detail["row"] for detail in upsert["error_details"]]
+
+def test_validate_appointment_csv_missing_headers():
+    # Arrange
+    upload = Mock()
+    upload.file = BytesIO(b"Client,Date\nJohn Doe,3/08/2025 11:00 AM")
+
+    # Act
+    result = validate_appointment_csv(upload, True)
+
+    # Assert
+    assert result["total_processed"] == 0
+    assert result["errors"] == 1
+    assert result["error_details"][0]["row"] == 0
@@ -0,0 +1,155 @@
+import pytest
+import io
+import os
+import sys
+import threading
+import zipfile
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_extract import extract_batch, iter_pdf_documents
+from extraction_queue import ExtractionExecutor
+
+class FakeExtractor:
+    """Returns the PDF content as a field and records the saved batches."""
+
+    def __init__(self):
+        self.saved_batches = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def extract_key_information(self, content, is_pdf=False, pdf_type=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if content.startswith(b"broken"):
+                raise ValueError("cannot read PDF")
+            return {"patient_name": content.decode(), "pdf_type": "corvel"}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def save_many_to_database(self, records):
+        self.saved_batches.append([fields["patient_name"] for fields, _ in records])
+        return [f"Saved {fields['patient_name']}" for fields, _ in records]
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+def test_iter_pdf_documents_reads_pdfs_of_zip_in_name_order():
+    # Arrange
+    archive = make_zip({
+        "b.pdf": b"second",
+        "notes.txt": b"ignored",
+        "__MACOSX/._a.pdf": b"resource fork",
+        "folder/A.PDF": b"first",
+    })
+
+    # Act
+    documents = list(iter_pdf_documents(archive))
+
+    # Assert
+    assert documents == [("b.pdf", b"second"), ("folder/A.PDF", b"first")]
+
+def test_iter_pdf_documents_reads_directory_recursively(tmp_path):
+    # Arrange
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.pdf").write_bytes(b"nested")
+    (tmp_path / "a.pdf").write_bytes(b"top")
+    (tmp_path / "readme.md").write_bytes(b"ignored")
+
+    # Act
+    documents = list(iter_pdf_documents(str(tmp_path)))
+
+    # Assert
+    assert documents == [("a.pdf", b"top"), (os.path.join("sub", "b.pdf"), b"nested")]
+
+def test_iter_pdf_documents_reports_oversized_files(monkeypatch):
+    # Arrange
+    monkeypatch.setattr("batch_extract.MAX_BATCH_PDF_BYTES", 3)
+    archive = make_zip({"big.pdf": b"too large", "ok.pdf": b"ok"})
+
+    # Act
+    documents = dict(iter_pdf_documents(archive))
+
+    # Assert
+    assert isinstance(documents["big.pdf"], ValueError)
+    assert documents["ok.pdf"] == b"ok"
+
+def test_extract_batch_yields_every_document_and_a_summary():
+    # Arrange
+    extractor = FakeExtractor()
+    documents = [(f"{i}.pdf", f"patient {i}".encode()) for i in range(20)] + [("bad.pdf", b"broken")]
+
+    # Act
+    records = list(extract_batch(extractor, documents, max_workers=3))
+
+    # Assert
+    summary = records[-1]
+    results = {record["filename"]: record for record in records[:-1]}
+    assert summary["type"] == "summary"
+    assert summary["documents"] == 21 and summary["errors"] == 1 and summary["saved"] == 0
+    assert results["7.pdf"]["fields"]["patient_name"] == "patient 7"
+    assert results["7.pdf"]["pdf_type"] == "corvel"
+    assert results["bad.pdf"]["error"] == "cannot read PDF"
+    assert sorted(record["index"] for record in records[:-1]) == list(range(21))
+    assert extractor.max_active <= 3
+
+def test_extract_batch_reads_documents_lazily():
+    # Arrange
+    read = []
+
+    def documents():
+        for i in range(100):
+            read.append(i)
+            yield f"{i}.pdf", b"patient"
+
+    # Act
+    first = next(extract_batch(FakeExtractor(), documents(), max_workers=2))
+
+    # Assert
+    assert first["type"] == "document"
+    assert len(read) <= 6
+
+def test_extract_batch_saves_in_batches_and_skips_failed_documents():
+    # Arrange
+    extractor = FakeExtractor()
+    documents = [(f"{i}.pdf", f"patient {i}".encode()) for i in range(5)] + [("bad.pdf", b"broken")]
+
+    # Act
+    records = list(extract_batch(extractor, documents, max_workers=1, save=True, save_batch_size=2))
+
+    # Assert
+    summary = records[-1]
+    assert [len(batch) for batch in extractor.saved_batches] == [2, 2, 1]
+    assert summary["saved"] == 5 and summary["errors"] == 1
+    saved = [record for record in records[:-1] if not record["error"]]
+    assert all(record["saved"] == f"Saved {record['fields']['patient_name']}" for record in saved)
+
+def test_extract_batch_on_a_shared_executor_stays_within_its_workers(monkeypatch):
+    # Arrange
+    monkeypatch.setattr("batch_extract.BATCH_RETRY_SECONDS", 0.01)
+    extractor = FakeExtractor()
+    executor = ExtractionExecutor(max_workers=2, queue_size=1)
+    # Another request holds one of the three slots during the whole batch
+    release = threading.Event()
+    other = executor.submit(release.wait)
+    documents = [(f"{i}.pdf", f"patient {i}".encode()) for i in range(10)]
+
+    # Act
+    records = list(extract_batch(extractor, documents, max_workers=4, executor=executor))
+    release.set()
+    other.result(timeout=5)
+    executor.shutdown()
+
+    # Assert
+    assert records[-1]["documents"] == 10 and records[-1]["errors"] == 0
+    assert extractor.max_active <= 1
@@ -0,0 +1,87 @@
+import pytest
+from types import SimpleNamespace
+from io import BytesIO, StringIO
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from appointment_service import APPOINTMENT_CSV_COLUMNS, validate_appointment_csv
+from benchmarks.generate_appointments import generate_appointment_rows, write_appointment_csv
+from benchmarks.bench_appointment_import import find_regressions
+
+def test_generate_appointment_rows_is_seeded():
+    # Act
+    first = list(generate_appointment_rows(50, seed=7))
+    second = list(generate_appointment_rows(50, seed=7))
+    other = list(generate_appointment_rows(50, seed=8))
+
+    # Assert
+    assert first == second
+    assert first != other
+    assert all(len(row) == len(APPOINTMENT_CSV_COLUMNS) for row in first)
+
+def test_generate_appointment_rows_duplicate_rates():
+    # Act
+    rows = list(generate_appointment_rows(
+        2000, patient_duplicate_rate=0.9, provider_duplicate_rate=0.0, location_duplicate_rate=1.0
+    ))
+
+    # Assert
+    client_numbers = {row[APPOINTMENT_CSV_COLUMNS.index("Client Number")] for row in rows}
+    practitioners = {row[APPOINTMENT_CSV_COLUMNS.index("Practitioner")] for row in rows}
+    locations = {row[APPOINTMENT_CSV_COLUMNS.index("Location")] for row in rows}
+    assert 150 < len(client_numbers) < 250
+    assert len(practitioners) == 2000
+    assert len(locations) == 1
+
+def test_generated_csv_passes_validation():
+    # Arrange
+    out = StringIO(newline="")
+    write_appointment_csv(out, 500, seed=3)
+
+    # Act
+    result = validate_appointment_csv(SimpleNamespace(file=BytesIO(out.getvalue().encode("utf-8"))), True)
+
+    # Assert
+    assert result["total_processed"] == 500
+    assert result["errors"] == 0
+
+def test_find_regressions():
+    # Arrange
+    result = {"mode": "bulk", "rows": 1000, "database": "sqlite", "rows_per_second": 700.0, "errors": 0}
+    baseline = [dict(result, rows_per_second=1000.0)]
+
+    # Act / Assert
+    assert find_regressions([result], None, baseline, tolerance=0.4) == []
+    assert len(find_regressions([result], None, baseline, tolerance=0.2)) == 1
+    assert len(find_regressions([result], 800, None, tolerance=0.2)) == 1
+
+def test_score_fields_ignores_case_and_whitespace():
+    # Arrange
+    from benchmarks.bench_ocr_preprocessing import score_fields
+
+    # Act
+    correct, wrong = score_fields(
+        {"patient_name": "Jane Doe", "claim_number": "123-45", "injury_date": "01/02/2024"},
+        {"patient_name": " jane  DOE", "claim_number": "123-46", "injury_date": None}
+    )
+
+    # Assert
+    assert correct == 1
+    assert wrong == ["claim_number", "injury_date"]
+
+def test_pick_fastest_keeps_baseline_accuracy():
+    # Arrange
+    from benchmarks.bench_ocr_preprocessing import pick_fastest
+    results = [
+        {"config": "none", "seconds_per_page": 4.0, "accuracy": 0.9},
+        {"config": "grayscale-100dpi", "seconds_per_page": 1.0, "accuracy": 0.7},
+        {"config": "clean-150dpi", "seconds_per_page": 2.0, "accuracy": 0.9},
+    ]
+
+    # Act & Assert
+    assert pick_fastest(results, "none", 0.0)["config"] == "clean-150dpi"
+    assert pick_fastest(results, "none", 0.25)["config"] == "grayscale-100dpi"
+    assert pick_fastest(results, "binarize", 0.0) is None
@@ -0,0 +1,93 @@
+import pytest
+import hashlib
+import io
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blob_store import BlobStore, LocalBlobStore, iter_blob, parse_range
+
+def test_put_stores_each_content_once(tmp_path):
+    # Arrange
+    store = LocalBlobStore(str(tmp_path))
+    content = b"%PDF-1.7 authorization"
+
+    # Act
+    first = store.put(content)
+    second = store.put(io.BytesIO(content))
+
+    # Assert
+    digest = hashlib.sha256(content).hexdigest()
+    assert first == second == (digest, len(content))
+    assert (tmp_path / digest[:2] / digest[2:4] / digest).read_bytes() == content
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert stored == [digest]
+
+def test_open_size_and_delete(tmp_path):
+    # Arrange
+    store = LocalBlobStore(str(tmp_path))
+    digest, _ = store.put(b"form")
+
+    # Act
+    with store.open(digest) as blob:
+        content = blob.read()
+
+    # Assert
+    assert content == b"form"
+    assert store.size(digest) == 4
+    assert store.delete(digest) is True
+    assert store.delete(digest) is False
+    with pytest.raises(FileNotFoundError):
+        store.open(digest)
+
+def test_invalid_hashes_are_rejected(tmp_path):
+    # Arrange
+    store = LocalBlobStore(str(tmp_path))
+
+    # Act & Assert
+    with pytest.raises(ValueError):
+        store.open("../../etc/passwd")
+
+def test_blob_stores_must_implement_every_method():
+    # Arrange
+    class IncompleteBlobStore(BlobStore):
+        def put(self, data):
+            return "", 0
+
+    # Act & Assert
+    with pytest.raises(TypeError):
+        IncompleteBlobStore()
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=95-500", (95, 99)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    # Act & Assert
+    assert parse_range(header, 100) == expected
+
+def test_parse_range_rejects_ranges_outside_the_file():
+    # Act & Assert
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+def test_iter_blob_reads_the_requested_range(monkeypatch):
+    # Arrange
+    monkeypatch.setattr("blob_store.BLOB_CHUNK_SIZE", 3)
+    blob = io.BytesIO(b"0123456789")
+
+    # Act
+    chunks = list(iter_blob(blob, 2, 8))
+
+    # Assert
+    assert b"".join(chunks) == b"2345678"
+    assert max(len(chunk) for chunk in chunks) == 3
+    assert blob.closed
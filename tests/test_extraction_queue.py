@@ -0,0 +1,83 @@
+import pytest
+import asyncio
+import os
+import sys
+import threading
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction_queue import ExtractionExecutor, ExtractionQueueFull
+
+def test_submit_rejects_work_when_workers_and_queue_are_full():
+    # Arrange
+    executor = ExtractionExecutor(max_workers=1, queue_size=1)
+    release = threading.Event()
+    running = executor.submit(release.wait)
+    waiting = executor.submit(release.wait)
+
+    # Act & Assert
+    with pytest.raises(ExtractionQueueFull):
+        executor.submit(release.wait)
+    release.set()
+    running.result(timeout=5)
+    waiting.result(timeout=5)
+    executor.shutdown()
+
+def test_slots_are_released_when_work_finishes_or_fails():
+    # Arrange
+    executor = ExtractionExecutor(max_workers=1, queue_size=0)
+
+    def fail():
+        raise ValueError("broken PDF")
+
+    # Act
+    with pytest.raises(ValueError):
+        executor.submit(fail).result(timeout=5)
+    result = executor.submit(lambda: "extracted").result(timeout=5)
+
+    # Assert
+    assert result == "extracted"
+    executor.shutdown()
+
+def test_run_returns_result_without_blocking_the_event_loop():
+    # Arrange
+    executor = ExtractionExecutor(max_workers=1, queue_size=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def extract(text):
+        started.set()
+        release.wait(timeout=5)
+        return {"patient_name": text}
+
+    async def scenario():
+        task = asyncio.ensure_future(executor.run(extract, "Jane Doe"))
+        # The loop keeps serving other work while the extraction runs
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        assert not task.done()
+        release.set()
+        return await task
+
+    # Act
+    result = asyncio.run(scenario())
+
+    # Assert
+    assert result == {"patient_name": "Jane Doe"}
+    executor.shutdown()
+
+def test_is_full_matches_submit():
+    # Arrange
+    executor = ExtractionExecutor(max_workers=1, queue_size=0)
+    release = threading.Event()
+
+    # Act
+    empty = executor.is_full()
+    running = executor.submit(release.wait)
+    full = executor.is_full()
+    release.set()
+    running.result(timeout=5)
+
+    # Assert
+    assert not empty and full
+    executor.shutdown()
@@ -0,0 +1,76 @@
+import pytest
+import json
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import SQLModel, Session, create_engine
+
+import extraction_runs
+from models import ExtractionRun
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'runs.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+def make_run(session, document_sha256="a" * 64, pdf_type="corvel", version="v1", fields=None):
+    run = ExtractionRun(
+        document_sha256=document_sha256,
+        pdf_type=pdf_type,
+        vendor=pdf_type,
+        settings_version=version,
+        page_texts=json.dumps(["page 1", "page 2"]),
+        extracted_fields=json.dumps(fields or {"patient_name": "John Smith"}),
+    )
+    session.add(run)
+    session.commit()
+    return run
+
+def test_settings_version_changes_with_settings():
+    # Act / Assert
+    assert extraction_runs.settings_version({"a": 1, "b": 2}) == extraction_runs.settings_version({"b": 2, "a": 1})
+    assert extraction_runs.settings_version({"a": 1}) != extraction_runs.settings_version({"a": 2})
+
+def test_find_reusable_run_matches_document_type_and_settings(session):
+    # Arrange
+    make_run(session)
+    latest = make_run(session, fields={"patient_name": "Jane Doe"})
+    make_run(session, version="v2")
+    make_run(session, pdf_type="homelink")
+
+    # Act / Assert
+    assert extraction_runs.find_reusable_run(session, "a" * 64, "corvel", "v1").run_id == latest.run_id
+    assert extraction_runs.find_reusable_run(session, "b" * 64, "corvel", "v1") is None
+    assert extraction_runs.find_reusable_run(session, "a" * 64, "onecall", "v1") is None
+
+def test_update_run_fields_keeps_extracted_fields(session):
+    # Arrange
+    run = make_run(session)
+
+    # Act
+    updated = extraction_runs.update_run_fields(session, run.run_id, {"patient_name": "Jane Doe"})
+    session.commit()
+
+    # Assert
+    assert extraction_runs.run_fields(updated) == {"patient_name": "Jane Doe"}
+    assert json.loads(updated.extracted_fields) == {"patient_name": "John Smith"}
+    assert extraction_runs.run_pages(updated) == ["page 1", "page 2"]
+    assert extraction_runs.update_run_fields(session, 999, {}) is None
+
+def test_link_runs_records_authorizations(session):
+    # Arrange
+    first, second = make_run(session), make_run(session)
+
+    # Act
+    linked = extraction_runs.link_runs(session, {first.run_id: 7, second.run_id: 8, 999: 9})
+    session.commit()
+
+    # Assert
+    assert linked == 2
+    assert session.get(ExtractionRun, first.run_id).authorization_id == 7
+    assert session.get(ExtractionRun, second.run_id).authorization_id == 8
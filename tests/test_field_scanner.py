@@ -0,0 +1,99 @@
+import pytest
+import re
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from field_scanner import FIELD_PATTERN_FLAGS, FieldScanner, leading_literal
+
+PATTERNS = {
+    'patient_name': [
+        r'Patient Name:\s*([^\n]+)',
+        r'Name:\s*([^\n]+?)(?:\s*Sex:|$)',
+    ],
+    'patient_dob': [
+        r'DOB:\s*(\d{1,2}/\d{1,2}/\d{4})',
+        r'Date\s*of\s*Birth\s*[:]*\s*(\d{1,2}/\d{1,2}/\d{4})',
+    ],
+    'patient_address': [
+        r'([^\n]+)\n([^\n]+,\s*[A-Z]{2}\s*\d{5})',
+    ],
+    'claim_number': [
+        r'Claims?\s*#:\s*(\w+)',
+    ],
+}
+
+def search_each(patterns, text):
+    """Reference result: search with every pattern in turn, like extract_key_information used to."""
+    results = {}
+    for field, field_patterns in patterns.items():
+        results[field] = None
+        for pattern in field_patterns:
+            match = re.search(pattern, text, FIELD_PATTERN_FLAGS)
+            if match:
+                results[field] = match
+                break
+    return results
+
+def spans(results):
+    return {field: (match.span(), match.groups()) if match else None for field, match in results.items()}
+
+def test_leading_literal():
+    # Act / Assert
+    assert leading_literal(r'DOB:\s*(\d+)') == "DOB:"
+    assert leading_literal(r'Claims?\s*#:') == "Claim"
+    assert leading_literal(r'Date\s*of') == "Date"
+    assert leading_literal(r'([^\n]+)\n') == ""
+
+@pytest.mark.parametrize("text", [
+    "Name: Jane Doe Sex: F\nDate of Birth: 01/02/1980\nPatient Name: John Smith\nDOB: 3/4/1975",
+    "NAME: jane doe\ndob: 12/31/1999\n12 Main St\nCorona, CA 92880\nClaim #: AB12",
+    "claims #: XY9\nname:\nDate of Birth 1/1/2000",
+    "Nothing to see here",
+    "",
+])
+def test_scan_matches_searching_each_pattern(text):
+    # Arrange
+    scanner = FieldScanner(PATTERNS)
+
+    # Act
+    results = scanner.scan(text)
+
+    # Assert
+    assert list(results) == list(PATTERNS)
+    assert spans(results) == spans(search_each(PATTERNS, text))
+
+def test_scan_prefers_earlier_patterns_over_earlier_positions():
+    # Arrange
+    scanner = FieldScanner(PATTERNS)
+    text = "Name: Jane Doe\nPatient Name: John Smith"
+
+    # Act
+    results = scanner.scan(text)
+
+    # Assert
+    assert results['patient_name'].group(1) == "John Smith"
+
+def test_scan_non_ascii_text_falls_back_to_search():
+    # Arrange
+    scanner = FieldScanner(PATTERNS)
+    text = "Patient Name: José Núñez\nDOB: 5/6/1970"
+
+    # Act
+    results = scanner.scan(text)
+
+    # Assert
+    assert spans(results) == spans(search_each(PATTERNS, text))
+    assert results['patient_name'].group(1) == "José Núñez"
+
+def test_invalid_patterns_are_skipped():
+    # Arrange
+    scanner = FieldScanner({'patient_dob': [r'DOB:\s*(\d+', r'DOB:\s*(\d+)']})
+
+    # Act
+    results = scanner.scan("DOB: 1980")
+
+    # Assert
+    assert results['patient_dob'].group(1) == "1980"
@@ -0,0 +1,189 @@
+import pytest
+from unittest.mock import Mock, patch
+from io import BytesIO
+from datetime import datetime, timedelta
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+import import_jobs
+from models import Appointment, ImportJob, ImportJobStatus
+
+CSV_HEADER = "Client,Client Number,Mobile,Sex,Gender Identity,Postcode,State,Practitioner,Location,Date,End Time,Appointment Type,Type,Invoice,Appointment Notes,Appointment Flag,Status"
+
+@pytest.fixture
+def job_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    SQLModel.metadata.create_all(engine)
+    # SQLite locks the whole file during the import transaction, so skip intermediate progress writes
+    with patch('import_jobs.engine', engine), \
+         patch('import_jobs.SPOOL_DIR', str(tmp_path / 'spool')), \
+         patch('import_jobs.PROGRESS_INTERVAL_SECONDS', float('inf')):
+        yield engine
+
+def make_upload(lines):
+    upload = Mock()
+    upload.file = BytesIO("\n".join(lines).encode('utf-8'))
+    upload.filename = "appointments.csv"
+    return upload
+
+def test_enqueue_and_run_import_job(job_engine):
+    # Arrange
+    upload = make_upload([CSV_HEADER] + [
+        f"Client {i},{i},555-0123,Male,Male,12345,NY,Dr. Smith,Main Clinic,3/08/2025 11:00 AM,12:00 PM,Initial,Regular,INV{i},,,Pending"
+        for i in range(5)
+    ])
+    executor = Mock()
+
+    # Act
+    with patch('import_jobs.get_executor', return_value=executor):
+        job = import_jobs.enqueue_import(upload, has_headers=True)
+    submitted_fn, submitted_job_id = executor.submit.call_args[0]
+    submitted_fn(submitted_job_id)
+
+    # Assert
+    with Session(job_engine) as session:
+        job = session.get(ImportJob, job.job_id)
+        progress = import_jobs.job_progress(job)
+        assert len(session.exec(select(Appointment.appointment_id)).all()) == 5
+    assert progress["status"] == "completed"
+    assert progress["rows_processed"] == 5
+    assert progress["rows_created"] == 5
+    assert progress["error_count"] == 0
+    assert progress["percent_complete"] == 100.0
+    assert not os.path.exists(job.spool_path)
+
+def test_run_import_job_records_errors(job_engine):
+    # Arrange
+    upload = make_upload([CSV_HEADER, ",,,,,,,,,3/08/2025 11:00 AM,,,,,,,"])
+
+    # Act
+    with patch('import_jobs.get_executor'):
+        job = import_jobs.enqueue_import(upload, has_headers=True)
+    import_jobs.run_import_job(job.job_id)
+
+    # Assert
+    with Session(job_engine) as session:
+        progress = import_jobs.job_progress(session.get(ImportJob, job.job_id))
+    assert progress["status"] == "failed"
+    assert progress["error_count"] == 1
+    assert "Missing required fields" in progress["error_details"][0]["error"]
+    assert os.path.exists(job.spool_path)
+
+def test_job_progress_eta():
+    # Arrange
+    job = ImportJob(
+        job_id=1, filename="appointments.csv", spool_path="/tmp/a.csv",
+        status=ImportJobStatus.RUNNING, total_bytes=1000, bytes_processed=250,
+        rows_processed=500, started_at=datetime.utcnow() - timedelta(seconds=10),
+        created_at=datetime.utcnow()
+    )
+
+    # Act
+    progress = import_jobs.job_progress(job)
+
+    # Assert
+    assert progress["percent_complete"] == 25.0
+    assert progress["rows_per_second"] == pytest.approx(50, rel=0.05)
+    assert progress["eta_seconds"] == pytest.approx(30, rel=0.05)
+
+def test_chunked_import_job_resumes_after_failure(job_engine):
+    # Arrange
+    upload = make_upload([CSV_HEADER] + [
+        f"Client {i},{i},555-0123,Male,Male,12345,NY,Dr. Smith,Main Clinic,3/08/2025 11:00 AM,12:00 PM,Initial,Regular,INV{i},,,Pending"
+        for i in range(6)
+    ])
+    build_appointments = import_jobs.appointment_service._build_appointments
+    calls = []
+    def fail_second_chunk(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise Exception("connection reset")
+        return build_appointments(*args, **kwargs)
+
+    with patch('import_jobs.get_executor'):
+        job = import_jobs.enqueue_import(upload, has_headers=True, commit_every=2)
+    with patch('appointment_service._build_appointments', side_effect=fail_second_chunk):
+        import_jobs.run_import_job(job.job_id)
+    with Session(job_engine) as session:
+        failed = session.get(ImportJob, job.job_id)
+        assert failed.status == ImportJobStatus.FAILED
+        assert failed.checkpoint_row == 2
+
+    # Act
+    with patch('import_jobs.get_executor'):
+        import_jobs.resume_import(job.job_id)
+    import_jobs.run_import_job(job.job_id)
+
+    # Assert
+    with Session(job_engine) as session:
+        progress = import_jobs.job_progress(session.get(ImportJob, job.job_id))
+        invoices = session.exec(select(Appointment.invoice_number)).all()
+    assert progress["status"] == "completed"
+    assert progress["rows_processed"] == 6
+    assert progress["rows_created"] == 6
+    assert progress["error_count"] == 0
+    assert sorted(invoices) == [f"INV{i}" for i in range(6)]
+
+def test_resume_import_rejects_completed_job(job_engine):
+    # Arrange
+    with Session(job_engine) as session:
+        job = ImportJob(filename="a.csv", spool_path="/tmp/a.csv", commit_every=100,
+                        status=ImportJobStatus.COMPLETED)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+    # Act / Assert
+    with pytest.raises(ValueError):
+        import_jobs.resume_import(job.job_id)
+
+def test_requeue_queued_imports_at_startup(job_engine, tmp_path):
+    # Arrange
+    spool_path = tmp_path / "queued.csv"
+    spool_path.write_text(CSV_HEADER)
+    with Session(job_engine) as session:
+        queued = ImportJob(filename="a.csv", spool_path=str(spool_path))
+        missing = ImportJob(filename="b.csv", spool_path=str(tmp_path / "missing.csv"))
+        running = ImportJob(filename="c.csv", spool_path=str(spool_path), status=ImportJobStatus.RUNNING)
+        session.add_all([queued, missing, running])
+        session.commit()
+        job_ids = [queued.job_id, missing.job_id, running.job_id]
+    executor = Mock()
+
+    # Act
+    with patch('import_jobs.get_executor', return_value=executor):
+        requeued = import_jobs.requeue_queued_imports()
+
+    # Assert
+    assert requeued == [job_ids[0]]
+    executor.submit.assert_called_once_with(import_jobs.run_import_job, job_ids[0])
+    with Session(job_engine) as session:
+        assert session.get(ImportJob, job_ids[1]).status == ImportJobStatus.FAILED
+        assert session.get(ImportJob, job_ids[2]).status == ImportJobStatus.RUNNING
+
+def test_run_import_job_skips_job_claimed_by_another_worker(job_engine):
+    # Arrange
+    upload = make_upload([CSV_HEADER,
+        "Client 1,1,555-0123,Male,Male,12345,NY,Dr. Smith,Main Clinic,3/08/2025 11:00 AM,12:00 PM,Initial,Regular,INV1,,,Pending"])
+    with patch('import_jobs.get_executor'):
+        job = import_jobs.enqueue_import(upload, has_headers=True)
+    import_jobs.run_import_job(job.job_id)
+
+    # Act
+    import_jobs.run_import_job(job.job_id)
+
+    # Assert
+    with Session(job_engine) as session:
+        assert session.get(ImportJob, job.job_id).status == ImportJobStatus.COMPLETED
+        assert len(session.exec(select(Appointment.appointment_id)).all()) == 1
+
+def test_import_job_byte_columns_are_64_bit():
+    # Assert
+    for name in ("total_bytes", "bytes_processed", "checkpoint_offset"):
+        assert ImportJob.__table__.c[name].type.python_type is int
+        assert ImportJob.__table__.c[name].type.__class__.__name__ == "BigInteger"
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import Mock, patch
+import io
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layout_templates import LAYOUT_TEMPLATES, LayoutRegion, region_crop, template_settings, validate_template
+
+def test_region_crop_leaves_out_everything_outside_the_box():
+    # Act
+    crop = region_crop(600, 800, (0.25, 0.1, 0.75, 0.5))
+
+    # Assert
+    assert crop == (150, 400, 150, 80)
+
+def test_validate_template_rejects_boxes_outside_the_page():
+    # Arrange
+    regions = [LayoutRegion("claim_number", 0, (0.5, 0.2, 1.2, 0.3))]
+
+    # Act & Assert
+    with pytest.raises(ValueError):
+        validate_template(regions)
+
+def test_validate_template_rejects_empty_boxes_and_repeated_fields():
+    # Act & Assert
+    with pytest.raises(ValueError):
+        validate_template([LayoutRegion("injury_date", 0, (0.5, 0.3, 0.6, 0.3))])
+    with pytest.raises(ValueError):
+        validate_template([
+            LayoutRegion("injury_date", 0, (0.1, 0.1, 0.2, 0.2)),
+            LayoutRegion("injury_date", 1, (0.1, 0.1, 0.2, 0.2)),
+        ])
+
+def test_template_settings_change_with_the_boxes():
+    # Arrange
+    regions = LAYOUT_TEMPLATES["corvel"]
+    moved = [regions[0]._replace(box=(0.0, 0.1, 0.5, 0.2))] + regions[1:]
+
+    # Act & Assert
+    assert template_settings(regions) == template_settings(list(regions))
+    assert template_settings(regions) != template_settings(moved)
+
+CORVEL_REGION_TEXTS = {
+    "patient_name": "CLAIMANT: John Smith",
+    "claim_number": "CLAIM #: CL-001",
+    "patient_dob": "DOB: 03/04/1980",
+    "injury_date": "DOI: 01/02/2024",
+    "provider_name": "Provider: Main Street Physical Therapy",
+    "service_type": "Type of Therapy: Physical Therapy",
+    "authorized_sessions": "Certified Visits: 12",
+    "effective_date": "Effective Date: 02/01/2024",
+}
+
+def blank_pdf():
+    pdfium = pytest.importorskip("pypdfium2")
+    pdf = pdfium.PdfDocument.new()
+    pdf.new_page(612, 792)
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+def make_extractor():
+    # The extractor module needs the Gradio and PDF dependencies
+    pytest.importorskip("gradio")
+    pytest.importorskip("reportlab")
+    from medical_pdf_extractor_ui import MedicalInfoExtractor
+    return MedicalInfoExtractor()
+
+def test_templates_cover_the_saved_fields_with_their_vendor_patterns():
+    # Arrange
+    extractor = make_extractor()
+
+    # Assert
+    for pdf_type, regions in LAYOUT_TEMPLATES.items():
+        fields = {region.field for region in regions}
+        assert set(extractor.get_saved_fields(pdf_type)) <= fields
+        assert fields <= set(extractor.get_scanner_for_type(pdf_type).fields)
+
+def test_template_covering_the_saved_fields_only_reads_the_region_crops():
+    # Arrange
+    extractor = make_extractor()
+    regions = LAYOUT_TEMPLATES["corvel"]
+    reader = Mock()
+    reader.readtext.side_effect = [[(None, CORVEL_REGION_TEXTS[region.field], 0.9)] for region in regions]
+    extractor.extract_pages_from_pdf = Mock(side_effect=AssertionError("the full pages were read"))
+
+    # Act
+    with patch('medical_pdf_extractor_ui.REGION_OCR_ENABLED', True), \
+         patch('medical_pdf_extractor_ui.get_ocr_cache', return_value=None), \
+         patch('medical_pdf_extractor_ui.get_ocr_reader', return_value=reader):
+        info = extractor.extract_key_information(blank_pdf(), is_pdf=True, pdf_type="corvel")
+
+    # Assert
+    assert reader.readtext.call_count == len(regions)
+    full_page = 792 * 2.0
+    for call, region in zip(reader.readtext.call_args_list, regions):
+        left, top, right, bottom = region.box
+        assert call.args[0].shape[0] == pytest.approx((bottom - top) * full_page, abs=2)
+    assert info["provider_name"] == "Main Street Physical Therapy"
+    assert info["authorized_sessions"] == "12"
+    assert info["effective_date"] == "02/01/2024"
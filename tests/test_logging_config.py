@@ -0,0 +1,69 @@
+import pytest
+import logging
+from unittest.mock import patch
+from sqlmodel import Session
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_config import DebugSampler, StageMetrics, parse_levels
+from appointment_service import process_uploaded_appointments
+from tests.test_appointment_service import appointment_rows, make_appointment_upload, sqlite_engine
+
+def make_record(level):
+    return logging.LogRecord("appointment_service", level, __file__, 1, "message", None, None)
+
+def test_parse_levels():
+    # Act
+    levels = parse_levels("appointment_service=debug, sqlalchemy.engine=WARNING,")
+
+    # Assert
+    assert levels == {"appointment_service": logging.DEBUG, "sqlalchemy.engine": logging.WARNING}
+    with pytest.raises(ValueError):
+        parse_levels("appointment_service=LOUD")
+
+def test_debug_sampler_only_drops_debug_records():
+    # Arrange
+    sampler = DebugSampler(0.0)
+
+    # Act / Assert
+    assert not sampler.filter(make_record(logging.DEBUG))
+    assert sampler.filter(make_record(logging.INFO))
+    assert DebugSampler(1.0).filter(make_record(logging.DEBUG))
+
+def test_stage_metrics_summary():
+    # Arrange
+    with patch("logging_config.time.perf_counter", side_effect=[0.0, 1.0, 1.5, 2.0, 2.25, 3.0]):
+        metrics = StageMetrics("appointment import")
+        with metrics.stage("parse"):
+            pass
+        with metrics.stage("parse"):
+            pass
+        metrics.count("batches")
+        metrics.count("batches", 2)
+
+        # Act
+        summary = metrics.summary()
+
+    # Assert
+    assert summary == {"batches": 3, "parse_ms": 750.0, "total_ms": 3000.0}
+
+def test_import_logs_one_summary_line(sqlite_engine, caplog):
+    # Arrange
+    upload = make_appointment_upload(appointment_rows(25))
+    caplog.set_level(logging.DEBUG, logger="appointment_service")
+
+    # Act
+    with Session(sqlite_engine) as session:
+        result = process_uploaded_appointments(upload, True, session, bulk_resolve=True)
+
+    # Assert
+    assert result["created"] == 25
+    info_records = [record for record in caplog.records if record.levelno >= logging.INFO]
+    assert len(info_records) == 1
+    message = info_records[0].getMessage()
+    assert message.startswith("appointment import finished mode=bulk")
+    assert "created=25" in message
+    assert "commit_ms=" in message
@@ -0,0 +1,131 @@
+import pytest
+from unittest.mock import Mock, patch
+import io
+import json
+import zipfile
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app builds the Gradio extractor UI, skip without its dependencies
+pytest.importorskip("gradio")
+pytest.importorskip("gradio_pdf")
+pytest.importorskip("pypdfium2")
+pytest.importorskip("reportlab")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+import main
+from extraction_queue import ExtractionQueueFull
+
+@pytest.fixture
+def client():
+    # Without a with block, the startup handlers that need the database do not run
+    return TestClient(main.app)
+
+def parse_events(body):
+    return [json.loads(block.split("data: ", 1)[1]) for block in body.strip().split("\n\n")]
+
+def test_extract_stream_sends_page_and_done_events(client):
+    # Arrange
+    def stream_key_information(pdf_bytes, pdf_type, needed_fields, cancelled):
+        assert needed_fields == ["patient_name", "claim_number"]
+        yield {"event": "page", "page": 0, "text": "CLAIMANT: John Smith", "fields": {"patient_name": "John Smith"}}
+        yield {"event": "done", "fields": {"patient_name": "John Smith"}, "complete": False}
+
+    # Act
+    with patch.object(main.extractor, 'stream_key_information', side_effect=stream_key_information):
+        response = client.post(
+            "/api/extract-stream",
+            files={"file": ("scan.pdf", b"%PDF-1.4", "application/pdf")},
+            data={"pdf_type": "corvel", "fields": "patient_name, claim_number"}
+        )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [event["event"] for event in events] == ["page", "done"]
+    assert events[-1]["complete"] is False
+
+def test_extract_stream_reports_extraction_errors(client):
+    # Act
+    with patch.object(main.extractor, 'stream_key_information', side_effect=ValueError("broken PDF")):
+        response = client.post("/api/extract-stream", files={"file": ("scan.pdf", b"%PDF-1.4", "application/pdf")})
+
+    # Assert
+    assert parse_events(response.text) == [{"event": "error", "error": "broken PDF"}]
+
+def test_extract_stream_returns_503_when_the_extractor_is_busy(client):
+    # Arrange
+    executor = Mock()
+    executor.submit.side_effect = ExtractionQueueFull("full")
+
+    # Act
+    with patch('main.get_extraction_executor', return_value=executor):
+        response = client.post("/api/extract-stream", files={"file": ("scan.pdf", b"%PDF-1.4", "application/pdf")})
+
+    # Assert
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main.EXTRACTION_RETRY_AFTER_SECONDS)
+
+def test_extract_batch_returns_503_when_the_extractor_is_busy(client):
+    # Arrange
+    executor = Mock()
+    executor.is_full.return_value = True
+
+    # Act
+    with patch('main.get_extraction_executor', return_value=executor):
+        response = client.post("/api/extract-batch", files={"file": ("faxes.zip", b"PK", "application/zip")})
+
+    # Assert
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main.EXTRACTION_RETRY_AFTER_SECONDS)
+
+def test_extract_batch_rejects_oversized_archives(client):
+    # Act
+    with patch('main.MAX_BATCH_ARCHIVE_BYTES', 10):
+        response = client.post("/api/extract-batch", files={"file": ("faxes.zip", b"x" * 11, "application/zip")})
+
+    # Assert
+    assert response.status_code == 413
+
+def test_extract_batch_runs_on_the_extraction_executor(client):
+    # Arrange
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("a.pdf", b"%PDF-1.4 a")
+        archive.writestr("b.pdf", b"%PDF-1.4 b")
+    executor = main.get_extraction_executor()
+
+    # Act
+    with patch.object(executor, 'submit', wraps=executor.submit) as submit, \
+         patch.object(main.extractor, 'extract_key_information', return_value={"pdf_type": "corvel"}):
+        response = client.post("/api/extract-batch", files={"file": ("faxes.zip", buffer.getvalue(), "application/zip")})
+
+    # Assert
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[-1]["documents"] == 2 and records[-1]["errors"] == 0
+    assert submit.call_count == 2
+
+def test_upload_appointments_does_not_upsert_by_default(client):
+    # Arrange
+    main.app.dependency_overrides[main.get_db] = lambda: Mock()
+    csv_file = ("appointments.csv", b"header\n", "text/csv")
+
+    # Act
+    try:
+        with patch('main.appointment_service.process_uploaded_appointments', return_value={"total_processed": 0}) as process, \
+             patch('main.import_jobs.enqueue_import', return_value=Mock(job_id=1)) as enqueue_import:
+            upload = client.post("/api/upload-appointments", files={"file": csv_file})
+            queued = client.post("/api/import-jobs", files={"file": csv_file})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    # Assert
+    assert upload.status_code == 200 and queued.status_code == 202
+    assert process.call_args.kwargs["upsert"] is False
+    assert enqueue_import.call_args.kwargs["upsert"] is False
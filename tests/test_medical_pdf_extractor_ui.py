@@ -0,0 +1,291 @@
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import threading
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The extractor module builds the Gradio app and renders PDFs, skip without those dependencies
+pytest.importorskip("gradio")
+pytest.importorskip("gradio_pdf")
+pytest.importorskip("pypdfium2")
+pytest.importorskip("reportlab")
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from blob_store import LocalBlobStore
+from medical_pdf_extractor_ui import MedicalInfoExtractor
+from models import Authorization, ExtractionRun, Patient, Provider
+
+CORVEL_PAGE = """CORVEL # 12345
+CLAIMANT: John Smith
+DOB: 03/04/1980
+CLAIM #: CL-001
+DOI: 01/02/2024
+Provider: Main Street Physical Therapy
+Type of Therapy: Physical Therapy
+Certified Visits: 12
+Effective Date: 02/01/2024
+"""
+
+@pytest.fixture
+def db_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'extractor.db'}")
+
+    # pysqlite only supports SAVEPOINT when SQLAlchemy emits BEGIN itself
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    SQLModel.metadata.create_all(engine)
+    with patch('medical_pdf_extractor_ui.engine', engine), \
+         patch('medical_pdf_extractor_ui.get_blob_store', return_value=LocalBlobStore(str(tmp_path / 'blobs'))):
+        yield engine
+
+@pytest.fixture
+def extractor():
+    return MedicalInfoExtractor()
+
+def test_region_ocr_off_reads_the_full_pages(extractor, db_engine):
+    # Arrange
+    extractor.extract_pages_from_pdf = Mock(return_value=[CORVEL_PAGE])
+
+    # Act
+    with patch('medical_pdf_extractor_ui.REGION_OCR_ENABLED', False), \
+         patch('medical_pdf_extractor_ui.ocr_pdf_page') as ocr_pdf_page:
+        info = extractor.extract_key_information(b"%PDF-1.4", is_pdf=True, pdf_type="corvel")
+    message = extractor.save_many_to_database([(info, None)])[0]
+
+    # Assert
+    ocr_pdf_page.assert_not_called()
+    assert info["provider_name"] == "Main Street Physical Therapy"
+    assert info["patient_name"] == "John Smith"
+    assert "Authorization ID" in message
+
+def test_region_miss_reads_the_full_pages_and_keeps_the_region_fields(extractor, db_engine):
+    # Arrange
+    scanner = extractor.get_scanner_for_type("corvel")
+    region_matches = {
+        field: match for field, match in scanner.scan(CORVEL_PAGE.replace("John Smith", "Jane Region")).items()
+        if field in extractor.get_saved_fields("corvel") and field != "provider_name"
+    }
+    extractor.extract_fields_from_regions = Mock(return_value=region_matches)
+    extractor.extract_pages_from_pdf = Mock(return_value=[CORVEL_PAGE])
+
+    # Act
+    info = extractor.extract_key_information(b"%PDF-1.4", is_pdf=True, pdf_type="corvel")
+    message = extractor.save_many_to_database([(info, None)])[0]
+
+    # Assert
+    extractor.extract_pages_from_pdf.assert_called_once()
+    assert info["provider_name"] == "Main Street Physical Therapy"
+    assert info["patient_name"] == "Jane Region"
+    assert "Authorization ID" in message
+
+def test_regions_with_every_saved_field_skip_the_full_pages(extractor):
+    # Arrange
+    region_matches = {
+        field: match for field, match in extractor.get_scanner_for_type("corvel").scan(CORVEL_PAGE).items()
+        if field in extractor.get_saved_fields("corvel")
+    }
+    extractor.extract_fields_from_regions = Mock(return_value=region_matches)
+    extractor.extract_pages_from_pdf = Mock(return_value=[CORVEL_PAGE])
+
+    # Act
+    info = extractor.extract_key_information(b"%PDF-1.4", is_pdf=True, pdf_type="corvel")
+
+    # Assert
+    extractor.extract_pages_from_pdf.assert_not_called()
+    assert info["provider_name"] == "Main Street Physical Therapy"
+    assert info["employer"] is None
+
+def text_record(name, provider=None, sessions="10"):
+    info = {"patient_name": name, "authorized_sessions": sessions, "claim_number": f"CL-{name}"}
+    if provider:
+        info["provider_name"] = provider
+    return info
+
+def test_save_many_to_database_with_new_and_existing_patients_and_providers(extractor, db_engine):
+    # Arrange
+    with Session(db_engine) as session:
+        session.add(Patient(first_name="John", last_name="Smith", phone="555-0000"))
+        session.add(Provider(name="Main Street PT"))
+        session.commit()
+    records = [
+        ({**text_record("John Smith", "Main Street PT"), "patient_phone": "555-0123"}, None),
+        (text_record("Jane Doe", "River PT"), b"%PDF-1.4 form"),
+        (text_record("Jane Doe", "River PT"), None),
+    ]
+
+    # Act
+    messages = extractor.save_many_to_database(records)
+
+    # Assert
+    assert all(message.startswith("Successfully saved patient and authorization") for message in messages)
+    with Session(db_engine) as session:
+        patients = session.exec(select(Patient)).all()
+        providers = session.exec(select(Provider)).all()
+        authorizations = session.exec(select(Authorization)).all()
+    assert sorted((patient.first_name, patient.phone) for patient in patients) == [("Jane", None), ("John", "555-0123")]
+    assert sorted(provider.name for provider in providers) == ["Main Street PT", "River PT"]
+    assert len(authorizations) == 3
+    assert [authorization.form_mime_type for authorization in authorizations] == [None, "application/pdf", None]
+
+def test_save_many_to_database_without_provider_saves_the_patient_only(extractor, db_engine):
+    # Act
+    messages = extractor.save_many_to_database([(text_record("John Smith"), None)])
+
+    # Assert
+    assert "no authorization created - missing provider" in messages[0]
+    with Session(db_engine) as session:
+        assert len(session.exec(select(Patient)).all()) == 1
+        assert session.exec(select(Authorization)).all() == []
+
+def test_save_many_to_database_reports_mapping_errors_per_document(extractor, db_engine):
+    # Arrange
+    records = [
+        ({**text_record("John Smith", "Main Street PT", sessions="ten"), "pdf_type": "homelink"}, None),
+        (text_record("Jane Doe", "Main Street PT"), None),
+    ]
+
+    # Act
+    messages = extractor.save_many_to_database(records)
+
+    # Assert
+    assert messages[0].startswith("Error saving to database")
+    assert messages[1].startswith("Successfully saved patient and authorization")
+    with Session(db_engine) as session:
+        assert [patient.first_name for patient in session.exec(select(Patient))] == ["Jane"]
+
+def test_save_many_to_database_rolls_back_only_the_failing_document(extractor, db_engine):
+    # Arrange
+    with Session(db_engine) as session:
+        session.add(Provider(name="Taken PT"))
+        session.commit()
+    records = [
+        (text_record("Jane Doe", "River PT"), None),
+        (text_record("Bob Brown", "Taken PT"), None),
+        (text_record("Bob Brown", "River PT"), None),
+    ]
+
+    # Act
+    # Another process inserted "Taken PT" after the lookup, so its insert fails
+    with patch.object(extractor, '_find_extracted_providers', return_value={}):
+        messages = extractor.save_many_to_database(records)
+
+    # Assert
+    assert messages[0].startswith("Successfully saved patient and authorization")
+    assert messages[1].startswith("Error saving to database")
+    assert messages[2].startswith("Successfully saved patient and authorization")
+    with Session(db_engine) as session:
+        assert sorted(patient.first_name for patient in session.exec(select(Patient))) == ["Bob", "Jane"]
+        assert sorted(provider.name for provider in session.exec(select(Provider))) == ["River PT", "Taken PT"]
+        assert len(session.exec(select(Authorization)).all()) == 2
+
+def test_save_many_to_database_links_extraction_runs(extractor, db_engine):
+    # Arrange
+    with Session(db_engine) as session:
+        runs = [ExtractionRun(document_sha256=str(i) * 64, settings_version="v1", extracted_fields="{}") for i in range(2)]
+        session.add_all(runs)
+        session.commit()
+        run_ids = [run.run_id for run in runs]
+    records = [(text_record("John Smith", "Main Street PT"), None), (text_record("Jane Doe"), None)]
+
+    # Act
+    extractor.save_many_to_database(records, run_ids=run_ids)
+
+    # Assert
+    with Session(db_engine) as session:
+        authorization = session.exec(select(Authorization)).one()
+        assert session.get(ExtractionRun, run_ids[0]).authorization_id == authorization.authorization_id
+        assert session.get(ExtractionRun, run_ids[1]).authorization_id is None
+
+def test_save_many_to_database_looks_up_patients_and_providers_once_per_batch(extractor, db_engine):
+    # Arrange
+    statements = []
+    event.listen(db_engine, "before_cursor_execute",
+                 lambda connection, cursor, statement, *args: statements.append(statement))
+
+    def lookups(count):
+        statements.clear()
+        extractor.save_many_to_database([(text_record(f"Patient{i} Doe{i}", f"Provider {i}"), None) for i in range(count)])
+        return [statement for statement in statements
+                if statement.startswith("SELECT") and ("FROM patients" in statement or "FROM providers" in statement)]
+
+    # Act
+    small, large = lookups(2), lookups(20)
+
+    # Assert
+    assert len(small) == len(large) == 2
+
+def fake_pages(pages, closed, on_page=None):
+    """Stand-in for iter_pages_from_pdf that records whether it was closed before the last page."""
+    def iter_pages_from_pdf(pdf_source, pdf_type=None, metrics=None):
+        try:
+            for page_index, page_text in enumerate(pages):
+                if on_page:
+                    on_page(page_index)
+                yield page_index, page_text
+        except GeneratorExit:
+            closed.append(page_index)
+            raise
+    return iter_pages_from_pdf
+
+def test_stream_key_information_stops_once_the_needed_fields_are_found(extractor):
+    # Arrange
+    closed = []
+    extractor.iter_pages_from_pdf = fake_pages([CORVEL_PAGE, "Provider: Other PT\n", "Network: Second\n"], closed)
+
+    # Act
+    events = list(extractor.stream_key_information(b"%PDF-1.4", "corvel", needed_fields=["patient_name", "provider_name"]))
+
+    # Assert
+    assert [event["event"] for event in events] == ["page", "done"]
+    assert events[0]["fields"]["provider_name"] == "Main Street Physical Therapy"
+    assert events[-1]["complete"] is False
+    assert closed == [0]
+
+def test_stream_key_information_stops_when_cancelled(extractor):
+    # Arrange
+    closed = []
+    cancelled = threading.Event()
+    extractor.iter_pages_from_pdf = fake_pages(
+        ["CLAIMANT: John Smith\n", CORVEL_PAGE, CORVEL_PAGE], closed,
+        on_page=lambda page_index: page_index == 1 and cancelled.set()
+    )
+
+    # Act
+    events = list(extractor.stream_key_information(b"%PDF-1.4", "corvel", cancelled=cancelled))
+
+    # Assert
+    assert [event["event"] for event in events] == ["page", "page", "done"]
+    assert events[-1]["complete"] is False
+    assert closed == [1]
+
+def test_stream_key_information_reports_changed_fields_and_completes(extractor):
+    # Arrange
+    closed = []
+    extractor.iter_pages_from_pdf = fake_pages(["CLAIMANT: John Smith\nCLAIM #: CL-001\n", CORVEL_PAGE], closed)
+
+    # Act
+    events = list(extractor.stream_key_information(b"%PDF-1.4", "corvel"))
+
+    # Assert
+    assert [event["event"] for event in events] == ["page", "page", "done"]
+    assert events[0]["fields"] == {"patient_name": "John Smith", "claim_number": "CL-001"}
+    # Fields found again with the same value are not reported twice
+    assert "patient_name" not in events[1]["fields"]
+    assert events[1]["fields"]["provider_name"] == "Main Street Physical Therapy"
+    done = events[-1]
+    assert done["complete"] is True
+    assert done["fields"]["pdf_type"] == "corvel"
+    assert done["fields"]["provider_name"] == "Main Street Physical Therapy"
+    assert done["fields"]["employer"] is None
+    assert closed == []
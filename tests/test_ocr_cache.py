@@ -0,0 +1,108 @@
+import pytest
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_cache import OCRCache, cache_key
+
+SETTINGS = {"version": 1, "languages": ["en"], "scale": 2.0}
+
+def test_cache_key_depends_on_content_type_and_settings():
+    # Act
+    key = cache_key(b"%PDF-1.7 a", "corvel", SETTINGS)
+
+    # Assert
+    assert key == cache_key(b"%PDF-1.7 a", "Corvel", dict(SETTINGS))
+    assert key != cache_key(b"%PDF-1.7 b", "corvel", SETTINGS)
+    assert key != cache_key(b"%PDF-1.7 a", "homelink", SETTINGS)
+    assert key != cache_key(b"%PDF-1.7 a", "corvel", dict(SETTINGS, scale=3.0))
+
+def test_get_returns_stored_pages_and_counts(tmp_path):
+    # Arrange
+    cache = OCRCache(str(tmp_path), max_bytes=10_000)
+    key = cache_key(b"pdf", "corvel", SETTINGS)
+
+    # Act
+    missing = cache.get(key)
+    cache.put(key, ["page one", "page two"])
+    pages = cache.get(key)
+
+    # Assert
+    assert missing is None
+    assert pages == ["page one", "page two"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0}
+
+def test_put_evicts_least_recently_used(tmp_path):
+    # Arrange
+    cache = OCRCache(str(tmp_path), max_bytes=10_000)
+    keys = [cache_key(f"pdf {i}".encode(), "corvel", SETTINGS) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, ["x" * 4000])
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    # Reading the oldest entry makes it the most recently used
+    cache.get(keys[0])
+
+    # Act
+    cache.put(keys[2], ["x" * 4000])
+
+    # Assert
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    # Arrange
+    cache = OCRCache(str(tmp_path))
+    key = cache_key(b"pdf", None, SETTINGS)
+    os.makedirs(os.path.dirname(cache._path(key)))
+    with open(cache._path(key), "w") as cache_file:
+        cache_file.write('{"pages": ["trunc')
+
+    # Act / Assert
+    assert cache.get(key) is None
+
+def test_put_only_scans_when_the_running_size_is_over_the_limit(tmp_path, monkeypatch):
+    # Arrange
+    cache = OCRCache(str(tmp_path), max_bytes=10_000)
+    keys = [cache_key(f"pdf {i}".encode(), "corvel", SETTINGS) for i in range(4)]
+    scans = []
+    evict = cache.evict
+    def counting_evict():
+        scans.append(1)
+        return evict()
+    monkeypatch.setattr(cache, "evict", counting_evict)
+
+    # Act
+    cache.put(keys[0], ["x" * 2500])
+    cache.put(keys[1], ["x" * 2500])
+    cache.put(keys[1], ["x" * 2500])
+    cache.put(keys[2], ["x" * 2500])
+    after_fitting_writes = len(scans)
+    cache.put(keys[3], ["x" * 2500])
+
+    # Assert
+    assert after_fitting_writes == 1
+    assert len(scans) == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.get(keys[0]) is None
+
+def test_put_scans_after_the_scan_interval(tmp_path, monkeypatch):
+    # Arrange
+    monkeypatch.setattr("ocr_cache.OCR_CACHE_SCAN_SECONDS", 0)
+    cache = OCRCache(str(tmp_path), max_bytes=10_000)
+    other_worker = OCRCache(str(tmp_path), max_bytes=10_000)
+    keys = [cache_key(f"pdf {i}".encode(), "corvel", SETTINGS) for i in range(4)]
+    cache.put(keys[0], ["x" * 2500])
+    # Writes of another worker are not in this worker's running size
+    for key in keys[1:3]:
+        other_worker.put(key, ["x" * 2500])
+
+    # Act
+    cache.put(keys[3], ["x" * 2500])
+
+    # Assert
+    assert cache.stats()["evictions"] == 1
+    assert cache.get(keys[0]) is None
@@ -0,0 +1,116 @@
+import pytest
+import os
+import sys
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_preprocessing import (
+    adaptive_threshold, deskew, estimate_skew, parse_steps, preprocess_page, resize_area, to_grayscale, trim_borders
+)
+
+def text_lines(height=400, width=600, degrees=0.0, background=255):
+    """A page with dashed horizontal lines of "text", optionally rotated by a shear."""
+    page = np.full((height, width), background, dtype=np.uint8)
+    for top in range(60, height - 60, 40):
+        for x in range(50, width - 50):
+            if (x // 7) % 3:
+                y = top + int(round(x * np.tan(np.radians(degrees))))
+                page[y:y + 4, x] = 0
+    return page
+
+def test_parse_steps_rejects_unknown_steps():
+    # Act & Assert
+    assert parse_steps(" Binarize, deskew ,") == ["binarize", "deskew"]
+    with pytest.raises(ValueError):
+        parse_steps("binarize,sharpen")
+
+def test_to_grayscale_weights_channels():
+    # Arrange
+    image = np.zeros((1, 3, 3), dtype=np.uint8)
+    image[0, 0] = [255, 0, 0]
+    image[0, 1] = [0, 255, 0]
+    image[0, 2] = [255, 255, 255]
+
+    # Act
+    gray = to_grayscale(image)
+
+    # Assert
+    assert gray.tolist() == [[76, 150, 255]]
+
+def test_resize_area_averages_covered_pixels():
+    # Arrange
+    gray = np.array([[0, 0, 255, 255], [0, 0, 255, 255]], dtype=np.uint8)
+
+    # Act
+    resized = resize_area(gray, 1, 2)
+
+    # Assert
+    assert resized.tolist() == [[0, 255]]
+
+def test_adaptive_threshold_keeps_text_on_uneven_background():
+    # Arrange, a background darkening from left to right with text on both sides
+    gray = np.tile(np.linspace(230, 120, 200), (60, 1)).astype(np.uint8)
+    gray[20:30, 10:40] -= 60
+    gray[20:30, 160:190] -= 60
+
+    # Act
+    binary = adaptive_threshold(gray, block_size=31, offset=10)
+
+    # Assert
+    assert (binary[22:28, 15:35] == 0).all()
+    assert (binary[22:28, 165:185] == 0).all()
+    assert (binary[45:55, 60:140] == 255).all()
+
+@pytest.mark.parametrize("degrees", [-3.0, 0.0, 2.0])
+def test_estimate_skew_finds_rotation_of_text_lines(degrees):
+    # Act
+    angle = estimate_skew(text_lines(degrees=degrees))
+
+    # Assert
+    assert abs(angle - degrees) <= 0.25
+
+def test_deskew_straightens_text_lines():
+    # Arrange
+    page = text_lines(degrees=2.0)
+
+    # Act
+    straightened = deskew(page, estimate_skew(page))
+
+    # Assert
+    assert abs(estimate_skew(straightened)) <= 0.25
+    assert straightened.shape == page.shape
+
+def test_trim_borders_removes_margins_and_scanner_edges():
+    # Arrange
+    page = np.full((300, 200), 255, dtype=np.uint8)
+    page[:, :12] = 0  # Black scanner edge
+    page[100:120, 60:140] = 0  # Content
+
+    # Act
+    trimmed = trim_borders(page, margin=5)
+
+    # Assert
+    assert trimmed.shape == (30, 90)
+
+def test_preprocess_page_without_settings_returns_image_unchanged():
+    # Arrange
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    # Act
+    result = preprocess_page(image, render_dpi=144, steps=[], target_dpi=0)
+
+    # Assert
+    assert result is image
+
+def test_preprocess_page_downscales_to_target_dpi():
+    # Arrange
+    image = np.full((1584, 1224, 3), 255, dtype=np.uint8)
+
+    # Act
+    result = preprocess_page(image, render_dpi=144, steps=["grayscale"], target_dpi=72)
+
+    # Assert
+    assert result.shape == (792, 612)
@@ -0,0 +1,151 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import threading
+import numpy as np
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr_service
+
+@pytest.fixture(autouse=True)
+def reset_reader():
+    ocr_service._reader = None
+    yield
+    ocr_service._reader = None
+
+def test_get_ocr_reader_loads_models_once_across_threads():
+    # Arrange
+    loading = threading.Event()
+    def slow_create_reader(languages):
+        loading.wait(0.2)
+        return object()
+
+    # Act
+    with patch("ocr_service._create_reader", side_effect=slow_create_reader) as create_reader:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            readers = list(pool.map(lambda _: ocr_service.get_ocr_reader(), range(8)))
+
+    # Assert
+    create_reader.assert_called_once_with(ocr_service.OCR_LANGUAGES)
+    assert all(reader is readers[0] for reader in readers)
+
+def test_prewarm_only_when_enabled():
+    # Act / Assert
+    with patch("ocr_service._create_reader") as create_reader:
+        with patch("ocr_service.OCR_PREWARM", False):
+            assert not ocr_service.prewarm_ocr_reader()
+        create_reader.assert_not_called()
+
+        with patch("ocr_service.OCR_PREWARM", True):
+            assert ocr_service.prewarm_ocr_reader()
+        create_reader.assert_called_once()
+
+def test_ocr_pdf_pages_keeps_page_order():
+    # Arrange
+    def slow_first_page(pdf_path, page_index):
+        if page_index == 0:
+            threading.Event().wait(0.1)
+        with open(pdf_path, "rb") as pdf_file:
+            return f"{pdf_file.read().decode()} page {page_index}"
+
+    # Act
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        with patch("ocr_service.get_ocr_pool", return_value=pool), \
+             patch("ocr_service._ocr_page_in_worker", side_effect=slow_first_page):
+            pages = ocr_service.ocr_pdf_pages(b"doc", [0, 1, 2])
+
+    # Assert
+    assert pages == ["doc page 0", "doc page 1", "doc page 2"]
+
+def test_submit_ocr_pages_sends_the_path_of_one_spooled_file():
+    # Arrange
+    started, release = threading.Event(), threading.Event()
+    paths = []
+    def read_page(pdf_path, page_index):
+        paths.append(pdf_path)
+        started.set()
+        release.wait(5)
+        with open(pdf_path, "rb") as pdf_file:
+            return pdf_file.read()
+
+    # Act
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with patch("ocr_service.get_ocr_pool", return_value=pool), \
+             patch("ocr_service._ocr_page_in_worker", side_effect=read_page):
+            futures = ocr_service.submit_ocr_pages(b"%PDF-1.4 scanned", [0, 1, 2])
+            started.wait(5)
+            futures[2].cancel()
+            release.set()
+            pages = [future.result() for future in futures[:2]]
+
+    # Assert
+    assert pages == [b"%PDF-1.4 scanned"] * 2
+    assert len(set(paths)) == 1
+    assert not os.path.exists(paths[0])
+
+def test_prewarm_with_pool_warms_every_worker():
+    # Arrange
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with patch("ocr_service.OCR_PREWARM", True), patch("ocr_service.OCR_POOL_WORKERS", 2), \
+             patch("ocr_service.get_ocr_pool", return_value=pool), \
+             patch("ocr_service._create_reader") as create_reader:
+
+            # Act
+            warmed = ocr_service.prewarm_ocr_reader()
+
+    # Assert
+    assert warmed
+    create_reader.assert_called_once()
+
+@pytest.mark.parametrize("text, usable", [
+    ("Patient Name: John Smith\nDOB: 01/02/1980\nClaim #: 12345-ABC\nAuthorized visits: 12", True),
+    ("", False),
+    ("  \n\x0c  ", False),
+    ("Page 1 of 3", False),
+    ("��� Name: John Smith ���� DOB ����� 01/02/1980 ���", False),
+    ("PatientNameJohnSmithDateofBirth01021980ClaimNumber12345ABCAuthorizedVisits12", False),
+    ("P a t i e n t N a m e J o h n S m i t h D O B 0 1 0 2 1 9 8 0 C l a i m", False),
+    ("----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----", False),
+])
+def test_has_usable_text_layer(text, usable):
+    # Act / Assert
+    assert ocr_service.has_usable_text_layer(text) is usable
+
+def test_blank_page_has_no_usable_text_layer_without_a_minimum():
+    # Act / Assert
+    assert ocr_service.has_usable_text_layer("", min_chars=0) is False
+    assert ocr_service.has_usable_text_layer(" \n\t", min_chars=0) is False
+
+def test_ocr_pdf_pages_batched_pads_each_window_to_one_size():
+    # Arrange
+    sizes = {0: (40, 30), 1: (50, 20), 2: (30, 30)}
+    class FakeReader:
+        def __init__(self):
+            self.batches = []
+        def readtext_batched(self, images, batch_size, workers):
+            self.batches.append([image.shape for image in images])
+            return [[(None, f"text {image[0, 0]}", 0.9)] for image in images]
+    def render(pdf, page_index, scale=None):
+        return np.full(sizes[page_index], page_index, dtype=np.uint8)
+    reader = FakeReader()
+
+    # Act
+    with patch("ocr_service.render_page", side_effect=render), patch("ocr_service.OCR_BATCH_PAGES", 2):
+        texts = ocr_service.ocr_pdf_pages_batched(object(), [0, 1, 2], reader)
+
+    # Assert
+    assert texts == ["text 0", "text 1", "text 2"]
+    assert reader.batches == [[(50, 30), (50, 30)], [(30, 30)]]
+
+def test_pad_image_fills_with_white():
+    # Act
+    padded = ocr_service._pad_image(np.zeros((2, 1, 3), dtype=np.uint8), 3, 2)
+
+    # Assert
+    assert padded.shape == (3, 2, 3)
+    assert padded[:2, :1].max() == 0
+    assert padded[2].min() == 255 and padded[:, 1].min() == 255
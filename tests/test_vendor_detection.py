@@ -0,0 +1,56 @@
+import pytest
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vendor_detection import VendorClassifier
+
+PATTERNS_BY_VENDOR = {
+    'onecall': {
+        'patient_name': [r'Name:\s*([^\n]+)'],
+        'injury_date': [r'Injury Date:\s*(\d{1,2}/\d{1,2}/\d{4})'],
+        'employer': [r'Employer:\s*([^\n]+)'],
+    },
+    'corvel': {
+        'patient_name': [r'Claimant:\s*([^\n]+)', r'Name:\s*([^\n]+)'],
+        'adjuster': [r'Adjuster:\s*([^\n]+)'],
+        'carrier': [r'Carrier/TPA:\s*([^\n]+)'],
+    },
+    'homelink': {
+        'patient_name': [r'Patient:\s*([^\n]+)', r'Name:\s*([^\n]+)'],
+        'diagnosis': [r'Diagnosis:\s*([^\n]+)'],
+        'order_number': [r'HOMELINK\s*Order:\s*([^\n]+)'],
+    },
+}
+
+@pytest.fixture
+def classifier():
+    return VendorClassifier(PATTERNS_BY_VENDOR)
+
+def test_fingerprints_leave_out_shared_and_short_labels(classifier):
+    # Assert
+    assert classifier.labels['onecall'] == ['employer:', 'injury date:']
+    assert classifier.labels['corvel'] == ['adjuster:', 'carrier/tpa:', 'claimant:']
+    assert 'name:' not in classifier.labels['homelink']
+
+@pytest.mark.parametrize("text, vendor", [
+    ("Name: Jane Doe\nEmployer: ACME\nInjury  Date: 1/2/2024", "onecall"),
+    ("CLAIMANT: Jane Doe\nAdjuster: Bob Lee\nCarrier/TPA: Zenith", "corvel"),
+    ("CorVel Corporation\nUtilization Review", "corvel"),
+    ("HomeLink Order: 12345\nName: Jane Doe", "homelink"),
+    ("Patient: Jane Doe\nDiagnosis: M54.5", "homelink"),
+])
+def test_classify(classifier, text, vendor):
+    # Act / Assert
+    assert classifier.classify(text) == vendor
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Name: Jane Doe",
+    "Adjuster: Bob Lee\nDiagnosis: M54.5",
+])
+def test_classify_unclear_text(classifier, text):
+    # Act / Assert
+    assert classifier.classify(text) is None
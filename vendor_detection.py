@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional
+import logging
+import os
+
+from field_scanner import leading_literal
+
+logger = logging.getLogger(__name__)
+
+# Names each vendor prints on its forms, in lower case
+VENDOR_NAMES = {
+    "onecall": ["one call", "onecall"],
+    "corvel": ["corvel"],
+    "homelink": ["homelink", "home link"],
+}
+
+# Labels shorter than this, such as "Name", appear on every vendor's forms
+MIN_LABEL_LENGTH = 5
+
+# Lowest score a vendor needs to be chosen, see VendorClassifier.scores
+MIN_VENDOR_SCORE = float(os.getenv("MIN_VENDOR_SCORE", "0.2"))
+
+# Share of the first page, from the top, that is read with OCR when the page has no text layer
+VENDOR_HEADER_FRACTION = 0.3
+
+# Render scale of the header OCR, enough for logos and titles
+VENDOR_HEADER_SCALE = 1.0
+
+class VendorClassifier:
+    """
+    Decide which vendor issued an authorization from a sample of its text.
+
+    The fingerprint of a vendor is its name and the field labels its patterns start
+    with that no other vendor's patterns use, e.g. "Carrier/TPA:" for Corvel. Labels
+    overlapping another vendor's, like "Date:" and "Injury Date:", are left out.
+
+    Args:
+        patterns_by_vendor: The extraction patterns of each vendor, see MedicalInfoExtractor.
+        vendor_names: Names each vendor prints on its forms, in lower case.
+    """
+
+    def __init__(self, patterns_by_vendor: Dict[str, Dict[str, List[str]]], vendor_names: Dict[str, List[str]] = VENDOR_NAMES):
+        labels = {
+            vendor: {
+                leading_literal(pattern).strip().lower()
+                for field_patterns in patterns.values() for pattern in field_patterns
+            }
+            for vendor, patterns in patterns_by_vendor.items()
+        }
+        self.labels = {}
+        for vendor, vendor_labels in labels.items():
+            others = set().union(*(other for name, other in labels.items() if name != vendor))
+            # Labels found inside another vendor's labels or the other way round, like "Date:"
+            # and "Injury Date:", would match the other vendor's forms too
+            self.labels[vendor] = sorted(
+                label for label in vendor_labels
+                if len(label) >= MIN_LABEL_LENGTH
+                and not any(label in other or other in label for other in others if other)
+            )
+        self.vendor_names = {vendor: vendor_names.get(vendor, [vendor]) for vendor in patterns_by_vendor}
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        Score how well the text matches each vendor.
+
+        A vendor scores the share of its distinctive labels found in the text, plus
+        one if its name appears.
+        """
+        lowered = " ".join(text.lower().split())
+        scores = {}
+        for vendor, labels in self.labels.items():
+            found = sum(1 for label in labels if label in lowered)
+            score = found / len(labels) if labels else 0.0
+            if any(name in lowered for name in self.vendor_names[vendor]):
+                score += 1.0
+            scores[vendor] = score
+        return scores
+
+    def classify(self, text: str) -> Optional[str]:
+        """
+        Return the vendor the text most likely comes from.
+
+        Returns:
+            The vendor, or None if no vendor reaches MIN_VENDOR_SCORE or two vendors tie.
+        """
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < MIN_VENDOR_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+            return None
+        return ranked[0][0]